@@ -5,14 +5,17 @@ Backend principal - Estructura limpia y organizada
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
 from config import settings
+from metrics import MetricsMiddleware, registry as metrics_registry
 from routes.routes_generales import router as general_router
 from routes.vocales.routes_vocales import router as vocales_router
 from routes.abecedario.routes_abecedario import router as abecedario_router
 from routes.numeros.routes_numeros import router as numeros_router
 from routes.operaciones.routes_operaciones import router as operaciones_router
+from training_jobs import training_jobs
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -30,6 +33,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia y estados por ruta para /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Incluir routers
 app.include_router(general_router, prefix="/api/v1", tags=["General"])
 app.include_router(vocales_router, prefix="/api/v1", tags=["Vocales"])
@@ -37,6 +43,39 @@ app.include_router(abecedario_router, prefix="/api/v1", tags=["Abecedario"])  #
 app.include_router(numeros_router, prefix="/api/v1", tags=["Números"])
 app.include_router(operaciones_router, prefix="/api/v1", tags=["Operaciones"])
 
+@app.on_event("startup")
+async def start_datos_manager():
+    """Migrar los datos y arrancar los escritores de muestras (solo en el servidor)"""
+    from datos_manager import datos_manager
+    
+    datos_manager.start()
+
+@app.on_event("startup")
+async def start_training_pool():
+    """Arrancar el pool de procesos de entrenamiento"""
+    training_jobs.start()
+
+@app.on_event("startup")
+async def preload_models():
+    """Cargar la versión activa de cada modelo antes de la primera predicción"""
+    from ml_model import models
+    from model_registry import model_registry
+    
+    loaded = model_registry.preload(models.keys())
+    print(f" Modelos precargados: {', '.join(loaded) or 'ninguno'}")
+
+@app.on_event("shutdown")
+async def shutdown_training_pool():
+    """Detener el pool de procesos de entrenamiento"""
+    training_jobs.shutdown()
+
+@app.on_event("shutdown")
+async def flush_sample_writers():
+    """Confirmar las muestras encoladas antes de salir"""
+    from datos_manager import datos_manager
+    
+    datos_manager.close()
+
 @app.get("/")
 async def root():
     """Endpoint raíz"""
@@ -46,6 +85,7 @@ async def root():
         "status": "active",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "ai_agent": "/api/v1/ai-agent",
             "vocales": "/api/v1/vocales",
             "abecedario": "/api/v1/abecedario",   # 👈 aquí estarán también /train, /stats, etc.
@@ -54,6 +94,14 @@ async def root():
         }
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 if __name__ == "__main__":
     print(f" Iniciando {settings.APP_NAME} v{settings.VERSION}")
     print(f" Configuración: {settings.HOST}:{settings.PORT}")
@@ -0,0 +1,246 @@
+"""
+Micro-benchmarks de las rutas críticas del Sistema Inteligente de Reconocimiento de Señas
+
+Genera landmarks sintéticos en un árbol ``datos/`` temporal y mide el
+almacenamiento, las estadísticas, la carga de datos, el entrenamiento, la
+predicción y el evaluador de expresiones con varios tamaños de dataset.
+
+Uso:
+    python benchmarks.py --sizes 20 100 500 --output resultados.json
+    python benchmarks.py --compare base.json nuevo.json
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+BENCHMARK_CATEGORY = "abecedario"
+EXPRESSIONS = ["2+3", "12*(4-1)", "(7+5)/3-2", "2^10", "((1+2)*(3+4))/(5-6)"]
+BATCH_FRAMES = 64
+
+
+def generate_landmarks(rng: np.random.Generator, n_signs: int, samples_per_sign: int) -> Dict[str, np.ndarray]:
+    """Poses sintéticas por seña: un prototipo por seña más ruido, traslación y escala
+
+    Devuelve {seña: matriz (samples_per_sign, 63)}.
+    """
+    signs = list(string.ascii_uppercase[:n_signs])
+    prototypes = rng.uniform(0.0, 0.3, size=(n_signs, 21, 3))
+    data = {}
+    for sign, prototype in zip(signs, prototypes):
+        points = prototype + rng.normal(0.0, 0.01, size=(samples_per_sign, 21, 3))
+        points = points * rng.uniform(0.7, 1.3, size=(samples_per_sign, 1, 1))
+        points = points + rng.uniform(0.2, 0.6, size=(samples_per_sign, 1, 3))
+        data[sign] = points.reshape(samples_per_sign, 63).astype(np.float32)
+    return data
+
+
+def to_landmarks(row: np.ndarray) -> List[Dict[str, float]]:
+    """Fila (63,) a la lista de landmarks {x, y, z} que recibe la API"""
+    return [{"x": x, "y": y, "z": z} for x, y, z in row.reshape(21, 3).tolist()]
+
+
+def summarize(name: str, timings: List[float]) -> Dict[str, Any]:
+    """Estadísticas en milisegundos de una lista de duraciones en segundos"""
+    ms = np.asarray(timings) * 1000.0
+    return {
+        "operation": name,
+        "n": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min())
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> List[float]:
+    """Duración de ``repeat`` llamadas a ``fn``"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_size(workdir: str, samples_per_sign: int, n_signs: int, n_users: int,
+             repeat: int, seed: int) -> List[Dict[str, Any]]:
+    """Medir todas las operaciones con un tamaño de dataset (corre en un proceso aparte)
+
+    Los módulos del backend usan ``datos/`` y ``models/`` relativos al
+    directorio actual, así que se importan después del chdir.
+    """
+    os.chdir(workdir)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        from datos_manager import datos_manager
+        from math_evaluator import MathEvaluator
+        from ml_model import SignRecognitionModel
+
+        datos_manager.start()
+        rng = np.random.default_rng(seed)
+        data = generate_landmarks(rng, n_signs, samples_per_sign)
+        results = []
+
+        # Ingreso de muestras, intercalando señas y usuarios como en una sesión real
+        payloads = [
+            (sign, to_landmarks(rows[index]), index % n_users + 1)
+            for index in range(samples_per_sign)
+            for sign, rows in data.items()
+        ]
+        timings = []
+        for sign, landmarks, user_id in payloads:
+            start = time.perf_counter()
+            datos_manager.save_sample(BENCHMARK_CATEGORY, sign, landmarks, user_id=user_id)
+            timings.append(time.perf_counter() - start)
+        results.append(summarize("save_sample", timings))
+
+        results.append(summarize("get_category_stats", measure(
+            lambda: datos_manager.get_category_stats(BENCHMARK_CATEGORY, 1), repeat
+        )))
+
+        model = SignRecognitionModel(BENCHMARK_CATEGORY)
+        results.append(summarize("load_training_data", measure(model.load_training_data, repeat)))
+
+        train_repeat = max(1, min(3, repeat))
+        results.append(summarize("train", measure(model.train, train_repeat)))
+
+        frames = [to_landmarks(rows[0]) for rows in data.values()]
+        results.append(summarize("predict", measure(
+            lambda: model.predict(frames[0]), repeat
+        )))
+        batch = [frames[i % len(frames)] for i in range(BATCH_FRAMES)]
+        results.append(summarize(f"predict_batch_{BATCH_FRAMES}", measure(
+            lambda: model.predict_batch(batch), repeat
+        )))
+
+        evaluator = MathEvaluator()
+        results.append(summarize("evaluate_expression", measure(
+            lambda: [evaluator.evaluate_expression(expr) for expr in EXPRESSIONS], repeat
+        )))
+
+    for result in results:
+        result["samples_per_sign"] = samples_per_sign
+        result["total_samples"] = samples_per_sign * n_signs
+    return results
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Ejecutar todos los tamaños, cada uno en un proceso y directorio nuevos"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+
+    results = []
+    root = tempfile.mkdtemp(prefix="benchmarks-")
+    try:
+        context = multiprocessing.get_context("spawn")
+        for samples_per_sign in args.sizes:
+            workdir = os.path.join(root, f"size-{samples_per_sign}")
+            os.makedirs(workdir)
+            print(f"⏱️ {samples_per_sign} muestras por seña × {args.signs} señas...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                size_results = pool.submit(
+                    run_size, workdir, samples_per_sign, args.signs, args.users, args.repeat, args.seed
+                ).result()
+            for result in size_results:
+                print(f"   {result['operation']:<22} p50 {result['p50_ms']:9.3f} ms   "
+                      f"p95 {result['p95_ms']:9.3f} ms   (n={result['n']})")
+            results.extend(size_results)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    import sklearn
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "signs": args.signs,
+            "users": args.users,
+            "repeat": args.repeat,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Comparar la mediana de dos ejecuciones; devuelve cuántas operaciones empeoraron"""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    def key(result):
+        return result["operation"], result["samples_per_sign"]
+
+    base_results = {key(result): result for result in base["results"]}
+    regressions = 0
+    print(f"{'operación':<22} {'muestras':>8} {'base p50':>11} {'nuevo p50':>11} {'cambio':>8}")
+    for result in new["results"]:
+        previous = base_results.get(key(result))
+        if previous is None:
+            continue
+        change = result["p50_ms"] / previous["p50_ms"] - 1.0 if previous["p50_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  ⚠️ más lento"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  ✅ más rápido"
+        print(f"{result['operation']:<22} {result['samples_per_sign']:>8} "
+              f"{previous['p50_ms']:>9.3f}ms {result['p50_ms']:>9.3f}ms {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del backend")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500],
+                        help="Muestras por seña de cada dataset")
+    parser.add_argument("--signs", type=int, default=5, help="Número de señas (máximo 26)")
+    parser.add_argument("--users", type=int, default=3, help="Usuarios entre los que se reparten las muestras")
+    parser.add_argument("--repeat", type=int, default=30, help="Repeticiones de cada medición")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador sintético")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Comparar dos archivos de resultados en lugar de medir")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Cambio relativo de la mediana considerado significativo")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Salir con código 1 si alguna operación empeora")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions and args.fail_on_regression else 0)
+
+    if not 1 <= args.signs <= 26:
+        parser.error("--signs debe estar entre 1 y 26")
+
+    report = run_benchmarks(args)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"💾 Resultados guardados en {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
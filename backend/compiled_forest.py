@@ -0,0 +1,135 @@
+"""
+Inferencia compilada de bosques aleatorios sobre arreglos planos de NumPy
+"""
+
+from typing import Any, Optional
+
+import numpy as np
+
+# Marca de hoja en children_left/children_right de sklearn
+LEAF = -1
+
+# Filas aleatorias con las que se comprueba la paridad al compilar
+PARITY_PROBE_ROWS = 64
+
+
+class CompiledForest:
+    """Bosque entrenado convertido en arreglos de nodos concatenados
+
+    Todos los árboles comparten ``feature``, ``threshold``, ``left``, ``right`` y
+    ``proba`` (distribución de clases ya normalizada por nodo); ``roots`` guarda
+    el desplazamiento del primer nodo de cada árbol. La evaluación avanza un
+    nivel por iteración para todos los árboles y todas las muestras a la vez.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, proba: np.ndarray, roots: np.ndarray, depth: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.proba = proba
+        self.roots = roots
+        self.depth = depth
+        self.n_trees = len(roots)
+        self.n_classes = proba.shape[1]
+
+    @classmethod
+    def from_estimator(cls, estimator: Any) -> "CompiledForest":
+        """Compilar un ``RandomForestClassifier`` ajustado de una sola salida"""
+        if getattr(estimator, "n_outputs_", 1) != 1:
+            raise ValueError("Solo se compilan bosques de una sola salida")
+
+        n_classes = len(estimator.classes_)
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for tree in estimator.estimators_:
+            t = tree.tree_
+            roots.append(offset)
+            features.append(t.feature.astype(np.intp))
+            thresholds.append(t.threshold)
+
+            # Hijos con índices globales; las hojas apuntan a sí mismas para quedarse quietas
+            nodes = np.arange(offset, offset + t.node_count, dtype=np.intp)
+            is_leaf = t.children_left == LEAF
+            lefts.append(np.where(is_leaf, nodes, t.children_left + offset))
+            rights.append(np.where(is_leaf, nodes, t.children_right + offset))
+
+            # Misma normalización que DecisionTreeClassifier.predict_proba
+            value = t.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(value / normalizer)
+
+            # Las hojas no se dividen: su característica queda en 0 para indexar sin errores
+            features[-1][is_leaf] = 0
+            depth = max(depth, t.max_depth)
+            offset += t.node_count
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights),
+            np.concatenate(probas), np.asarray(roots, dtype=np.intp), depth
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Nodo hoja de cada árbol para cada muestra, con forma (árboles, muestras)"""
+        # sklearn recorre los árboles con X en float32 y umbrales en float64
+        X = np.asarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+        flat = X.ravel()
+        nodes = np.repeat(self.roots, len(X))
+        offsets = np.tile(np.arange(len(X)) * n_features, self.n_trees)
+        # Solo se avanzan los pares (árbol, muestra) que aún no llegaron a una hoja
+        pending = np.arange(len(nodes))
+        for _ in range(self.depth):
+            current = nodes[pending]
+            go_left = flat[offsets[pending] + self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            nodes[pending] = following
+            pending = pending[following != current]
+            if not len(pending):
+                break
+        return nodes.reshape(self.n_trees, len(X))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidades (muestras, clases) iguales a las de ``predict_proba`` de sklearn"""
+        leaves = self.apply(X)
+        # Suma árbol por árbol en el mismo orden que sklearn acumula sus predicciones
+        proba = np.zeros((leaves.shape[1], self.n_classes))
+        for tree_leaves in leaves:
+            proba += self.proba[tree_leaves]
+        proba /= self.n_trees
+        return proba
+
+
+def compile_forest(estimator: Any) -> Optional[CompiledForest]:
+    """Compilar un bosque y verificar que coincide con sklearn
+
+    Devuelve None si el estimador no se puede compilar o si la comprobación de
+    paridad falla; en ese caso las predicciones usan el estimador de sklearn.
+    """
+    try:
+        compiled = CompiledForest.from_estimator(estimator)
+    except Exception as e:
+        print(f" No se pudo compilar el bosque: {e}")
+        return None
+
+    # Muestras de prueba alrededor de los umbrales reales para cubrir ambas ramas
+    rng = np.random.default_rng(0)
+    n_features = estimator.n_features_in_
+    split = compiled.left != np.arange(len(compiled.left))
+    low = np.full(n_features, -1.0)
+    high = np.full(n_features, 1.0)
+    if split.any():
+        used = compiled.feature[split]
+        np.minimum.at(low, used, compiled.threshold[split] - 0.1)
+        np.maximum.at(high, used, compiled.threshold[split] + 0.1)
+    probe = rng.uniform(low, high, size=(PARITY_PROBE_ROWS, n_features)).astype(np.float32)
+
+    expected = estimator.predict_proba(probe)
+    if not np.allclose(compiled.predict_proba(probe), expected, rtol=0.0, atol=1e-12):
+        print(" El bosque compilado no coincide con sklearn, se usará el estimador original")
+        return None
+    return compiled
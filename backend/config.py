@@ -30,6 +30,59 @@ class Settings:
     DEFAULT_MODEL_TYPE = "RandomForest"
     MIN_SAMPLES_FOR_TRAINING = 11
     OPTIMAL_SAMPLES_FOR_TRAINING = 50
+    MODEL_REGISTRY_KEEP_VERSIONS = 10   # Versiones de cada modelo que se conservan para revertir
+    
+    # Entrenamiento incremental
+    INCREMENTAL_TREES_PER_STEP = 5      # Árboles que se añaden con las muestras nuevas
+    INCREMENTAL_REPLAY_PER_CLASS = 5    # Muestras antiguas por clase que acompañan a las nuevas
+    INCREMENTAL_MAX_STEPS = 5           # Pasos incrementales antes de forzar un ajuste completo
+    
+    # Modelos personales por usuario
+    USER_MODELS_ENABLED = True          # Predecir con el modelo del usuario si tiene uno entrenado
+    USER_MODEL_CACHE_SIZE = 32          # Modelos personales cargados en memoria a la vez (LRU)
+    
+    # Entrenamiento en segundo plano
+    TRAINING_MAX_WORKERS = 1            # Procesos dedicados a entrenar modelos
+    TRAINING_JOBS_HISTORY = 50          # Trabajos terminados que se conservan para consulta
+    
+    # Escritura agrupada de muestras
+    SAMPLE_COMMIT_WINDOW_SECONDS = 0.002  # Espera del escritor para reunir capturas en un mismo commit
+    SAMPLE_COMMIT_MAX_BATCH = 512         # Muestras por commit como máximo
+    SAMPLE_COMMIT_FSYNC = True            # Forzar a disco cada commit antes de responder
+    BULK_MAX_SAMPLES = 5000               # Muestras aceptadas por petición de ingesta masiva
+    
+    # Caché de señas leídas (DatosManager)
+    SIGN_CACHE_SIZE = 64                # Segmentos (usuario, seña) ya decodificados en memoria (LRU)
+    
+    # Listado y exportación de muestras
+    SAMPLES_PAGE_SIZE = 100             # Muestras por página si no se indica limit
+    SAMPLES_MAX_PAGE_SIZE = 1000        # Máximo de muestras por página
+    EXPORT_CHUNK_SAMPLES = 256          # Muestras por bloque escrito en la exportación NDJSON
+    
+    # Evaluador de expresiones
+    EVALUATE_BATCH_MAX_EXPRESSIONS = 10000  # Expresiones aceptadas por petición en /operaciones/evaluate-batch
+    PROBLEMS_MAX_PAGE = 1000                # Problemas por página en /operaciones/problems
+    PROBLEMS_MAX_STREAM = 1000000           # Problemas por petición con stream=true
+    
+    # Sesiones de expresiones dictadas con señas
+    EXPRESSION_MAX_SESSIONS = 1000          # Sesiones abiertas a la vez
+    EXPRESSION_SESSION_TTL_SECONDS = 1800   # Inactividad antes de descartar una sesión
+    EXPRESSION_MIN_CONFIDENCE = 0.6         # Probabilidad mínima para aceptar una seña como token
+    
+    # Búsqueda de hiperparámetros
+    TUNING_MAX_WORKERS = 2              # Procesos que evalúan candidatos en paralelo
+    TUNING_FOLDS = 3                    # Folds de la validación cruzada
+    TUNING_DEFAULT_BUDGET_SECONDS = 60  # Presupuesto de tiempo si la petición no lo indica
+    TUNING_MAX_BUDGET_SECONDS = 1800    # Presupuesto máximo aceptado
+    TUNING_LATENCY_FRAMES = 200         # Frames con los que se mide la latencia de inferencia
+    
+    # Almacenamiento en memoria (data.json)
+    STORE_COMPACT_EVERY = 200           # Entradas del journal antes de compactar en una instantánea
+    
+    # Reconocimiento en streaming (WebSocket)
+    STREAM_SMOOTHING_ALPHA = 0.35       # Peso del frame nuevo en el suavizado exponencial
+    STREAM_MIN_CONFIDENCE = 0.6         # Probabilidad suavizada mínima para fijar una etiqueta
+    STREAM_MAX_PENDING_FRAMES = 30      # Frames en cola antes de descartar los más antiguos
 
 # Instancia global de configuración
 settings = Settings()
\ No newline at end of file
@@ -1,15 +1,39 @@
 """
 Gestor de datos para el Sistema Inteligente de Reconocimiento de Señas
-Guarda datos en carpetas separadas por categoría
+Guarda datos en carpetas separadas por categoría y, dentro de cada una, por usuario
 """
 
+import asyncio
 import json
 import os
+import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+import numpy as np
+
+from features import CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE, canonical_features
+from config import settings
+from metrics import datos_operation_duration, timed_by_category
+from sample_store import SampleStore, landmarks_to_row, row_to_landmarks
+from sample_writer import GroupCommitWriter
+
+# Manifiesto por usuario con conteos por seña
+MANIFEST_FILE = "_manifest.json"
+
+# Caché de características de entrenamiento anterior a los segmentos de características
+LEGACY_FEATURE_CACHE_DIR = os.path.join("models", "cache")
 
 class DatosManager:
-    """Gestor de datos por categorías separadas"""
+    """Gestor de datos por categorías separadas
+
+    Cada usuario tiene su partición ``datos/<categoría>/<user_id>/`` con un
+    segmento por seña y su propio manifiesto, de modo que leer o escribir los
+    datos de un usuario solo toca su partición. El entrenamiento global y las
+    estadísticas de la categoría recorren la vista combinada de todos los usuarios.
+    """
     
     def __init__(self):
         self.base_dir = "datos"
@@ -21,206 +45,696 @@ class DatosManager:
             "algebraicas": "algebraicas"
         }
         
-        # Crear directorios si no existen
+        # Nombres de archivo seguros para símbolos especiales
+        self.safe_names = {
+            "*": "mult",
+            "/": "div",
+            "=": "equal",
+            "+": "plus",
+            "-": "minus"
+        }
+        
+        self.store = SampleStore()
+        
+        # Manifiestos en memoria por (categoría, usuario) y caché LRU de señas ya leídas
+        self._manifests: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._sign_cache: "OrderedDict[Tuple[str, str], Tuple[Tuple, Dict[str, Any]]]" = OrderedDict()
+        self._sign_cache_size = settings.SIGN_CACHE_SIZE
+        self._sign_cache_lock = threading.Lock()
+        # El escritor actualiza los manifiestos desde su hilo
+        self._manifest_lock = threading.RLock()
+        
+        # Único escritor por categoría (las capturas concurrentes se confirman
+        # juntas); lo crea start() solo en el proceso del servidor
+        self.writer: Optional[GroupCommitWriter] = None
+    
+    def start(self):
+        """Preparar los datos para escribir: directorios, migraciones y escritor
+
+        Lo llama el servidor al arrancar. Los procesos de entrenamiento importan
+        el gestor sin llamarlo, así que solo tienen una vista de lectura y nunca
+        migran ni escriben en paralelo con el servidor.
+        """
+        if self.writer is not None:
+            return
         self._ensure_directories()
+        self.migrate_legacy_json()
+        self.migrate_user_partitions()
+        self.migrate_feature_cache()
+        self.writer = GroupCommitWriter(self._commit_samples)
+    
+    def close(self, timeout: Optional[float] = None):
+        """Confirmar las muestras encoladas y detener el escritor"""
+        if self.writer is not None:
+            self.writer.close(timeout)
+    
+    def _require_writer(self) -> GroupCommitWriter:
+        """Escritor de muestras; sin ``start()`` el gestor es de solo lectura"""
+        if self.writer is None:
+            raise RuntimeError("El gestor de datos no está iniciado: vista de solo lectura")
+        return self.writer
     
     def _ensure_directories(self):
         """Crear directorios de categorías si no existen"""
         for category_dir in self.categories.values():
             os.makedirs(os.path.join(self.base_dir, category_dir), exist_ok=True)
     
-    def save_sample(self, category: str, sign: str, landmarks: List[Dict], user_id: int = 1):
-        """Guardar muestra en archivo específico de la categoría"""
-        try:
-            category_dir = self.categories.get(category)
-            if not category_dir:
-                raise ValueError(f"Categoría '{category}' no válida")
-            
-            # Crear archivo específico para la seña
-            # Manejar caracteres especiales en nombres de archivo de forma consistente
-            safe_sign = sign
-            if sign == "*":
-                safe_sign = "mult"
-            elif sign == "/":
-                safe_sign = "div"
-            elif sign == "=":
-                safe_sign = "equal"
-            elif sign == "+":
-                safe_sign = "plus"
-            elif sign == "-":
-                safe_sign = "minus"
-            
-            filename = f"{safe_sign.lower()}.json"
-            filepath = os.path.join(self.base_dir, category_dir, filename)
-            
-            # Asegurar que el signo original se mantenga en los datos
-            original_sign = sign
+    def _category_path(self, category: str) -> str:
+        """Ruta del directorio de una categoría válida"""
+        category_dir = self.categories.get(category)
+        if not category_dir:
+            raise ValueError(f"Categoría '{category}' no válida")
+        return os.path.join(self.base_dir, category_dir)
+    
+    def _user_path(self, category: str, user_id: int) -> str:
+        """Ruta de la partición de un usuario dentro de una categoría"""
+        return os.path.join(self._category_path(category), str(user_id))
+    
+    def _safe_sign(self, sign: str) -> str:
+        """Manejar caracteres especiales en nombres de archivo de forma consistente"""
+        return self.safe_names.get(sign, sign).lower()
+    
+    def users(self, category: str) -> List[int]:
+        """Usuarios con partición en una categoría, en orden"""
+        category_path = self._category_path(category)
+        if not os.path.isdir(category_path):
+            return []
+        user_ids = []
+        for name in os.listdir(category_path):
+            if os.path.isdir(os.path.join(category_path, name)):
+                try:
+                    user_ids.append(int(name))
+                except ValueError:
+                    continue
+        return sorted(user_ids)
+    
+    def _segments(self, category: str, user_id: int = None) -> Iterator[Tuple[int, str, str]]:
+        """Recorrer (usuario, partición, nombre seguro) en orden de usuario y seña
+
+        Con ``user_id`` solo se lista la partición de ese usuario; sin él se
+        recorre la vista combinada de todos.
+        """
+        user_ids = [user_id] if user_id is not None else self.users(category)
+        for uid in user_ids:
+            user_path = self._user_path(category, uid)
+            for safe_sign in self.store.signs(user_path):
+                yield uid, user_path, safe_sign
+    
+    def migrate_legacy_json(self):
+        """Migrar los archivos <seña>.json heredados al almacenamiento binario"""
+        for category, category_dir in self.categories.items():
+            category_path = os.path.join(self.base_dir, category_dir)
+            for filename in sorted(os.listdir(category_path)):
+                if filename.endswith('.json') and not filename.startswith('_'):
+                    try:
+                        if self.store.migrate_json(category_path, filename):
+                            self._sync_features(category, category_path, filename[:-len('.json')])
+                    except Exception as e:
+                        print(f" Error migrando {category_path}/{filename}: {e}")
+    
+    def migrate_user_partitions(self):
+        """Repartir los segmentos por seña del formato anterior en particiones por usuario
+
+        El original y el manifiesto de la categoría se eliminan al terminar de
+        copiarlo; repetir la migración no duplica ni borra muestras.
+        """
+        for category, category_dir in self.categories.items():
+            category_path = os.path.join(self.base_dir, category_dir)
+            for safe_sign in self.store.signs(category_path):
+                try:
+                    self._partition_sign(category, category_path, safe_sign)
+                except Exception as e:
+                    print(f" Error particionando {category_path}/{safe_sign}: {e}")
             
-            # Cargar datos existentes o crear nuevo
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+            legacy_manifest = os.path.join(category_path, MANIFEST_FILE)
+            if os.path.exists(legacy_manifest) and not self.store.signs(category_path):
+                os.remove(legacy_manifest)
+    
+    def migrate_feature_cache(self):
+        """Retirar las características de entrenamiento de formatos anteriores
+
+        La caché ``models/cache/<categoría>/`` que se llenaba al entrenar quedó
+        sustituida por los segmentos de características que se calculan al
+        ingresar cada muestra; los segmentos de otra versión ya no se leen. Las
+        filas que aún no tienen características (segmentos escritos antes de
+        calcularlas al ingresar) se completan aquí, antes de que arranque el escritor.
+        """
+        if os.path.isdir(LEGACY_FEATURE_CACHE_DIR):
+            shutil.rmtree(LEGACY_FEATURE_CACHE_DIR, ignore_errors=True)
+            print(f" Eliminada la caché de características anterior: {LEGACY_FEATURE_CACHE_DIR}")
+        
+        for category in self.categories:
+            for user_id in self.users(category):
+                user_path = self._user_path(category, user_id)
+                removed = self.store.prune_features(user_path, CANONICAL_FEATURE_VERSION)
+                if removed:
+                    print(f" Eliminados {removed} segmentos de características obsoletos de {category}/{user_id}")
+                for safe_sign in self.store.signs(user_path):
+                    try:
+                        self._sync_features(category, user_path, safe_sign)
+                    except Exception as e:
+                        print(f" Error calculando características de {user_path}/{safe_sign}: {e}")
+    
+    def _partition_sign(self, category: str, category_path: str, safe_sign: str) -> int:
+        """Anexar las muestras de un segmento anterior a la partición de cada usuario
+
+        Las características ya calculadas se copian junto con sus filas. Las
+        particiones existentes nunca se borran: si el segmento reaparece (una
+        copia de seguridad restaurada o una migración interrumpida), solo se
+        anexan las muestras que la partición aún no tiene, reconocidas por su
+        ``created_at`` y ``timestamp``. Devuelve el número de muestras anexadas.
+        """
+        version, width = CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE
+        self._sync_features(category, category_path, safe_sign)
+        header, metas = self.store.read_meta(category_path, safe_sign)
+        count = min(len(metas), self.store.count(category_path, safe_sign))
+        rows = self.store.landmarks(category_path, safe_sign)
+        features = self.store.features(category_path, safe_sign, version, width)
+        
+        by_user: Dict[int, List[int]] = {}
+        for index, meta in enumerate(metas[:count]):
+            by_user.setdefault(int(meta.get("user_id", 1)), []).append(index)
+        
+        appended = 0
+        for user_id, indices in by_user.items():
+            user_path = self._user_path(category, user_id)
+            pending = self._unmigrated(user_path, safe_sign, [metas[index] for index in indices])
+            indices = [indices[position] for position in pending]
+            if not indices:
+                continue
+            # Las características de la partición deben cubrir sus filas antes de anexar las nuevas
+            self._sync_features(category, user_path, safe_sign)
+            start = self.store.count(user_path, safe_sign)
+            user_metas = [
+                {key: value for key, value in metas[index].items() if key != "id"}
+                for index in indices
+            ]
+            self.store.append(user_path, safe_sign, {**header, "user_id": user_id},
+                              rows[indices], user_metas)
+            self.store.write_features(user_path, safe_sign, version, start, features[indices])
+            appended += len(indices)
+        
+        self.store.delete(category_path, safe_sign)
+        print(f" Particionado {category_path}/{safe_sign}: {appended} de {count} muestras de {len(by_user)} usuarios")
+        return appended
+    
+    def _unmigrated(self, user_path: str, safe_sign: str, metas: List[Dict[str, Any]]) -> List[int]:
+        """Posiciones de ``metas`` que la partición todavía no contiene"""
+        present: Dict[Tuple[Any, Any], int] = {}
+        for meta in self.store.iter_meta(user_path, safe_sign):
+            key = (meta.get("created_at"), meta.get("timestamp"))
+            present[key] = present.get(key, 0) + 1
+        
+        pending = []
+        for position, meta in enumerate(metas):
+            key = (meta.get("created_at"), meta.get("timestamp"))
+            if present.get(key, 0) > 0:
+                present[key] -= 1
             else:
-                data = {
-                    "sign": sign,
-                    "category": category,
-                    "samples": [],
-                    "created_at": datetime.now().isoformat(),
-                    "last_updated": datetime.now().isoformat()
-                }
-            
-            # Crear nueva muestra
-            new_sample = {
-                "id": len(data["samples"]) + 1,
-                "landmarks": landmarks,
-                "user_id": user_id,
-                "timestamp": datetime.now().isoformat(),
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Asegurar que el signo en los datos sea el original
-            data["sign"] = original_sign
-            
-            # Agregar muestra
-            data["samples"].append(new_sample)
-            data["last_updated"] = datetime.now().isoformat()
-            data["total_samples"] = len(data["samples"])
-            
-            # Guardar archivo
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, default=str)
-            
-            print(f" Muestra guardada: {category}/{sign} - Total: {len(data['samples'])}")
-            return new_sample
-            
+                pending.append(position)
+        return pending
+    
+    def _manifest_path(self, category: str, user_id: int) -> str:
+        return os.path.join(self._user_path(category, user_id), MANIFEST_FILE)
+    
+    def _build_manifest_entry(self, user_path: str, safe_sign: str) -> Dict[str, Any]:
+        """Reconstruir la entrada de una seña desde su log (sin leer los landmarks)"""
+        header, metas = self.store.read_meta(user_path, safe_sign)
+        count = min(len(metas), self.store.count(user_path, safe_sign))
+        return {
+            "sign": header.get("sign", safe_sign),
+            "samples": count,
+            "last_updated": metas[count - 1].get("created_at") if count else header.get("created_at")
+        }
+    
+    def _save_manifest(self, category: str, user_id: int, manifest: Dict[str, Any]):
+        """Escribir el manifiesto de forma atómica"""
+        path = self._manifest_path(category, user_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def _get_user_manifest(self, category: str, user_id: int) -> Dict[str, Any]:
+        """Manifiesto de un usuario validado contra el tamaño de cada uno de sus segmentos
+
+        Solo se hace un stat por seña del usuario; una entrada que no coincide
+        (o que falta) se reconstruye desde el log de metadatos de esa seña.
+        """
+        with self._manifest_lock:
+            return self._validate_user_manifest(category, user_id)
+    
+    def _validate_user_manifest(self, category: str, user_id: int) -> Dict[str, Any]:
+        user_path = self._user_path(category, user_id)
+        manifest = self._manifests.get((category, user_id))
+        if manifest is None:
+            try:
+                with open(self._manifest_path(category, user_id), 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {"signs": {}}
+        
+        signs = manifest["signs"]
+        present = self.store.signs(user_path)
+        changed = False
+        for safe_sign in present:
+            entry = signs.get(safe_sign)
+            if entry is None or entry["samples"] != self.store.count(user_path, safe_sign):
+                signs[safe_sign] = self._build_manifest_entry(user_path, safe_sign)
+                changed = True
+        for safe_sign in set(signs) - set(present):
+            del signs[safe_sign]
+            changed = True
+        
+        if changed and os.path.isdir(user_path):
+            self._save_manifest(category, user_id, manifest)
+        self._manifests[(category, user_id)] = manifest
+        return manifest
+    
+    def _get_manifest(self, category: str) -> Dict[str, Any]:
+        """Vista global: los manifiestos de todos los usuarios combinados por seña"""
+        signs: Dict[str, Dict[str, Any]] = {}
+        for user_id in self.users(category):
+            for safe_sign, entry in self._get_user_manifest(category, user_id)["signs"].items():
+                combined = signs.setdefault(safe_sign, {
+                    "sign": entry["sign"],
+                    "samples": 0,
+                    "last_updated": None,
+                    "users": {}
+                })
+                combined["samples"] += entry["samples"]
+                combined["users"][str(user_id)] = entry["samples"]
+                last_updated = entry["last_updated"]
+                if last_updated and (not combined["last_updated"] or last_updated > combined["last_updated"]):
+                    combined["last_updated"] = last_updated
+        return {"signs": signs}
+    
+    def _record_saved(self, category: str, user_id: int, safe_sign: str, sign: str,
+                      saved: List[Dict[str, Any]]):
+        """Actualizar el manifiesto del usuario tras anexar muestras a una seña"""
+        with self._manifest_lock:
+            self._apply_saved(category, user_id, safe_sign, sign, saved)
+    
+    def _apply_saved(self, category: str, user_id: int, safe_sign: str, sign: str,
+                     saved: List[Dict[str, Any]]):
+        manifest = self._manifests.get((category, user_id))
+        entry = manifest["signs"].get(safe_sign) if manifest else None
+        if manifest is not None and entry is None and saved[0]["id"] == 1:
+            entry = manifest["signs"][safe_sign] = {"sign": sign, "samples": 0, "last_updated": None}
+        if entry is None or entry["samples"] + len(saved) != saved[-1]["id"]:
+            # Sin manifiesto en memoria o desincronizado: validarlo desde disco
+            self._validate_user_manifest(category, user_id)
+            return
+        
+        entry["sign"] = sign
+        entry["samples"] = saved[-1]["id"]
+        entry["last_updated"] = saved[-1]["created_at"]
+        self._save_manifest(category, user_id, manifest)
+    
+    def get_user_sign_counts(self, category: str, user_id: int) -> Dict[str, int]:
+        """Muestras de un usuario por seña (signo original), leídas de su manifiesto"""
+        return {
+            entry["sign"]: entry["samples"]
+            for entry in self._get_user_manifest(category, user_id)["signs"].values()
+        }
+    
+    def _commit_samples(self, category: str, user_id: int, sign: str, rows: np.ndarray,
+                        metas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Anexar en una sola escritura muestras de un usuario y una seña (lo llama el escritor)"""
+        user_path = self._user_path(category, user_id)
+        safe_sign = self._safe_sign(sign)
+        header = {
+            "sign": sign,
+            "category": category,
+            "user_id": user_id,
+            "created_at": metas[0]["created_at"]
+        }
+        
+        saved = self.store.append(user_path, safe_sign, header, rows, metas, durable=settings.SAMPLE_COMMIT_FSYNC)
+        self._sync_features(category, user_path, safe_sign)
+        self._record_saved(category, user_id, safe_sign, sign, saved)
+        
+        print(f" Muestras guardadas: {category}/{user_id}/{sign} +{len(saved)} - Total: {saved[-1]['id']}")
+        return saved
+    
+    def _submit_sample(self, category: str, sign: str, landmarks: List[Dict], user_id: int):
+        """Validar una muestra y encolarla en el escritor de su categoría"""
+        self._category_path(category)
+        row = landmarks_to_row(landmarks)
+        now = datetime.now().isoformat()
+        meta = {
+            "user_id": user_id,
+            "timestamp": now,
+            "created_at": now
+        }
+        return self._require_writer().submit(category, user_id, sign, row, [meta])
+    
+    @staticmethod
+    def _saved_sample(saved: Dict[str, Any], landmarks: List[Dict], user_id: int) -> Dict[str, Any]:
+        return {
+            "id": saved["id"],
+            "landmarks": landmarks,
+            "user_id": user_id,
+            "timestamp": saved["timestamp"],
+            "created_at": saved["created_at"]
+        }
+    
+    @timed_by_category(datos_operation_duration, "save_sample")
+    def save_sample(self, category: str, sign: str, landmarks: List[Dict], user_id: int = 1):
+        """Guardar muestra anexándola al segmento binario de la seña en la partición del usuario
+
+        Espera al commit agrupado del escritor de la categoría, que asigna el id.
+        """
+        try:
+            saved = self._submit_sample(category, sign, landmarks, user_id).result()[0]
+            return self._saved_sample(saved, landmarks, user_id)
+        
         except Exception as e:
             print(f" Error guardando muestra: {e}")
             raise
     
-    def get_samples(self, category: str, sign: str = None):
-        """Obtener muestras de una categoría o seña específica"""
+    async def save_sample_async(self, category: str, sign: str, landmarks: List[Dict], user_id: int = 1):
+        """Como ``save_sample``, pero espera el commit sin bloquear el event loop
+
+        Así las capturas que llegan mientras tanto entran en el mismo commit.
+        """
+        with datos_operation_duration.time(category, "save_sample"):
+            try:
+                future = self._submit_sample(category, sign, landmarks, user_id)
+                saved = (await asyncio.wrap_future(future))[0]
+                return self._saved_sample(saved, landmarks, user_id)
+            
+            except Exception as e:
+                print(f" Error guardando muestra: {e}")
+                raise
+    
+    async def save_samples_async(self, category: str, user_id: int,
+                                 signs: Dict[str, Tuple[np.ndarray, List[Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Guardar un lote ya validado con una sola escritura por seña
+
+        ``signs`` asocia cada seña a sus filas (N, 63) y al timestamp de captura
+        de cada una (None usa la hora de ingreso). Devuelve los metadatos
+        guardados por seña, con los ids en el orden recibido.
+        """
+        with datos_operation_duration.time(category, "save_samples"):
+            try:
+                self._category_path(category)
+                now = datetime.now().isoformat()
+                futures = {}
+                for sign, (rows, timestamps) in signs.items():
+                    metas = [{
+                        "user_id": user_id,
+                        "timestamp": timestamp or now,
+                        "created_at": now
+                    } for timestamp in timestamps]
+                    futures[sign] = self._require_writer().submit(category, user_id, sign, rows, metas)
+                saved = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures.values()))
+                return dict(zip(futures, saved))
+            
+            except Exception as e:
+                print(f" Error guardando lote de muestras: {e}")
+                raise
+    
+    def _read_sign(self, user_path: str, safe_sign: str) -> Dict[str, Any]:
+        """Datos de una seña, reutilizando la última lectura si los archivos no cambiaron
+
+        Solo se conservan las ``SIGN_CACHE_SIZE`` señas leídas más recientemente.
+        """
+        landmarks_path, meta_path = self.store.paths(user_path, safe_sign)
         try:
-            category_dir = self.categories.get(category)
-            if not category_dir:
-                raise ValueError(f"Categoría '{category}' no válida")
+            landmarks_stat, meta_stat = os.stat(landmarks_path), os.stat(meta_path)
+        except OSError:
+            self._forget_sign(user_path, safe_sign)
+            return self._parse_sign(user_path, safe_sign)
+        
+        key = (landmarks_stat.st_mtime_ns, landmarks_stat.st_size, meta_stat.st_mtime_ns, meta_stat.st_size)
+        with self._sign_cache_lock:
+            cached = self._sign_cache.get((user_path, safe_sign))
+            if cached is not None and cached[0] == key:
+                self._sign_cache.move_to_end((user_path, safe_sign))
+                return cached[1]
+        
+        data = self._parse_sign(user_path, safe_sign)
+        with self._sign_cache_lock:
+            self._sign_cache[(user_path, safe_sign)] = (key, data)
+            self._sign_cache.move_to_end((user_path, safe_sign))
+            while len(self._sign_cache) > self._sign_cache_size:
+                self._sign_cache.popitem(last=False)
+        return data
+    
+    def _forget_sign(self, user_path: str, safe_sign: str):
+        with self._sign_cache_lock:
+            self._sign_cache.pop((user_path, safe_sign), None)
+    
+    def _parse_sign(self, user_path: str, safe_sign: str) -> Dict[str, Any]:
+        """Reconstruir los datos de una seña en el formato de respuesta histórico"""
+        header, metas = self.store.read_meta(user_path, safe_sign)
+        rows = self.store.landmarks(user_path, safe_sign)
+        sign = header.get("sign", safe_sign)
+        
+        samples = []
+        for meta, row in zip(metas, rows):
+            samples.append({
+                **meta,
+                "landmarks": row_to_landmarks(row),
+                "category_name": sign
+            })
+        
+        return {
+            "sign": sign,
+            "category": header.get("category"),
+            "samples": samples,
+            "created_at": header.get("created_at"),
+            "last_updated": samples[-1]["created_at"] if samples else header.get("created_at"),
+            "total_samples": len(samples)
+        }
+    
+    @timed_by_category(datos_operation_duration, "get_samples")
+    def get_samples(self, category: str, sign: str = None, user_id: int = None):
+        """Obtener muestras de una categoría o seña específica
+
+        Sin ``user_id`` se combinan las particiones de todos los usuarios.
+        """
+        try:
+            safe_filter = self._safe_sign(sign) if sign else None
+            parts = [
+                self._read_sign(user_path, safe_sign)
+                for _, user_path, safe_sign in self._segments(category, user_id)
+                if safe_filter is None or safe_sign == safe_filter
+            ]
+            all_samples = [sample for part in parts for sample in part["samples"]]
             
-            if sign:
-                # Obtener muestras de una seña específica
-                # Manejar caracteres especiales en nombres de archivo de forma consistente
-                safe_sign = sign
-                if sign == "*":
-                    safe_sign = "mult"
-                elif sign == "/":
-                    safe_sign = "div"
-                elif sign == "=":
-                    safe_sign = "equal"
-                elif sign == "+":
-                    safe_sign = "plus"
-                elif sign == "-":
-                    safe_sign = "minus"
-                
-                filename = f"{safe_sign.lower()}.json"
-                filepath = os.path.join(self.base_dir, category_dir, filename)
-                
-                if os.path.exists(filepath):
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        return json.load(f)
-                else:
-                    return {"samples": [], "total_samples": 0}
-            else:
-                # Obtener todas las muestras de la categoría
-                all_samples = []
-                category_path = os.path.join(self.base_dir, category_dir)
-                
-                for filename in os.listdir(category_path):
-                    if filename.endswith('.json'):
-                        filepath = os.path.join(category_path, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            all_samples.extend(data.get("samples", []))
-                
-                return {"samples": all_samples, "total_samples": len(all_samples)}
-                
+            if sign and parts:
+                # Una seña concreta conserva el formato de respuesta histórico
+                return {
+                    "sign": parts[0]["sign"],
+                    "category": parts[0]["category"],
+                    "samples": all_samples,
+                    "created_at": min(part["created_at"] or "" for part in parts) or None,
+                    "last_updated": max(part["last_updated"] or "" for part in parts) or None,
+                    "total_samples": len(all_samples)
+                }
+            return {"samples": all_samples, "total_samples": len(all_samples)}
+        
         except Exception as e:
             print(f" Error obteniendo muestras: {e}")
             return {"samples": [], "total_samples": 0}
     
-    def get_category_stats(self, category: str):
-        """Obtener estadísticas de una categoría"""
+    @staticmethod
+    def parse_cursor(cursor: str) -> Tuple[int, str, int]:
+        """Separar un cursor "<usuario>:<seña>:<id>" en (usuario, nombre seguro, id); ValueError si no es válido"""
+        user_id, _, rest = cursor.partition(":")
+        safe_sign, _, sample_id = rest.rpartition(":")
+        if not safe_sign or not sample_id.isdigit() or not user_id.lstrip("-").isdigit():
+            raise ValueError(f"Cursor '{cursor}' no válido")
+        return int(user_id), safe_sign, int(sample_id)
+    
+    def iter_samples(self, category: str, user_id: int = None, sign: str = None,
+                     cursor: str = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Recorrer (cursor, muestra) en orden de usuario, seña e id, leyendo una muestra a la vez
+
+        El cursor de cada muestra permite retomar el recorrido justo después de
+        ella. Con ``user_id`` solo se lee la partición de ese usuario.
+        """
+        after_user, after_sign, after_id = self.parse_cursor(cursor) if cursor else (None, "", 0)
+        safe_filter = self._safe_sign(sign) if sign else None
+        
+        for uid, user_path, safe_sign in self._segments(category, user_id):
+            if safe_filter is not None and safe_sign != safe_filter:
+                continue
+            if after_user is not None and (uid, safe_sign) < (after_user, after_sign):
+                continue
+            start_id = after_id if (uid, safe_sign) == (after_user, after_sign) else 0
+            name = self.store.read_header(user_path, safe_sign).get("sign", safe_sign)
+            rows = self.store.landmarks(user_path, safe_sign)
+            for meta in self.store.iter_meta(user_path, safe_sign):
+                sample_id = meta["id"]
+                if sample_id <= start_id:
+                    continue
+                if sample_id > len(rows):
+                    # Metadatos de una fila que aún no está completa en el segmento
+                    break
+                yield f"{uid}:{safe_sign}:{sample_id}", {
+                    **meta,
+                    "landmarks": row_to_landmarks(rows[sample_id - 1]),
+                    "category_name": name
+                }
+    
+    @timed_by_category(datos_operation_duration, "list_samples")
+    def list_samples(self, category: str, user_id: int = None, sign: str = None,
+                     cursor: str = None, limit: int = 100) -> Dict[str, Any]:
+        """Una página de muestras y el cursor de la siguiente (None si no hay más)"""
+        samples = []
+        last_cursor = None
+        for sample_cursor, sample in self.iter_samples(category, user_id, sign, cursor):
+            if len(samples) == limit:
+                return {"samples": samples, "next_cursor": last_cursor}
+            samples.append(sample)
+            last_cursor = sample_cursor
+        return {"samples": samples, "next_cursor": None}
+    
+    def _sync_features(self, category: str, sign_path: str, safe_sign: str) -> int:
+        """Calcular las características canónicas de las filas que aún no las tienen
+
+        Al ingresar una muestra solo falta su propia fila; segmentos migrados o
+        escritos por una versión anterior se completan al arrancar. Es la caché
+        incremental de características: como los segmentos son de solo anexado,
+        nunca se recalcula una fila; borrar la seña borra también sus
+        características y otra versión de características usa otro archivo.
+        Solo la llaman las migraciones y el hilo del escritor de la categoría:
+        el archivo se trunca y se anexa sin lock, nadie más debe escribirlo.
+        Devuelve el número de filas calculadas.
+        """
+        version, width = CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE
+        total = self.store.count(sign_path, safe_sign)
+        done = self.store.feature_count(sign_path, safe_sign, version, width)
+        if done == total:
+            return 0
+        start = min(done, total)
+        with datos_operation_duration.time(category, "compute_features"):
+            rows = self.store.landmarks(sign_path, safe_sign)[start:total]
+            self.store.write_features(sign_path, safe_sign, version, start, canonical_features(rows))
+        return total - start
+    
+    def iter_feature_segments(self, category: str,
+                              user_id: int = None) -> Iterator[Tuple[int, str, str, np.ndarray]]:
+        """Recorrer (usuario, nombre seguro, id del segmento, características mapeadas en memoria)
+
+        Hay un segmento por usuario y seña; sin ``user_id`` se recorren los de
+        todos los usuarios (la vista del entrenamiento global). Solo lee: lo
+        usan los procesos de entrenamiento mientras el escritor del servidor
+        anexa, de modo que se toman las filas que ya tienen características.
+        """
+        for uid, user_path, safe_sign in self._segments(category, user_id):
+            header = self.store.read_header(user_path, safe_sign)
+            features = self.store.features(
+                user_path, safe_sign, CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE
+            )
+            count = min(self.store.count(user_path, safe_sign), len(features))
+            yield uid, safe_sign, header.get("created_at", ""), features[:count]
+    
+    def iter_landmark_segments(self, category: str,
+                               user_id: int = None) -> Iterator[Tuple[int, str, str, np.ndarray]]:
+        """Recorrer (usuario, nombre seguro, id del segmento, matriz (N, 63) mapeada en memoria)
+
+        El id del segmento es su fecha de creación: cambia si la seña se elimina y se recrea.
+        """
+        for uid, user_path, safe_sign in self._segments(category, user_id):
+            header = self.store.read_header(user_path, safe_sign)
+            yield uid, safe_sign, header.get("created_at", ""), self.store.landmarks(user_path, safe_sign)
+    
+    @timed_by_category(datos_operation_duration, "get_category_stats")
+    def get_category_stats(self, category: str, user_id: int = None):
+        """Obtener estadísticas de una categoría desde los manifiestos de sus usuarios
+
+        Con ``user_id`` se añaden los conteos de ese usuario por seña y en total.
+        """
         try:
             category_dir = self.categories.get(category)
             if not category_dir:
                 return {"error": f"Categoría '{category}' no válida"}
             
-            category_path = os.path.join(self.base_dir, category_dir)
             stats = {
                 "category": category,
                 "signs": {},
                 "total_samples": 0,
                 "last_updated": None
             }
+            if user_id is not None:
+                stats["user_total_samples"] = 0
             
-            if os.path.exists(category_path):
-                for filename in os.listdir(category_path):
-                    if filename.endswith('.json'):
-                        filepath = os.path.join(category_path, filename)
-                        
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        # Usar el signo original del archivo, no el nombre del archivo
-                        sign_name = data.get("sign", filename.replace('.json', ''))
-                            
-                        stats["signs"][sign_name] = {
-                            "samples": len(data.get("samples", [])),
-                            "last_updated": data.get("last_updated")
-                        }
-                        stats["total_samples"] += len(data.get("samples", []))
-                        
-                        # Actualizar última actualización
-                        if not stats["last_updated"] or data.get("last_updated", "") > stats["last_updated"]:
-                            stats["last_updated"] = data.get("last_updated")
+            for entry in self._get_manifest(category)["signs"].values():
+                last_updated = entry["last_updated"]
+                
+                # Usar el signo original guardado en la cabecera, no el nombre del archivo
+                sign_stats = {
+                    "samples": entry["samples"],
+                    "last_updated": last_updated
+                }
+                if user_id is not None:
+                    sign_stats["user_samples"] = entry["users"].get(str(user_id), 0)
+                    stats["user_total_samples"] += sign_stats["user_samples"]
+                
+                stats["signs"][entry["sign"]] = sign_stats
+                stats["total_samples"] += entry["samples"]
+                
+                # Actualizar última actualización
+                if last_updated and (not stats["last_updated"] or last_updated > stats["last_updated"]):
+                    stats["last_updated"] = last_updated
             
             return stats
-            
+        
         except Exception as e:
             print(f" Error obteniendo estadísticas: {e}")
             return {"error": str(e)}
     
-    def delete_sign_samples(self, category: str, sign: str):
-        """Eliminar todas las muestras de una seña específica"""
+    def _delete_sign(self, category: str, sign: str, user_id: int = None) -> bool:
+        """Borrar los segmentos de una seña (lo ejecuta el escritor de la categoría)"""
+        safe_sign = self._safe_sign(sign)
+        user_ids = [user_id] if user_id is not None else self.users(category)
+        
+        deleted = False
+        for uid in user_ids:
+            user_path = self._user_path(category, uid)
+            if not self.store.exists(user_path, safe_sign):
+                continue
+            deleted = self.store.delete(user_path, safe_sign) or deleted
+            self._forget_sign(user_path, safe_sign)
+            with self._manifest_lock:
+                manifest = self._manifests.get((category, uid))
+                if manifest is not None and manifest["signs"].pop(safe_sign, None) is not None:
+                    self._save_manifest(category, uid, manifest)
+        
+        if deleted:
+            print(f" Eliminadas todas las muestras de {category}/{sign}")
+        else:
+            print(f"No se encontraron muestras para {category}/{sign}")
+        return deleted
+    
+    def _submit_delete(self, category: str, sign: str, user_id: int = None):
+        """Encolar el borrado en el escritor para que no se cruce con un commit en curso"""
+        self._category_path(category)
+        return self._require_writer().run(category, lambda: self._delete_sign(category, sign, user_id))
+    
+    @timed_by_category(datos_operation_duration, "delete_sign_samples")
+    def delete_sign_samples(self, category: str, sign: str, user_id: int = None):
+        """Eliminar las muestras de una seña específica (de un usuario o de todos)"""
         try:
-            category_dir = self.categories.get(category)
-            if not category_dir:
-                raise ValueError(f"Categoría '{category}' no válida")
-            
-            # Manejar caracteres especiales en nombres de archivo de forma consistente
-            safe_sign = sign
-            if sign == "*":
-                safe_sign = "mult"
-            elif sign == "/":
-                safe_sign = "div"
-            elif sign == "=":
-                safe_sign = "equal"
-            elif sign == "+":
-                safe_sign = "plus"
-            elif sign == "-":
-                safe_sign = "minus"
-            
-            filename = f"{safe_sign.lower()}.json"
-            filepath = os.path.join(self.base_dir, category_dir, filename)
-            
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                print(f" Eliminadas todas las muestras de {category}/{sign}")
-                return True
-            else:
-                print(f"No se encontraron muestras para {category}/{sign}")
-                return False
-                
+            return self._submit_delete(category, sign, user_id).result()
+        
         except Exception as e:
             print(f" Error eliminando muestras: {e}")
             return False
+    
+    async def delete_sign_samples_async(self, category: str, sign: str, user_id: int = None):
+        """Como ``delete_sign_samples``, pero espera al escritor sin bloquear el event loop"""
+        with datos_operation_duration.time(category, "delete_sign_samples"):
+            try:
+                return await asyncio.wrap_future(self._submit_delete(category, sign, user_id))
+            
+            except Exception as e:
+                print(f" Error eliminando muestras: {e}")
+                return False
 
 # Instancia global
 datos_manager = DatosManager()
@@ -0,0 +1,112 @@
+"""
+Sesiones de expresiones dictadas con señas para el Sistema Inteligente de Reconocimiento de Señas
+Cada sesión consume tokens reconocidos por los modelos de números y operaciones
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from math_evaluator import ExpressionSession
+
+# Modelos cuyos tokens forman una expresión
+EXPRESSION_CATEGORIES = ("numeros", "operaciones")
+
+
+class ExpressionSessionManager:
+    """Sesiones activas por id, con límite de tamaño y caducidad por inactividad"""
+
+    def __init__(self, max_sessions: int = settings.EXPRESSION_MAX_SESSIONS,
+                 ttl_seconds: float = settings.EXPRESSION_SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        """Descartar las sesiones inactivas y las más antiguas si se supera el límite (con el lock tomado)"""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - entry["last_used"] < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def create(self, user_id: int) -> Dict[str, Any]:
+        """Abrir una sesión nueva y devolver su estado inicial"""
+        session_id = uuid.uuid4().hex
+        session = ExpressionSession()
+        with self._lock:
+            self._sessions[session_id] = {
+                "session": session,
+                "user_id": user_id,
+                "last_used": time.monotonic()
+            }
+            self._expire()
+        return {"session_id": session_id, **session.state()}
+
+    def get(self, session_id: str, user_id: int) -> Optional[ExpressionSession]:
+        """Sesión de un usuario (None si no existe o caducó); cuenta como actividad"""
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(session_id)
+            if entry is None or entry["user_id"] != user_id:
+                return None
+            entry["last_used"] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return entry["session"]
+
+    def delete(self, session_id: str, user_id: int) -> bool:
+        """Cerrar una sesión"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry["user_id"] != user_id:
+                return False
+            del self._sessions[session_id]
+            return True
+
+    def push_tokens(self, session: ExpressionSession, tokens: List[str]) -> List[Dict[str, Any]]:
+        """Consumir tokens ya reconocidos; devuelve el estado tras cada uno"""
+        return [session.push(token) for token in tokens]
+
+    def push_landmarks(self, session: ExpressionSession, landmarks: List,
+                       category: Optional[str] = None, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Reconocer una seña y consumirla como token
+
+        Sin ``category`` se consultan los dos modelos y se elige la clase más
+        probable entre las que la expresión admite en esta posición (tras un
+        operador solo compiten los dígitos, por ejemplo). Con ``user_id`` se
+        usan sus modelos personales cuando los tiene.
+        """
+        from ml_model import model_for
+
+        best = None
+        for name in ([category] if category else EXPRESSION_CATEGORIES):
+            model = model_for(name, user_id)
+            if not model.is_trained:
+                continue
+            probabilities, valid_indices, active = model.predict_proba_batch([landmarks])
+            if not valid_indices:
+                continue
+            for label, probability in zip(active.classes, probabilities[0]):
+                symbol = model.symbol_mapping.get(str(label), str(label))
+                if session.accepts(symbol) and (best is None or probability > best["confidence"]):
+                    best = {
+                        "prediction": symbol,
+                        "confidence": float(probability),
+                        "category": name,
+                        "model_version": active.version
+                    }
+
+        if best is None:
+            return {"recognition": None, **session.state(error="Ninguna seña reconocida es válida en esta posición")}
+        if best["confidence"] < settings.EXPRESSION_MIN_CONFIDENCE:
+            return {"recognition": best, **session.state(error="Confianza insuficiente")}
+        return {"recognition": best, **session.push(best["prediction"])}
+
+
+# Instancia global
+expression_sessions = ExpressionSessionManager()
@@ -0,0 +1,207 @@
+"""
+Extracción vectorizada de características a partir de landmarks de la mano
+"""
+
+import re
+from operator import attrgetter, itemgetter
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+
+# 21 landmarks * 3 coordenadas (x, y, z)
+LANDMARKS_PER_SAMPLE = 21
+FEATURES_PER_SAMPLE = LANDMARKS_PER_SAMPLE * 3
+
+# Formato heredado "x=0.5 y=0.5 z=0.0" (str() de un Landmark), precompilado una sola vez
+LEGACY_LANDMARK_RE = re.compile(r'x=([\d.eE+-]+)\s+y=([\d.eE+-]+)\s+z=([\d.eE+-]+)')
+
+_get_xyz_item = itemgetter('x', 'y', 'z')
+_get_xyz_attr = attrgetter('x', 'y', 'z')
+
+
+def _landmark_triple(landmark: Any) -> Tuple[Any, Any, Any]:
+    """Ruta lenta: convertir un landmark de cualquier formato soportado"""
+    if isinstance(landmark, dict):
+        return landmark.get('x', 0), landmark.get('y', 0), landmark.get('z', 0)
+    if isinstance(landmark, str):
+        match = LEGACY_LANDMARK_RE.search(landmark)
+        if not match:
+            raise ValueError(f"Landmark con formato no válido: {landmark!r}")
+        return match.groups()
+    return _get_xyz_attr(landmark)
+
+
+def _sample_triples(landmarks: Sequence[Any]) -> List[Tuple[Any, Any, Any]]:
+    """Convertir los landmarks de una muestra a tripletas (x, y, z)"""
+    first = landmarks[0]
+    try:
+        if isinstance(first, dict):
+            # Ruta estructurada: todos los landmarks son dicts con x, y, z
+            return list(map(_get_xyz_item, landmarks))
+        if isinstance(first, str):
+            # Ruta rápida del formato heredado: un solo findall sobre la muestra completa
+            triples = LEGACY_LANDMARK_RE.findall(" ".join(landmarks))
+            if len(triples) == len(landmarks):
+                return triples
+        else:
+            return list(map(_get_xyz_attr, landmarks))
+    except (KeyError, TypeError, AttributeError):
+        pass
+    # Formatos mezclados o incompletos
+    return [_landmark_triple(landmark) for landmark in landmarks]
+
+
+def extract_landmark_batch(samples: Sequence[Sequence[Any]]) -> Tuple[np.ndarray, List[int]]:
+    """Convertir N muestras de landmarks en una matriz (M, 63) float32
+
+    Devuelve la matriz con las muestras válidas (en el orden original) y los
+    índices de las muestras rechazadas por tamaño, formato o valores no finitos.
+    """
+    if isinstance(samples, np.ndarray):
+        # Frames ya decodificados del formato compacto: matriz (N, 63)
+        X = np.asarray(samples, dtype=np.float32).reshape(-1, FEATURES_PER_SAMPLE)
+        finite = np.isfinite(X).all(axis=1)
+        return X[finite], np.flatnonzero(~finite).tolist()
+
+    valid = []
+    rejected = []
+
+    for index, landmarks in enumerate(samples):
+        if isinstance(landmarks, np.ndarray):
+            # Fila plana de 63 valores (formato compacto)
+            if landmarks.size != FEATURES_PER_SAMPLE:
+                rejected.append(index)
+            else:
+                valid.append(landmarks.reshape(LANDMARKS_PER_SAMPLE, 3))
+            continue
+        if not isinstance(landmarks, (list, tuple)) or len(landmarks) != LANDMARKS_PER_SAMPLE:
+            rejected.append(index)
+            continue
+        try:
+            valid.append(_sample_triples(landmarks))
+        except (ValueError, TypeError, AttributeError):
+            rejected.append(index)
+
+    if not valid:
+        return np.empty((0, FEATURES_PER_SAMPLE), dtype=np.float32), rejected
+
+    try:
+        X = np.array(valid, dtype=np.float32).reshape(len(valid), FEATURES_PER_SAMPLE)
+    except (ValueError, TypeError):
+        # Algún valor no numérico: convertir fila por fila para aislarlo
+        return _extract_rows_individually(samples, valid, rejected)
+
+    finite = np.isfinite(X).all(axis=1)
+    if not finite.all():
+        X, rejected = _drop_rows(X, finite, samples, rejected)
+
+    return X, rejected
+
+
+def _valid_indices(n_samples: int, rejected: List[int]) -> List[int]:
+    """Índices originales de las muestras que no fueron rechazadas"""
+    rejected_set = set(rejected)
+    return [i for i in range(n_samples) if i not in rejected_set]
+
+
+def _drop_rows(X: np.ndarray, keep: np.ndarray, samples: Sequence[Any],
+               rejected: List[int]) -> Tuple[np.ndarray, List[int]]:
+    """Quitar filas de X y registrar su índice original como rechazado"""
+    indices = _valid_indices(len(samples), rejected)
+    rejected = sorted(rejected + [i for i, ok in zip(indices, keep) if not ok])
+    return X[keep], rejected
+
+
+def _extract_rows_individually(samples: Sequence[Any], valid: List[Any],
+                               rejected: List[int]) -> Tuple[np.ndarray, List[int]]:
+    """Conversión fila por fila cuando la conversión en bloque falla"""
+    rows = []
+    keep = []
+    for triples in valid:
+        try:
+            rows.append(np.array(triples, dtype=np.float32).reshape(FEATURES_PER_SAMPLE))
+            keep.append(True)
+        except (ValueError, TypeError):
+            rows.append(np.zeros(FEATURES_PER_SAMPLE, dtype=np.float32))
+            keep.append(False)
+    X = np.vstack(rows)
+    keep = np.array(keep) & np.isfinite(X).all(axis=1)
+    return _drop_rows(X, keep, samples, rejected)
+
+
+# Versiones de la representación que recibe el clasificador
+RAW_FEATURE_VERSION = "raw-63-f32"
+CANONICAL_FEATURE_VERSION = "canon-v1"
+
+# Índices de MediaPipe Hands
+WRIST = 0
+INDEX_MCP = 5
+MIDDLE_MCP = 9
+PINKY_MCP = 17
+FINGERTIPS = (4, 8, 12, 16, 20)
+# Cadenas muñeca -> punta de cada dedo (pulgar, índice, medio, anular, meñique)
+FINGER_CHAINS = np.array([
+    [0, 1, 2, 3, 4],
+    [0, 5, 6, 7, 8],
+    [0, 9, 10, 11, 12],
+    [0, 13, 14, 15, 16],
+    [0, 17, 18, 19, 20],
+])
+_TIP_PAIRS = np.array([(a, b) for i, a in enumerate(FINGERTIPS) for b in FINGERTIPS[i + 1:]])
+
+# 20 landmarks relativos * 3 + 10 distancias entre puntas + 15 ángulos de articulación + 4 entre dedos
+CANONICAL_FEATURES_PER_SAMPLE = (LANDMARKS_PER_SAMPLE - 1) * 3 + len(_TIP_PAIRS) + 15 + 4
+
+
+def _angles(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Ángulo en radianes entre pares de vectores (último eje = coordenadas)"""
+    dot = (u * v).sum(axis=-1)
+    norms = np.linalg.norm(u, axis=-1) * np.linalg.norm(v, axis=-1)
+    return np.arccos(np.clip(dot / np.where(norms > 0, norms, 1.0), -1.0, 1.0))
+
+
+def canonical_features(rows: np.ndarray, mirror: bool = True) -> np.ndarray:
+    """Representación canónica de la pose de la mano a partir de filas (N, 63)
+
+    - coordenadas relativas a la muñeca y divididas por la distancia
+      muñeca -> base del dedo medio (independiente de posición y escala)
+    - con ``mirror`` las manos de quiralidad negativa se reflejan en x, de modo
+      que la mano izquierda y la derecha producen la misma representación
+    - distancias entre las cinco puntas de los dedos
+    - ángulos de flexión de cada articulación y ángulos entre dedos vecinos
+    """
+    points = np.asarray(rows, dtype=np.float32).reshape(-1, LANDMARKS_PER_SAMPLE, 3)
+    relative = points - points[:, WRIST:WRIST + 1]
+
+    scale = np.linalg.norm(relative[:, MIDDLE_MCP], axis=1)
+    relative = relative / np.where(scale > 0, scale, 1.0)[:, np.newaxis, np.newaxis]
+
+    if mirror:
+        # Signo de la normal de la palma (índice x meñique) en el plano de la imagen
+        index_mcp, pinky_mcp = relative[:, INDEX_MCP], relative[:, PINKY_MCP]
+        chirality = index_mcp[:, 0] * pinky_mcp[:, 1] - index_mcp[:, 1] * pinky_mcp[:, 0]
+        relative[chirality < 0, :, 0] *= -1
+
+    tip_distances = np.linalg.norm(relative[:, _TIP_PAIRS[:, 0]] - relative[:, _TIP_PAIRS[:, 1]], axis=-1)
+
+    bones = relative[:, FINGER_CHAINS[:, 1:]] - relative[:, FINGER_CHAINS[:, :-1]]   # (N, 5, 4, 3)
+    joint_angles = _angles(bones[:, :, :-1], bones[:, :, 1:]).reshape(len(relative), 15)
+
+    directions = relative[:, FINGER_CHAINS[:, -1]] - relative[:, FINGER_CHAINS[:, 1]]  # base -> punta
+    spread_angles = _angles(directions[:, :-1], directions[:, 1:])
+
+    return np.hstack([
+        relative[:, 1:].reshape(len(relative), (LANDMARKS_PER_SAMPLE - 1) * 3),
+        tip_distances,
+        joint_angles,
+        spread_angles
+    ]).astype(np.float32)
+
+
+def features_for_version(rows: np.ndarray, version: str) -> np.ndarray:
+    """Características (N, F) que espera un modelo entrenado con ``version``"""
+    if version == CANONICAL_FEATURE_VERSION:
+        return canonical_features(rows)
+    if version == RAW_FEATURE_VERSION:
+        return np.asarray(rows, dtype=np.float32)
+    raise ValueError(f"Versión de características '{version}' no soportada")
@@ -2,8 +2,412 @@
 Evaluador de expresiones matemáticas para el sistema de reconocimiento de señas
 """
 
+import math
+import operator
 import re
-from typing import Union, List, Dict, Any
+from functools import lru_cache
+from typing import Union, List, Dict, Any, Iterator, Tuple
+
+import numpy as np
+
+# Expresiones compiladas que se conservan en la caché LRU
+COMPILED_CACHE_SIZE = 4096
+
+# Exponente máximo aceptado por "^" (evita resultados gigantes que bloquean el proceso)
+MAX_EXPONENT = 1000
+
+# Tamaño máximo en bits de un resultado entero (~3000 cifras, por debajo del límite de int -> str)
+MAX_INTEGER_BITS = 10000
+
+# Números, operadores (con "**" como sinónimo de "^") y paréntesis
+TOKEN_RE = re.compile(r'(\d+\.?\d*|\.\d+)|(\*\*|[-+*/^()])')
+
+# Precedencia y asociatividad de los operadores binarios
+BINARY_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 4}
+RIGHT_ASSOCIATIVE = {'^'}
+# Los signos unarios ligan menos que "^" (-2^2 = -4) y más que "*"
+UNARY_PRECEDENCE = 3
+
+# Instrucciones del programa en notación polaca inversa
+UNARY_MINUS = 'neg'
+UNARY_PLUS = 'pos'
+
+
+class ExpressionError(ValueError):
+    """Expresión mal formada"""
+
+
+def tokenize(expression: str) -> List[Union[int, float, str]]:
+    """Dividir la expresión (sin espacios) en números, operadores y paréntesis"""
+    tokens = []
+    position = 0
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if match is None:
+            raise ExpressionError(f"Carácter inesperado '{expression[position]}' en la posición {position}")
+        number, symbol = match.groups()
+        if number is not None:
+            tokens.append(float(number) if '.' in number else int(number))
+        else:
+            tokens.append('^' if symbol == '**' else symbol)
+        position = match.end()
+    return tokens
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def compile_expression(expression: str) -> Tuple[Union[int, float, str], ...]:
+    """Compilar la expresión a un programa RPN con el algoritmo shunting-yard
+
+    El programa es una tupla de números y operadores; el resultado queda en
+    caché para que evaluar de nuevo la misma expresión no vuelva a analizarla.
+    """
+    output: List[Union[int, float, str]] = []
+    stack: List[str] = []
+    expect_operand = True
+    
+    def pop_while(precedence: int, right_associative: bool):
+        while stack and stack[-1] != '(':
+            top = stack[-1]
+            top_precedence = UNARY_PRECEDENCE if top in (UNARY_MINUS, UNARY_PLUS) else BINARY_PRECEDENCE[top]
+            if top_precedence > precedence or (top_precedence == precedence and not right_associative):
+                output.append(stack.pop())
+            else:
+                break
+    
+    for token in tokenize(expression):
+        if not isinstance(token, str):
+            if not expect_operand:
+                raise ExpressionError("Falta un operador entre dos números")
+            output.append(token)
+            expect_operand = False
+        elif token == '(':
+            if not expect_operand:
+                raise ExpressionError("Falta un operador antes de '('")
+            stack.append(token)
+        elif token == ')':
+            if expect_operand:
+                raise ExpressionError("Se esperaba un número antes de ')'")
+            while stack and stack[-1] != '(':
+                output.append(stack.pop())
+            if not stack:
+                raise ExpressionError("Paréntesis sin abrir")
+            stack.pop()
+        elif expect_operand:
+            if token not in ('+', '-'):
+                raise ExpressionError(f"Se esperaba un número antes de '{token}'")
+            # Signo unario: solo se apila, se aplica al operando que sigue
+            stack.append(UNARY_MINUS if token == '-' else UNARY_PLUS)
+        else:
+            pop_while(BINARY_PRECEDENCE[token], token in RIGHT_ASSOCIATIVE)
+            stack.append(token)
+            expect_operand = True
+    
+    if expect_operand:
+        raise ExpressionError("Expresión incompleta")
+    while stack:
+        token = stack.pop()
+        if token == '(':
+            raise ExpressionError("Paréntesis sin cerrar")
+        output.append(token)
+    return tuple(output)
+
+
+def _power(x, y):
+    if abs(y) > MAX_EXPONENT:
+        raise OverflowError(f"Exponente mayor que {MAX_EXPONENT}")
+    # Estimar el tamaño de un resultado entero antes de calcularlo: |y|·log2|x| bits
+    if isinstance(x, int) and isinstance(y, int) and y > 0 and abs(x) > 1:
+        if y * math.log2(abs(x)) > MAX_INTEGER_BITS:
+            raise OverflowError(f"El resultado supera {MAX_INTEGER_BITS} bits")
+    return operator.pow(x, y)
+
+
+BINARY_OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '^': _power
+}
+
+
+def run_program(program: Tuple[Union[int, float, str], ...]) -> Union[int, float]:
+    """Evaluar un programa RPN con una pila"""
+    stack: List[Union[int, float]] = []
+    for instruction in program:
+        if not isinstance(instruction, str):
+            stack.append(instruction)
+        elif instruction == UNARY_MINUS:
+            stack[-1] = -stack[-1]
+        elif instruction == UNARY_PLUS:
+            pass
+        else:
+            right = stack.pop()
+            stack[-1] = BINARY_OPERATIONS[instruction](stack[-1], right)
+    result = stack[0]
+    if isinstance(result, complex):
+        raise ValueError("El resultado no es un número real")
+    if isinstance(result, int) and result.bit_length() > MAX_INTEGER_BITS:
+        # Productos de potencias grandes: el resultado no se podría serializar
+        raise OverflowError(f"El resultado supera {MAX_INTEGER_BITS} bits")
+    return result
+
+
+# Tokens que reconoce una sesión: dígitos, operadores y los nombres internos de las señas
+SESSION_SYMBOLS = {str(digit): str(digit) for digit in range(10)}
+SESSION_SYMBOLS.update({symbol: symbol for symbol in "+-*/^()="})
+SESSION_SYMBOLS.update({"plus": "+", "minus": "-", "mult": "*", "div": "/", "equal": "="})
+
+
+class ExpressionSession:
+    """Evaluación incremental de una expresión que llega token a token
+
+    Los dígitos consecutivos forman un solo número. Los operadores pendientes se
+    reducen con la misma precedencia que ``compile_expression`` en cuanto llega
+    uno de menor o igual precedencia, así que cada token se apila y se reduce
+    una sola vez (O(1) amortizado). El valor actual pliega solo los operadores
+    pendientes: como mucho uno por nivel de precedencia y paréntesis abierto.
+    Tras "=" la expresión queda cerrada y el siguiente token empieza otra.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Empezar una expresión nueva"""
+        self.values: List[Union[int, float]] = []
+        self.operators: List[str] = []
+        self.symbols: List[str] = []
+        self.expect_operand = True
+        self.in_number = False
+        self.complete = False
+        self.result: Union[int, float, None] = None
+    
+    @staticmethod
+    def normalize(token: str) -> Union[str, None]:
+        """Símbolo de un token ("7", "+", "mult", ...) o None si no se reconoce"""
+        return SESSION_SYMBOLS.get(str(token).strip())
+    
+    def accepts(self, token: str) -> bool:
+        """Indica si el token es válido en la posición actual (sin consumirlo)"""
+        symbol = self.normalize(token)
+        if symbol is None:
+            return False
+        if self.complete:
+            return symbol.isdigit() or symbol in "(-+"
+        if symbol.isdigit() or symbol == '(':
+            return self.expect_operand or (symbol.isdigit() and self.in_number)
+        if symbol in ('+', '-'):
+            return True
+        if symbol == ')':
+            return not self.expect_operand and '(' in self.operators
+        return not self.expect_operand
+    
+    def _apply(self, values: List[Union[int, float]], op: str):
+        """Aplicar un operador sobre la cima de ``values`` (no modifica nada si falla)"""
+        if op == UNARY_MINUS:
+            values[-1] = -values[-1]
+        elif op != UNARY_PLUS:
+            result = BINARY_OPERATIONS[op](values[-2], values[-1])
+            if isinstance(result, complex):
+                raise ValueError("El resultado no es un número real")
+            values.pop()
+            values[-1] = result
+    
+    def _reduce(self, precedence: int, right_associative: bool):
+        """Reducir los operadores pendientes que ligan más que el que llega"""
+        while self.operators and self.operators[-1] != '(':
+            top = self.operators[-1]
+            top_precedence = UNARY_PRECEDENCE if top in (UNARY_MINUS, UNARY_PLUS) else BINARY_PRECEDENCE[top]
+            if top_precedence < precedence or (top_precedence == precedence and right_associative):
+                break
+            self._apply(self.values, top)
+            self.operators.pop()
+    
+    def push(self, token: str) -> Dict[str, Any]:
+        """Consumir un token y devolver el estado con el valor actual"""
+        symbol = self.normalize(token)
+        if symbol is None:
+            return self.state(token, error=f"Token '{token}' no reconocido")
+        if not self.accepts(symbol):
+            return self.state(token, error=f"Token '{symbol}' no válido en esta posición")
+        if self.complete:
+            self.reset()
+        
+        try:
+            if symbol.isdigit():
+                if self.in_number:
+                    # Otro dígito del mismo número: 1, 2 -> 12
+                    self.values[-1] = self.values[-1] * 10 + int(symbol)
+                else:
+                    self.values.append(int(symbol))
+                    self.in_number = True
+                self.expect_operand = False
+            elif symbol == '(':
+                self.operators.append('(')
+            elif symbol == ')':
+                self._reduce(0, False)
+                self.operators.pop()
+                self.in_number = False
+            elif symbol == '=':
+                self._reduce(0, False)
+                # Paréntesis sin cerrar: se cierran al terminar
+                while self.operators:
+                    if self.operators[-1] != '(':
+                        self._apply(self.values, self.operators[-1])
+                    self.operators.pop()
+                self.result = self.values[0]
+                self.complete = True
+            elif self.expect_operand:
+                self.operators.append(UNARY_MINUS if symbol == '-' else UNARY_PLUS)
+            else:
+                self._reduce(BINARY_PRECEDENCE[symbol], symbol in RIGHT_ASSOCIATIVE)
+                self.operators.append(symbol)
+                self.expect_operand = True
+                self.in_number = False
+        except ZeroDivisionError:
+            return self.state(token, error="División por cero")
+        except (ArithmeticError, ValueError) as e:
+            return self.state(token, error=f"Error al evaluar: {str(e)}")
+        
+        self.symbols.append(symbol)
+        return self.state(token, accepted=True)
+    
+    def current_value(self) -> Union[int, float, None]:
+        """Valor de lo reconocido hasta ahora, ignorando un operador final sin operando"""
+        if self.complete:
+            return self.result
+        values = list(self.values)
+        operators = list(self.operators)
+        
+        def strip_open():
+            while operators and operators[-1] in ('(', UNARY_MINUS, UNARY_PLUS):
+                operators.pop()
+        
+        if self.expect_operand:
+            strip_open()
+            binary = sum(1 for op in operators if op in BINARY_PRECEDENCE)
+            if operators and binary >= len(values):
+                operators.pop()
+        if not values:
+            return None
+        for op in reversed(operators):
+            if op != '(':
+                self._apply(values, op)
+        return values[-1]
+    
+    def state(self, token: Union[str, None] = None, accepted: bool = False,
+              error: Union[str, None] = None) -> Dict[str, Any]:
+        """Estado de la sesión tras un token"""
+        try:
+            value = self.current_value()
+            value_error = None
+        except ZeroDivisionError:
+            value, value_error = None, "División por cero"
+        except (ArithmeticError, ValueError) as e:
+            value, value_error = None, f"Error al evaluar: {str(e)}"
+        return {
+            "token": token,
+            "accepted": accepted,
+            "expression": "".join(self.symbols),
+            "value": value,
+            "complete": self.complete,
+            "error": error or value_error
+        }
+
+
+# Problemas por bloque: cada bloque usa una semilla derivada de (seed, número de bloque)
+PROBLEM_BLOCK_SIZE = 1024
+PROBLEM_DIFFICULTIES = ("easy", "medium", "hard")
+
+# Plantillas de varios operadores del nivel "hard"
+HARD_TEMPLATES = (
+    "{a} + {b} * {c}",
+    "{a} * {b} - {c}",
+    "({a} + {b}) * {c}",
+    "{a} / {b} + {c}",
+    "({a} - {b}) * {c}"
+)
+
+
+def _format_problems(template_ids: np.ndarray, templates: Tuple[str, ...], a: np.ndarray, b: np.ndarray,
+                     c: Union[np.ndarray, None], results: np.ndarray, difficulty: str,
+                     first_id: int) -> List[Dict[str, Any]]:
+    """Convertir los arreglos de un bloque en la lista de problemas"""
+    c_values = c.tolist() if c is not None else [None] * len(a)
+    return [
+        {
+            "id": first_id + index,
+            "expression": templates[template].format(a=x, b=y, c=z),
+            "result": result,
+            "difficulty": difficulty
+        }
+        for index, (template, x, y, z, result) in enumerate(zip(
+            template_ids.tolist(), a.tolist(), b.tolist(), c_values, results.tolist()
+        ))
+    ]
+
+
+def generate_problem_block(difficulty: str, seed: int, block: int) -> List[Dict[str, Any]]:
+    """Generar el bloque ``block`` completo de problemas de una dificultad
+
+    - easy: sumas y restas de 1 a 10 sin resultados negativos
+    - medium: sumas y restas de dos cifras, tablas de multiplicar y divisiones exactas
+    - hard: dos operadores con precedencia o paréntesis
+    """
+    if difficulty not in PROBLEM_DIFFICULTIES:
+        raise ValueError(f"Dificultad '{difficulty}' no válida. Dificultades disponibles: {list(PROBLEM_DIFFICULTIES)}")
+    if seed < 0 or block < 0:
+        raise ValueError("La semilla y el bloque no pueden ser negativos")
+    rng = np.random.default_rng([seed, block])
+    size = PROBLEM_BLOCK_SIZE
+    first_id = block * size
+    
+    if difficulty == "easy":
+        x, y = rng.integers(1, 11, size), rng.integers(1, 11, size)
+        ops = rng.integers(0, 2, size)
+        # En las restas el mayor va primero
+        a = np.where(ops == 1, np.maximum(x, y), x)
+        b = np.where(ops == 1, np.minimum(x, y), y)
+        results = np.where(ops == 1, a - b, a + b)
+        return _format_problems(ops, ("{a} + {b}", "{a} - {b}"), a, b, None, results, difficulty, first_id)
+    
+    if difficulty == "medium":
+        ops = rng.integers(0, 4, size)
+        x, y = rng.integers(10, 100, size), rng.integers(10, 100, size)
+        m, n = rng.integers(2, 13, size), rng.integers(2, 13, size)
+        quotient = rng.integers(1, 13, size)
+        a = np.select([ops == 0, ops == 1, ops == 2], [x, np.maximum(x, y), m], default=n * quotient)
+        b = np.select([ops == 0, ops == 1, ops == 2], [y, np.minimum(x, y), n], default=n)
+        results = np.select([ops == 0, ops == 1, ops == 2], [a + b, a - b, a * b], default=quotient)
+        return _format_problems(ops, ("{a} + {b}", "{a} - {b}", "{a} * {b}", "{a} / {b}"),
+                                a, b, None, results, difficulty, first_id)
+    
+    templates = rng.integers(0, len(HARD_TEMPLATES), size)
+    x, y, c = rng.integers(1, 51, size), rng.integers(2, 13, size), rng.integers(2, 13, size)
+    quotient = rng.integers(1, 13, size)
+    # División exacta en la plantilla 3 y resta no negativa en la 4
+    a = np.select([templates == 3, templates == 4], [y * quotient, np.maximum(x, y)], default=x)
+    b = np.select([templates == 4], [np.minimum(x, y)], default=y)
+    results = np.select(
+        [templates == 0, templates == 1, templates == 2, templates == 3],
+        [a + b * c, a * b - c, (a + b) * c, quotient + c],
+        default=(a - b) * c
+    )
+    return _format_problems(templates, HARD_TEMPLATES, a, b, c, results, difficulty, first_id)
+
+
+def iter_problem_blocks(difficulty: str, count: int, seed: Union[int, None] = None,
+                        offset: int = 0) -> Iterator[List[Dict[str, Any]]]:
+    """Problemas ``offset`` a ``offset + count`` de la secuencia de una semilla, bloque a bloque"""
+    if seed is None:
+        seed = int(np.random.default_rng().integers(2 ** 31))
+    end = offset + count
+    for block in range(offset // PROBLEM_BLOCK_SIZE, -(-end // PROBLEM_BLOCK_SIZE)):
+        start = block * PROBLEM_BLOCK_SIZE
+        problems = generate_problem_block(difficulty, seed, block)
+        yield problems[max(offset - start, 0):end - start]
+
 
 class MathEvaluator:
     """Evaluador de expresiones matemáticas"""
@@ -18,7 +422,11 @@ class MathEvaluator:
         }
     
     def evaluate_expression(self, expression: str) -> Dict[str, Any]:
-        """Evalúa una expresión matemática"""
+        """Evalúa una expresión matemática
+
+        La expresión se compila una vez a un programa RPN (en caché) y se
+        evalúa sin ``eval``; ``^`` es potencia.
+        """
         try:
             # Limpiar la expresión
             expression = expression.replace(' ', '')
@@ -32,7 +440,7 @@ class MathEvaluator:
                 }
             
             # Evaluar la expresión
-            result = eval(expression)
+            result = run_program(compile_expression(expression))
             
             return {
                 "result": result,
@@ -54,26 +462,18 @@ class MathEvaluator:
                 "valid": False
             }
     
-    def generate_math_problems(self, difficulty: str = "easy", count: int = 5) -> List[Dict[str, Any]]:
-        """Genera problemas matemáticos para entrenamiento"""
-        import random
-        
+    def evaluate_batch(self, expressions: List[str]) -> List[Dict[str, Any]]:
+        """Evaluar varias expresiones; las repetidas aprovechan la caché de compilación"""
+        return [self.evaluate_expression(expression) for expression in expressions]
+    
+    def generate_math_problems(self, difficulty: str = "easy", count: int = 5,
+                               seed: Union[int, None] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Genera exactamente ``count`` problemas matemáticos para entrenamiento
+
+        Con la misma ``seed`` el problema número ``offset + i`` es siempre el
+        mismo, así que una lista larga se puede pedir por páginas.
+        """
         problems = []
-        
-        if difficulty == "easy":
-            for _ in range(count):
-                a = random.randint(1, 10)
-                b = random.randint(1, 10)
-                op = random.choice(['+', '-'])
-                
-                if op == '+' or (op == '-' and a >= b):
-                    expression = f"{a} {op} {b}"
-                    result = a + b if op == '+' else a - b
-                    
-                    problems.append({
-                        "expression": expression,
-                        "result": result,
-                        "difficulty": "easy"
-                    })
-        
-        return problems
\ No newline at end of file
+        for block in iter_problem_blocks(difficulty, count, seed, offset):
+            problems.extend(block)
+        return problems
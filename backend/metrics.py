@@ -0,0 +1,201 @@
+"""
+Métricas en formato de texto de Prometheus para el Sistema Inteligente de Reconocimiento de Señas
+Contadores e histogramas en memoria, sin dependencias externas
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Límites superiores (segundos) por defecto de los histogramas de latencia
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas
+
+    Cada observación cuesta una búsqueda binaria sobre los límites y un
+    incremento bajo lock; la acumulación por "le" se hace solo al exportar.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteos por bucket (+Inf al final), suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Medir la duración de un bloque"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+def timed_by_category(histogram: Histogram, operation: str) -> Callable:
+    """Decorador para métodos ``(self, category, ...)``: mide cada llamada etiquetada por categoría"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, category, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(self, category, *args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, category, operation)
+        return wrapper
+    return decorator
+
+
+class MetricsRegistry:
+    """Conjunto de métricas que se exportan juntas en /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia y conteo de estados por ruta
+
+    La ruta se etiqueta con su plantilla (``/api/v1/vocales/samples/{user_id}``)
+    para que los ids no multipliquen las series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(elapsed, method, path)
+            http_requests_total.inc(method, path, str(status[0]))
+
+
+# Registro global y métricas de la aplicación
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route")
+))
+ml_operation_duration = registry.register(Histogram(
+    "ml_operation_duration_seconds", "Duración de las operaciones de ML", ("category", "operation")
+))
+datos_operation_duration = registry.register(Histogram(
+    "datos_operation_duration_seconds", "Duración de las operaciones del gestor de datos", ("category", "operation")
+))
+sample_commit_batch_size = registry.register(Histogram(
+    "sample_commit_batch_size", "Muestras confirmadas por cada commit agrupado", ("category",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+))
+model_cache_requests_total = registry.register(Counter(
+    "model_cache_requests_total", "Consultas a la caché de modelos personales", ("result",)
+))
+model_cache_evictions_total = registry.register(Counter(
+    "model_cache_evictions_total", "Modelos personales descargados de la caché por falta de espacio"
+))
@@ -2,33 +2,39 @@
 Módulo de Machine Learning para reconocimiento de señas
 """
 
+import copy
 import numpy as np
-import json
 import os
-from typing import List, Dict, Tuple, Optional
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Tuple, Optional
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 from datetime import datetime
 
+from config import settings
+from datos_manager import datos_manager
+from features import CANONICAL_FEATURE_VERSION, RAW_FEATURE_VERSION, extract_landmark_batch, features_for_version
+from metrics import ml_operation_duration
+from model_registry import model_key, model_registry, ModelVersion
+
 class SignRecognitionModel:
-    """Modelo de Machine Learning para reconocimiento de señas"""
+    """Modelo de Machine Learning para reconocimiento de señas
+
+    Sin ``user_id`` es el modelo global de la categoría, entrenado con las
+    muestras de todos los usuarios; con él es el modelo personal de ese
+    usuario, entrenado solo con sus muestras.
+    """
     
-    def __init__(self, category: str):
+    # Representación con la que se entrenan los modelos nuevos (calculada al ingresar cada muestra)
+    FEATURE_VERSION = CANONICAL_FEATURE_VERSION
+    
+    def __init__(self, category: str, user_id: Optional[int] = None):
         self.category = category
-        self.model = RandomForestClassifier(
-            n_estimators=10,  # Menos árboles para pocos datos
-            max_depth=5,      # Menor profundidad
-            random_state=42,
-            n_jobs=-1,
-            min_samples_split=2,  # Mínimo para dividir
-            min_samples_leaf=1     # Mínimo en hojas
-        )
-        self.is_trained = False
-        self.classes_ = None
-        self.accuracy_ = 0.0
-        self.model_path = f"models/{category}_model.pkl"
+        self.user_id = user_id
+        self.key = model_key(category, user_id)
+        self.model = self._new_estimator()
         
         # Mapeo de nombres internos a símbolos originales
         self.symbol_mapping = {
@@ -38,84 +44,348 @@ class SignRecognitionModel:
             "plus": "+",
             "minus": "-"
         }
-        
-    def load_training_data(self) -> Tuple[np.ndarray, np.ndarray]:
-        """Cargar datos de entrenamiento desde archivos JSON"""
-        X = []  # Features (landmarks)
-        y = []  # Labels (números/vocales/etc)
-        
-        data_dir = f"datos/{self.category}"
-        
-        if not os.path.exists(data_dir):
+    
+    def _new_estimator(self, params: Optional[Dict[str, any]] = None) -> RandomForestClassifier:
+        """Estimador sin entrenar; cada entrenamiento ajusta uno nuevo
+
+        ``params`` (p. ej. los elegidos por la búsqueda de hiperparámetros)
+        sustituye a los valores por defecto.
+        """
+        defaults = {
+            "n_estimators": 10,  # Menos árboles para pocos datos
+            "max_depth": 5,      # Menor profundidad
+            "random_state": 42,
+            "n_jobs": -1,
+            "min_samples_split": 2,  # Mínimo para dividir
+            "min_samples_leaf": 1     # Mínimo en hojas
+        }
+        return RandomForestClassifier(**{**defaults, **(params or {})})
+    
+    def _tuned_params(self) -> Optional[Dict[str, any]]:
+        """Hiperparámetros registrados en la versión activa, si vienen de una búsqueda"""
+        active = self.active()
+        if active is None:
+            return None
+        info = model_registry.version_info(self.key, active.version) or {}
+        return info.get("estimator_params")
+    
+    def active(self) -> Optional[ModelVersion]:
+        """Versión activa del modelo en el registro (None si nunca se entrenó)"""
+        return model_registry.get(self.key)
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.active() is not None
+    
+    @property
+    def classes_(self) -> Optional[np.ndarray]:
+        active = self.active()
+        return active.classes if active is not None else None
+    
+    @property
+    def accuracy_(self) -> float:
+        active = self.active()
+        return active.accuracy if active is not None else 0.0
+    
+    @contextmanager
+    def _timed(self, operation: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+        """Medir una operación en /metrics y, si se indica, acumularla en ``timings``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            ml_operation_duration.observe(elapsed, self.category, operation)
+            if timings is not None:
+                timings[operation] = timings.get(operation, 0.0) + elapsed
+    
+    def load_training_blocks(self) -> Dict[str, Tuple[str, str, np.ndarray]]:
+        """Características por segmento {"<usuario>/<seña>": (seña, id del segmento, matriz)}
+
+        Se leen de las calculadas al ingresar: el modelo global usa la vista
+        combinada de todos los usuarios (un segmento por usuario y seña) y el
+        personal solo la partición de su usuario.
+        """
+        blocks = {}
+        for user_id, sign, segment_id, features in datos_manager.iter_feature_segments(self.category, self.user_id):
+            if len(features):
+                blocks[f"{user_id}/{sign}"] = (sign, segment_id, np.array(features))
+        return blocks
+    
+    @staticmethod
+    def stack_blocks(blocks: Dict[str, Tuple[str, str, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Unir los bloques por segmento en (X, y)"""
+        if not blocks:
             return np.array([]), np.array([])
-        
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.json'):
-                sign_name = filename.replace('.json', '')
-                file_path = os.path.join(data_dir, filename)
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    for sample in data.get('samples', []):
-                        landmarks = sample.get('landmarks', [])
-                        if landmarks:
-                            # Convertir landmarks a formato numérico
-                            features = self._extract_features(landmarks)
-                            if features is not None:
-                                X.append(features)
-                                y.append(sign_name)
-                                
-                except Exception as e:
-                    print(f"Error cargando {file_path}: {e}")
-                    continue
-        
-        return np.array(X), np.array(y)
+        X = np.vstack([features for _, _, features in blocks.values()])
+        y = np.concatenate([np.full(len(features), sign) for sign, _, features in blocks.values()])
+        return X, y
+    
+    def load_training_data(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Cargar datos de entrenamiento (X, y)"""
+        return self.stack_blocks(self.load_training_blocks())
+    
+    def extract_features_batch(self, samples: List[List],
+                               feature_version: str = FEATURE_VERSION) -> Tuple[np.ndarray, List[int]]:
+        """Extraer la matriz de características de varias muestras e índices de las rechazadas"""
+        rows, rejected = extract_landmark_batch(samples)
+        return features_for_version(rows, feature_version), rejected
     
     def _extract_features(self, landmarks: List) -> Optional[np.ndarray]:
-        """Extraer características de los landmarks"""
+        """Extraer características de los landmarks de una sola muestra"""
+        features, rejected = self.extract_features_batch([landmarks])
+        if rejected:
+            return None
+        return features[0]
+    
+    def train(self, progress: Optional[Callable[[str, float], None]] = None,
+              mode: str = "full", params: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        """Entrenar el modelo
+
+        ``mode`` es "full" (reajuste completo) o "incremental" (solo muestras nuevas;
+        vuelve al ajuste completo cuando no es posible). ``progress`` recibe
+        (fase, fracción completada) al inicio de cada fase. El resultado incluye
+        ``timings`` con la duración en segundos de cada operación.
+        ``params`` fija los hiperparámetros del ajuste completo; sin ellos se
+        conservan los de la versión activa.
+        """
+        report = progress or (lambda phase, fraction: None)
+        timings: Dict[str, float] = {}
         try:
-            features = []
+            print(f"🔄 Entrenando modelo para {self.key} ({mode})...")
             
-            for landmark in landmarks:
-                if isinstance(landmark, str):
-                    # Parsear string "x=0.5 y=0.5 z=0.0"
-                    import re
-                    coords = re.findall(r'x=([\d.-]+)\s+y=([\d.-]+)\s+z=([\d.-]+)', landmark)
-                    if coords:
-                        x, y, z = coords[0]
-                        features.extend([float(x), float(y), float(z)])
-                    else:
-                        return None
-                elif isinstance(landmark, dict):
-                    # Formato dict {"x": 0.5, "y": 0.5, "z": 0.0}
-                    features.extend([
-                        landmark.get('x', 0),
-                        landmark.get('y', 0),
-                        landmark.get('z', 0)
-                    ])
+            # Cargar datos
+            report("loading_data", 0.05)
+            with self._timed("load_training_data", timings):
+                blocks = self.load_training_blocks()
+            
+            result = None
+            if mode == "incremental":
+                plan, reason = self._incremental_plan(blocks)
+                if plan is not None and not plan["new_rows"]:
+                    # Nada que aprender: la versión activa ya vio todas las muestras
+                    active = plan["active"]
+                    result = {
+                        "success": True,
+                        "message": "El modelo ya está actualizado, no hay muestras nuevas",
+                        "accuracy": active.accuracy,
+                        "samples": sum(len(features) for _, _, features in blocks.values()),
+                        "classes": [str(cls) for cls in active.classes],
+                        "mode": "incremental",
+                        "model_version": active.version
+                    }
+                elif plan is not None:
+                    result = self._train_incremental(plan, blocks, report, timings)
                 else:
-                    return None
+                    print(f" Reentrenamiento completo: {reason}")
             
-            # Asegurar que tenemos exactamente 21 landmarks * 3 coordenadas = 63 features
-            if len(features) != 63:
-                return None
-                
-            return np.array(features)
+            if result is None:
+                result = self._train_full(blocks, report, timings, params)
+            result["timings"] = timings
+            return result
             
         except Exception as e:
-            print(f"Error extrayendo características: {e}")
-            return None
+            print(f" Error entrenando modelo: {e}")
+            return {
+                "success": False,
+                "message": f"Error entrenando modelo: {str(e)}",
+                "accuracy": 0.0,
+                "samples": 0
+            }
+    
+    def _train_full(self, blocks: Dict[str, Tuple[str, str, np.ndarray]],
+                    report: Callable[[str, float], None],
+                    timings: Optional[Dict[str, float]] = None,
+                    params: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        """Ajustar un bosque nuevo con todas las muestras"""
+        X, y = self.stack_blocks(blocks)
+        
+        if len(X) == 0:
+            return {
+                "success": False,
+                "message": "No hay datos de entrenamiento disponibles",
+                "accuracy": 0.0,
+                "samples": 0
+            }
+        
+        print(f"📊 Datos cargados: {len(X)} muestras, {len(np.unique(y))} clases")
+        
+        # Dividir datos (sin stratify si hay pocas muestras por clase)
+        if len(X) >= 10 and len(np.unique(y)) > 1:
+            try:
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y, test_size=0.2, random_state=42, stratify=y
+                )
+            except ValueError:
+                # Si no se puede hacer stratify, dividir normalmente
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y, test_size=0.2, random_state=42
+                )
+        else:
+            # Si hay muy pocas muestras, usar todo para entrenamiento
+            X_train, X_test, y_train, y_test = X, X, y, y
+        
+        # Entrenar un estimador nuevo; el activo sigue sirviendo mientras tanto
+        report("fitting", 0.3)
+        params = params if params is not None else self._tuned_params()
+        model = self._new_estimator(params)
+        with self._timed("fit", timings):
+            model.fit(X_train, y_train)
+        
+        # Evaluar
+        report("evaluating", 0.8)
+        with self._timed("evaluate", timings):
+            y_pred = model.predict(X_test)
+        accuracy = float(accuracy_score(y_test, y_pred))
+        
+        extra = {"mode": "full", "incremental_steps": 0}
+        if params:
+            extra["estimator_params"] = params
+        return self._publish(model, accuracy, blocks, report, extra, timings)
+    
+    def _incremental_plan(self, blocks: Dict[str, Tuple[str, str, np.ndarray]]) -> Tuple[Optional[Dict[str, any]], str]:
+        """Decidir si es posible un ajuste incremental y qué filas son nuevas
+
+        Devuelve (plan, motivo); el plan es None cuando hace falta un ajuste completo.
+        """
+        active = self.active()
+        if active is None:
+            return None, "no hay modelo activo"
+        
+        info = model_registry.version_info(self.key, active.version) or {}
+        fitted_rows = info.get("segment_rows")
+        if not fitted_rows:
+            return None, "la versión activa no registra las muestras usadas"
+        if info.get("feature_version", RAW_FEATURE_VERSION) != self.FEATURE_VERSION:
+            return None, "la versión activa usa otra representación de características"
+        if info.get("incremental_steps", 0) >= settings.INCREMENTAL_MAX_STEPS:
+            return None, "se alcanzó el máximo de pasos incrementales"
+        if {sign for sign, _, _ in blocks.values()} != {str(cls) for cls in active.classes}:
+            return None, "cambió el conjunto de señas"
+        removed = sorted(set(fitted_rows) - set(blocks))
+        if removed:
+            return None, f"se eliminaron muestras de '{removed[0]}'"
+        
+        # Un segmento que la versión activa no vio (un usuario nuevo en una seña) es nuevo entero
+        new_rows = {}
+        for key, (_, segment_id, features) in blocks.items():
+            fitted = fitted_rows.get(key, {"segment": segment_id, "rows": 0})
+            if fitted["segment"] != segment_id or fitted["rows"] > len(features):
+                return None, f"se eliminaron muestras de '{key}'"
+            if fitted["rows"] < len(features):
+                new_rows[key] = fitted["rows"]
+        
+        return {"active": active, "info": info, "new_rows": new_rows}, ""
     
-    def train(self) -> Dict[str, any]:
-        """Entrenar el modelo"""
+    def _train_incremental(self, plan: Dict[str, any], blocks: Dict[str, Tuple[str, str, np.ndarray]],
+                           report: Callable[[str, float], None],
+                           timings: Optional[Dict[str, float]] = None) -> Dict[str, any]:
+        """Añadir árboles entrenados solo con las muestras nuevas (warm start)
+
+        Cada clase aporta además unas pocas muestras antiguas de repaso para que
+        los árboles nuevos conozcan todas las clases y ``classes_`` no cambie.
+        """
+        active = plan["active"]
+        rng = np.random.default_rng(active.version)
+        
+        X_new, y_new, X_replay, y_replay = [], [], [], []
+        seen: Dict[str, List[np.ndarray]] = {}
+        for key, (sign, _, features) in blocks.items():
+            start = plan["new_rows"].get(key, len(features))
+            if start < len(features):
+                X_new.append(features[start:])
+                y_new.append(np.full(len(features) - start, sign))
+            if start:
+                seen.setdefault(sign, []).append(features[:start])
+        
+        # El repaso se elige por seña entre los segmentos de todos los usuarios
+        for sign, parts in seen.items():
+            old = np.vstack(parts)
+            take = min(len(old), settings.INCREMENTAL_REPLAY_PER_CLASS)
+            X_replay.append(old[rng.choice(len(old), size=take, replace=False)])
+            y_replay.append(np.full(take, sign))
+        
+        X_new, y_new = np.vstack(X_new), np.concatenate(y_new)
+        print(f"📊 Ajuste incremental: {len(X_new)} muestras nuevas sobre la versión {active.version}")
+        
+        # Precisión precuencial: el modelo activo evaluado con datos que aún no vio
+        report("evaluating", 0.2)
+        with self._timed("evaluate", timings):
+            accuracy = float(accuracy_score(y_new, active.estimator.predict(X_new)))
+        
+        report("fitting", 0.4)
+        model = copy.deepcopy(active.estimator)
+        model.set_params(
+            warm_start=True,
+            n_estimators=model.n_estimators + settings.INCREMENTAL_TREES_PER_STEP
+        )
+        with self._timed("fit", timings):
+            model.fit(np.vstack([X_new] + X_replay), np.concatenate([y_new] + y_replay))
+        model.set_params(warm_start=False)
+        
+        extra = {
+            "mode": "incremental",
+            "incremental_steps": plan["info"].get("incremental_steps", 0) + 1,
+            "base_version": active.version,
+            "new_samples": len(X_new)
+        }
+        if plan["info"].get("estimator_params"):
+            extra["estimator_params"] = plan["info"]["estimator_params"]
+        return self._publish(model, accuracy, blocks, report, extra, timings)
+    
+    def _publish(self, model: RandomForestClassifier, accuracy: float,
+                 blocks: Dict[str, Tuple[str, str, np.ndarray]],
+                 report: Callable[[str, float], None], extra: Dict[str, any],
+                 timings: Optional[Dict[str, float]] = None) -> Dict[str, any]:
+        """Publicar el modelo como nueva versión activa del registro"""
+        report("saving", 0.9)
+        classes = [str(cls) for cls in model.classes_]
+        samples = sum(len(features) for _, _, features in blocks.values())
+        with self._timed("publish", timings):
+            entry = model_registry.publish(self.key, model, {
+                "accuracy": accuracy,
+                "samples": samples,
+                "classes": classes,
+                "n_estimators": len(model.estimators_),
+                "feature_version": self.FEATURE_VERSION,
+                # Filas usadas por segmento: el siguiente ajuste incremental parte de aquí
+                "segment_rows": {
+                    key: {"segment": segment_id, "rows": len(features)}
+                    for key, (_, segment_id, features) in blocks.items()
+                },
+                **extra
+            })
+        self.model = model
+        
+        print(f" Modelo entrenado - Precisión: {accuracy:.3f} (versión {entry['version']}, {extra['mode']})")
+        
+        return {
+            "success": True,
+            "message": f"Modelo entrenado exitosamente",
+            "accuracy": accuracy,
+            "samples": samples,
+            "classes": classes,
+            "mode": extra["mode"],
+            "model_version": entry["version"]
+        }
+    
+    def tune(self, budget_seconds: float, accuracy_target: Optional[float] = None,
+             n_folds: int = settings.TUNING_FOLDS, apply: bool = False,
+             progress: Optional[Callable[[str, float], None]] = None) -> Dict[str, any]:
+        """Buscar hiperparámetros del bosque con validación cruzada en paralelo
+
+        Informa precisión y latencia de un frame de cada candidato. Con ``apply``
+        se entrena y publica un modelo con el candidato elegido.
+        """
+        import tuning
+        
+        report = progress or (lambda phase, fraction: None)
+        timings: Dict[str, float] = {}
         try:
-            print(f"🔄 Entrenando modelo para {self.category}...")
-            
-            # Cargar datos
-            X, y = self.load_training_data()
-            
+            print(f"🔄 Buscando hiperparámetros para {self.key} ({budget_seconds:.0f}s)...")
+            report("loading_data", 0.02)
+            with self._timed("load_training_data", timings):
+                X, y = self.load_training_data()
             if len(X) == 0:
                 return {
                     "success": False,
@@ -124,105 +394,146 @@ class SignRecognitionModel:
                     "samples": 0
                 }
             
-            print(f"📊 Datos cargados: {len(X)} muestras, {len(np.unique(y))} clases")
-            
-            # Dividir datos (sin stratify si hay pocas muestras por clase)
-            if len(X) >= 10 and len(np.unique(y)) > 1:
-                try:
-                    X_train, X_test, y_train, y_test = train_test_split(
-                        X, y, test_size=0.2, random_state=42, stratify=y
-                    )
-                except ValueError:
-                    # Si no se puede hacer stratify, dividir normalmente
-                    X_train, X_test, y_train, y_test = train_test_split(
-                        X, y, test_size=0.2, random_state=42
-                    )
-            else:
-                # Si hay muy pocas muestras, usar todo para entrenamiento
-                X_train, X_test, y_train, y_test = X, X, y, y
-            
-            # Entrenar modelo
-            self.model.fit(X_train, y_train)
-            
-            # Evaluar
-            y_pred = self.model.predict(X_test)
-            self.accuracy_ = accuracy_score(y_test, y_pred)
-            
-            # Guardar modelo
-            os.makedirs("models", exist_ok=True)
-            joblib.dump(self.model, self.model_path)
-            
-            self.is_trained = True
-            self.classes_ = self.model.classes_
-            
-            print(f" Modelo entrenado - Precisión: {self.accuracy_:.3f}")
+            with self._timed("tune", timings):
+                search = tuning.search(X, y, budget_seconds, accuracy_target, n_folds, progress=report)
+            best = search["best"]
+            if best is None:
+                return {
+                    "success": False,
+                    "message": "Ningún candidato terminó dentro del presupuesto de tiempo",
+                    "accuracy": 0.0,
+                    "samples": len(X),
+                    "tuning": search,
+                    "timings": timings
+                }
             
-            return {
+            print(f" Mejor candidato: {best['params']} - Precisión: {best['accuracy']:.3f}, "
+                  f"latencia {best['latency_p50_ms']:.3f} ms ({search['evaluated']}/{search['total_candidates']})")
+            result = {
                 "success": True,
-                "message": f"Modelo entrenado exitosamente",
-                "accuracy": self.accuracy_,
+                "message": "Búsqueda de hiperparámetros completada",
+                "accuracy": best["accuracy"],
                 "samples": len(X),
-                "classes": list(self.classes_),
-                "model_path": self.model_path
+                "mode": "tune",
+                "tuning": search
             }
+            if apply:
+                trained = self.train(progress=lambda phase, fraction: report(phase, 0.9 + 0.1 * fraction),
+                                     mode="full", params=best["params"])
+                for operation, seconds in trained.pop("timings", {}).items():
+                    timings[operation] = timings.get(operation, 0.0) + seconds
+                result["training"] = trained
+                result["success"] = trained["success"]
+                if trained["success"]:
+                    result["model_version"] = trained["model_version"]
+            result["timings"] = timings
+            return result
             
         except Exception as e:
-            print(f" Error entrenando modelo: {e}")
+            print(f" Error buscando hiperparámetros: {e}")
             return {
                 "success": False,
-                "message": f"Error entrenando modelo: {str(e)}",
+                "message": f"Error buscando hiperparámetros: {str(e)}",
                 "accuracy": 0.0,
                 "samples": 0
             }
     
+    def reload(self) -> bool:
+        """Activar en este proceso la versión publicada por un entrenamiento en otro proceso"""
+        return model_registry.load_active(self.key) is not None
+    
+    def ensure_loaded(self) -> bool:
+        """Cargar el modelo activo si aún no está en memoria"""
+        return self.is_trained
+    
+    def _format_prediction(self, probabilities: np.ndarray, active: ModelVersion) -> Dict[str, any]:
+        """Construir el resultado a partir de la fila de probabilidades de una muestra"""
+        best = int(np.argmax(probabilities))
+        prediction = active.classes[best]
+        
+        # Convertir nombre interno a símbolo original si es necesario
+        original_symbol = self.symbol_mapping.get(prediction, prediction)
+        
+        return {
+            "prediction": original_symbol,
+            "confidence": float(probabilities[best]),
+            "model_version": active.version,
+            "personal": self.user_id is not None,
+            "probabilities": {
+                cls: float(prob) for cls, prob in zip(active.classes, probabilities)
+            }
+        }
+    
     def predict(self, landmarks: List) -> Dict[str, any]:
         """Hacer predicción con el modelo entrenado"""
+        return self.predict_batch([landmarks])[0]
+    
+    def predict_proba_batch(self, frames: List[List],
+                            active: Optional[ModelVersion] = None) -> Tuple[np.ndarray, List[int], ModelVersion]:
+        """Probabilidades (M, clases) de las muestras válidas, sus índices originales y la versión usada
+
+        Requiere un modelo activo; las columnas siguen el orden de ``active.classes``.
+        """
+        # Tomar la versión una sola vez: un hot-swap concurrente no mezcla modelos
+        active = active or self.active()
+        if active is None:
+            raise RuntimeError("No hay modelo entrenado disponible")
+        
+        # Cada versión se evalúa con la representación con la que fue entrenada
+        with self._timed("feature_extraction"):
+            features, rejected = self.extract_features_batch(frames, active.feature_version)
+        rejected_set = set(rejected)
+        valid_indices = [i for i in range(len(frames)) if i not in rejected_set]
+        if not len(features):
+            return np.empty((0, len(active.classes))), valid_indices, active
+        with self._timed("predict_proba"):
+            if active.compiled is not None:
+                # Recorrido vectorizado de los arreglos de nodos, sin la sobrecarga de sklearn
+                return active.compiled.predict_proba(features), valid_indices, active
+            return active.estimator.predict_proba(features), valid_indices, active
+    
+    def predict_batch(self, frames: List[List]) -> List[Dict[str, any]]:
+        """Predecir varias muestras con una sola pasada de predict_proba
+
+        La etiqueta es el argmax de las probabilidades, igual que ``model.predict``,
+        así que cada árbol se recorre una sola vez por muestra.
+        """
         try:
-            if not self.is_trained:
-                # Intentar cargar modelo guardado
-                if os.path.exists(self.model_path):
-                    self.model = joblib.load(self.model_path)
-                    self.is_trained = True
-                    self.classes_ = self.model.classes_
-                else:
-                    return {
+            active = self.active()
+            if active is None:
+                return [
+                    {
                         "prediction": "Modelo no entrenado",
                         "confidence": 0.0,
                         "error": "No hay modelo entrenado disponible"
                     }
+                    for _ in frames
+                ]
             
-            # Extraer características
-            features = self._extract_features(landmarks)
-            if features is None:
-                return {
+            probabilities, valid_indices, active = self.predict_proba_batch(frames, active)
+            results: List[Dict[str, any]] = [
+                {
                     "prediction": "Landmarks inválidos",
                     "confidence": 0.0,
                     "error": "No se pudieron extraer características"
                 }
+                for _ in frames
+            ]
+            for index, row in zip(valid_indices, probabilities):
+                results[index] = self._format_prediction(row, active)
             
-            # Hacer predicción
-            prediction = self.model.predict([features])[0]
-            probabilities = self.model.predict_proba([features])[0]
-            confidence = np.max(probabilities)
-            
-            # Convertir nombre interno a símbolo original si es necesario
-            original_symbol = self.symbol_mapping.get(prediction, prediction)
-            
-            return {
-                "prediction": original_symbol,
-                "confidence": float(confidence),
-                "probabilities": {
-                    cls: float(prob) for cls, prob in zip(self.classes_, probabilities)
-                }
-            }
+            return results
             
         except Exception as e:
             print(f" Error en predicción: {e}")
-            return {
-                "prediction": "Error",
-                "confidence": 0.0,
-                "error": str(e)
-            }
+            return [
+                {
+                    "prediction": "Error",
+                    "confidence": 0.0,
+                    "error": str(e)
+                }
+                for _ in frames
+            ]
 
 # Instancias globales para cada categoría
 models = {
@@ -231,3 +542,11 @@ models = {
     "operaciones": SignRecognitionModel("operaciones"),
     "abecedario": SignRecognitionModel("abecedario")
 }
+
+def model_for(category: str, user_id: Optional[int] = None) -> SignRecognitionModel:
+    """Modelo personal del usuario si tiene uno entrenado; si no, el global de la categoría"""
+    if user_id is not None and settings.USER_MODELS_ENABLED:
+        personal = SignRecognitionModel(category, user_id)
+        if personal.is_trained:
+            return personal
+    return models[category]
@@ -0,0 +1,295 @@
+"""
+Registro versionado de modelos entrenados para el Sistema Inteligente de Reconocimiento de Señas
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import joblib
+import numpy as np
+
+from compiled_forest import compile_forest
+from config import settings
+from features import RAW_FEATURE_VERSION
+from metrics import ml_operation_duration, model_cache_evictions_total, model_cache_requests_total
+
+# Subdirectorio de una categoría con los modelos personales de cada usuario
+USER_MODELS_DIR = "users"
+
+
+def model_key(category: str, user_id: Optional[int] = None) -> str:
+    """Clave del modelo global de una categoría o del modelo personal de un usuario"""
+    if user_id is None:
+        return category
+    return f"{category}/{USER_MODELS_DIR}/{user_id}"
+
+
+def is_user_key(key: str) -> bool:
+    return "/" in key
+
+
+def key_category(key: str) -> str:
+    """Categoría de una clave (etiqueta de las métricas: no crece con los usuarios)"""
+    return key.split("/", 1)[0]
+
+
+class ModelVersion(NamedTuple):
+    """Versión de un modelo cargada en memoria
+
+    Se reemplaza completa al publicar o revertir, de modo que una predicción en
+    curso siempre usa un estimador y unas clases consistentes entre sí.
+    ``compiled`` es el bosque compilado para inferencia (None si no pasó la
+    comprobación de paridad con sklearn) y ``feature_version`` la representación
+    de entrada con la que se entrenó.
+    """
+    version: int
+    estimator: Any
+    classes: np.ndarray
+    accuracy: float
+    compiled: Any = None
+    feature_version: str = RAW_FEATURE_VERSION
+
+
+class ModelRegistry:
+    """Artefactos versionados por clave de modelo con una versión activa
+
+    La clave es la categoría (modelo global) o ``<categoría>/users/<id>`` (modelo
+    personal, ver ``model_key``). Estructura en disco:
+      - ``models/<clave>/v<N>.pkl``: artefacto de cada versión
+      - ``models/<clave>/registry.json``: versión activa e historial
+
+    Los modelos globales quedan siempre en memoria; los personales se cargan
+    bajo demanda en una caché LRU de ``USER_MODEL_CACHE_SIZE`` entradas. Ambos
+    recuerdan también las claves sin modelo para no volver a buscarlo en disco
+    en cada predicción; ``publish``, ``activate`` y ``load_active`` lo renuevan.
+    """
+
+    def __init__(self, base_dir: str = "models", cache_size: int = settings.USER_MODEL_CACHE_SIZE):
+        self.base_dir = base_dir
+        self.cache_size = cache_size
+        self._active: Dict[str, Optional[ModelVersion]] = {}
+        self._user_models: "OrderedDict[str, Optional[ModelVersion]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _category_dir(self, category: str) -> str:
+        return os.path.join(self.base_dir, category)
+
+    def _registry_path(self, category: str) -> str:
+        return os.path.join(self._category_dir(category), "registry.json")
+
+    def _artifact_path(self, category: str, version: int) -> str:
+        return os.path.join(self._category_dir(category), f"v{version}.pkl")
+
+    def read_registry(self, category: str) -> Dict[str, Any]:
+        """Leer el registro de una categoría (migrando el modelo heredado si existe)"""
+        self._migrate_legacy(category)
+        try:
+            with open(self._registry_path(category), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"category": category, "active": None, "versions": []}
+
+    def _write_registry(self, category: str, registry: Dict[str, Any]):
+        """Escribir el registro de forma atómica"""
+        os.makedirs(self._category_dir(category), exist_ok=True)
+        path = self._registry_path(category)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def _migrate_legacy(self, category: str):
+        """Convertir ``models/<categoría>_model.pkl`` en la versión 1 del registro"""
+        legacy_path = os.path.join(self.base_dir, f"{category}_model.pkl")
+        if not os.path.exists(legacy_path) or os.path.exists(self._registry_path(category)):
+            return
+        os.makedirs(self._category_dir(category), exist_ok=True)
+        os.replace(legacy_path, self._artifact_path(category, 1))
+        self._write_registry(category, {
+            "category": category,
+            "active": 1,
+            "versions": [{
+                "version": 1,
+                "accuracy": None,
+                "samples": None,
+                "created_at": datetime.now().isoformat(),
+                "source": "legacy"
+            }]
+        })
+        print(f" Modelo heredado de {category} migrado como versión 1")
+
+    def _load_version(self, category: str, version: int, info: Dict[str, Any]) -> ModelVersion:
+        with ml_operation_duration.time(key_category(category), "model_load"):
+            estimator = joblib.load(self._artifact_path(category, version))
+        return self._make_version(category, version, estimator, info)
+
+    def _make_version(self, category: str, version: int, estimator: Any, info: Dict[str, Any]) -> ModelVersion:
+        with ml_operation_duration.time(key_category(category), "compile"):
+            compiled = compile_forest(estimator)
+        return ModelVersion(version, estimator, estimator.classes_, info.get("accuracy") or 0.0,
+                            compiled, info.get("feature_version", RAW_FEATURE_VERSION))
+
+    def _loaded(self, key: str) -> Optional[ModelVersion]:
+        """Versión en memoria de una clave, sin contar la consulta ni cargar nada"""
+        if is_user_key(key):
+            return self._user_models.get(key)
+        return self._active.get(key)
+
+    def _set_loaded(self, key: str, loaded: Optional[ModelVersion]):
+        """Publicar en memoria la versión de una clave (con el lock tomado)
+
+        Un modelo personal entra al final de la LRU y desplaza al menos usado
+        si se supera el tamaño de la caché.
+        """
+        if not is_user_key(key):
+            self._active[key] = loaded
+            return
+        self._user_models[key] = loaded
+        self._user_models.move_to_end(key)
+        while len(self._user_models) > self.cache_size:
+            self._user_models.popitem(last=False)
+            model_cache_evictions_total.inc()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Ocupación y contadores de la caché de modelos personales"""
+        with self._lock:
+            loaded = sum(1 for version in self._user_models.values() if version is not None)
+            entries = len(self._user_models)
+        return {
+            "capacity": self.cache_size,
+            "entries": entries,
+            "loaded_models": loaded,
+            "hits": int(model_cache_requests_total.value("hit")),
+            "misses": int(model_cache_requests_total.value("miss")),
+            "evictions": int(model_cache_evictions_total.value())
+        }
+
+    def _version_info(self, registry: Dict[str, Any], version: int) -> Optional[Dict[str, Any]]:
+        for info in registry["versions"]:
+            if info["version"] == version:
+                return info
+        return None
+
+    def version_info(self, category: str, version: int) -> Optional[Dict[str, Any]]:
+        """Metadatos guardados de una versión"""
+        return self._version_info(self.read_registry(category), version)
+
+    def publish(self, category: str, estimator: Any, info: Dict[str, Any]) -> Dict[str, Any]:
+        """Guardar un modelo recién entrenado como nueva versión activa"""
+        with self._lock:
+            registry = self.read_registry(category)
+            version = max((v["version"] for v in registry["versions"]), default=0) + 1
+
+            # Artefacto escrito de forma atómica: otro proceso puede estar cargándolo
+            os.makedirs(self._category_dir(category), exist_ok=True)
+            path = self._artifact_path(category, version)
+            joblib.dump(estimator, path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+            entry = {
+                "version": version,
+                **info,
+                "created_at": datetime.now().isoformat()
+            }
+            registry["versions"].append(entry)
+            registry["active"] = version
+            self._prune(category, registry)
+            self._write_registry(category, registry)
+
+            self._set_loaded(category, self._make_version(category, version, estimator, info))
+            return entry
+
+    def _prune(self, category: str, registry: Dict[str, Any]):
+        """Eliminar los artefactos más antiguos que excedan el historial configurado"""
+        keep = settings.MODEL_REGISTRY_KEEP_VERSIONS
+        excess = registry["versions"][:-keep] if len(registry["versions"]) > keep else []
+        for info in excess:
+            if info["version"] == registry["active"]:
+                continue
+            try:
+                os.remove(self._artifact_path(category, info["version"]))
+            except OSError:
+                pass
+            registry["versions"].remove(info)
+
+    def load_active(self, category: str) -> Optional[ModelVersion]:
+        """Cargar la versión activa según el registro en disco y publicarla en memoria"""
+        with self._lock:
+            registry = self.read_registry(category)
+            version = registry.get("active")
+            if version is None:
+                self._set_loaded(category, None)
+                return None
+
+            current = self._loaded(category)
+            if current is not None and current.version == version:
+                return current
+
+            info = self._version_info(registry, version) or {}
+            loaded = self._load_version(category, version, info)
+            # Reemplazo atómico de la referencia: las predicciones en curso terminan con la anterior
+            self._set_loaded(category, loaded)
+            return loaded
+
+    def get(self, category: str) -> Optional[ModelVersion]:
+        """Versión activa en memoria (se carga desde disco la primera vez; sin modelo, None queda recordado)"""
+        if is_user_key(category):
+            return self._get_user_model(category)
+        if category in self._active:
+            return self._active[category]
+        return self.load_active(category)
+
+    def _get_user_model(self, key: str) -> Optional[ModelVersion]:
+        """Modelo personal desde la LRU; un fallo lo carga (o anota que no existe)"""
+        with self._lock:
+            if key in self._user_models:
+                model_cache_requests_total.inc("hit")
+                self._user_models.move_to_end(key)
+                return self._user_models[key]
+            model_cache_requests_total.inc("miss")
+            return self.load_active(key)
+
+    def activate(self, category: str, version: int) -> ModelVersion:
+        """Activar una versión existente (usado para revertir)"""
+        with self._lock:
+            registry = self.read_registry(category)
+            info = self._version_info(registry, version)
+            if info is None or not os.path.exists(self._artifact_path(category, version)):
+                raise ValueError(f"La versión {version} de '{category}' no existe")
+
+            loaded = self._load_version(category, version, info)
+            registry["active"] = version
+            self._write_registry(category, registry)
+            self._set_loaded(category, loaded)
+            return loaded
+
+    def rollback(self, category: str, version: Optional[int] = None) -> ModelVersion:
+        """Volver a la versión indicada o a la anterior a la activa"""
+        with self._lock:
+            registry = self.read_registry(category)
+            if version is None:
+                previous = [v["version"] for v in registry["versions"]
+                            if registry["active"] is not None and v["version"] < registry["active"]]
+                if not previous:
+                    raise ValueError(f"No hay una versión anterior de '{category}'")
+                version = max(previous)
+            return self.activate(category, version)
+
+    def preload(self, categories: Iterable[str]) -> List[str]:
+        """Cargar al arrancar la versión activa de cada categoría"""
+        loaded = []
+        for category in categories:
+            try:
+                if self.load_active(category) is not None:
+                    loaded.append(category)
+            except Exception as e:
+                print(f" Error precargando modelo de {category}: {e}")
+        return loaded
+
+
+# Instancia global
+model_registry = ModelRegistry()
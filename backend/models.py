@@ -39,6 +39,25 @@ class Sample(BaseModel):
     timestamp: str
     created_at: str
 
+class SamplePage(BaseModel):
+    """Página de muestras con el cursor de la siguiente"""
+    samples: List[Sample]
+    count: int
+    next_cursor: Optional[str] = None
+
+class BulkSignResult(BaseModel):
+    """Muestras de una seña guardadas en una ingesta masiva"""
+    count: int
+    first_id: int
+    last_id: int
+
+class BulkIngestResult(BaseModel):
+    """Resultado de una ingesta masiva de muestras"""
+    saved: int
+    signs: Dict[str, BulkSignResult]
+    rejected: List[Dict[str, Any]]
+    timestamp: str
+
 class Model(BaseModel):
     """Modelo entrenado"""
     id: int
@@ -67,6 +86,30 @@ class PredictionResult(BaseModel):
     
     model_config = {"protected_namespaces": ()}
 
+class BatchPredictionResult(BaseModel):
+    """Resultado de predicción de un lote de muestras"""
+    predictions: List[PredictionResult]
+    count: int
+    model_id: int
+    timestamp: str
+    
+    model_config = {"protected_namespaces": ()}
+
+class ExpressionBatch(BaseModel):
+    """Lote de expresiones matemáticas a evaluar"""
+    expressions: List[str]
+
+class ExpressionTokens(BaseModel):
+    """Tokens reconocidos ("7", "+", "mult", ...) para una sesión de expresión"""
+    tokens: List[str]
+
+class TuningRequest(BaseModel):
+    """Parámetros de una búsqueda de hiperparámetros"""
+    budget_seconds: Optional[float] = None
+    accuracy_target: Optional[float] = None
+    folds: Optional[int] = None
+    apply: bool = False
+
 class AIAgentMessage(BaseModel):
     """Mensaje del agente IA"""
     message: str
@@ -2,14 +2,17 @@
 Rutas específicas para el manejo del abecedario completo
 """
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Request, WebSocket, status
+from typing import List, Dict, Any, Union
 from datetime import datetime
 
-from models import Category, Sample, SampleCreate, Model, PredictionResult
+from models import Category, Sample, SamplePage, SampleCreate, Model, PredictionResult, BatchPredictionResult, BulkIngestResult
 from config import settings
 from store import store
 from datos_manager import datos_manager
+from streaming import stream_predictions
+from routes.category_handlers import enqueue_training, export_samples, ingest_bulk, list_samples, predict_batch
+from wire_format import prediction_payload, read_frame, read_sample, respond, wants_msgpack
 
 router = APIRouter()
 
@@ -25,7 +28,7 @@ async def get_abecedario():
 @router.post("/abecedario/category/{user_id}", response_model=Category)
 async def create_abecedario_category(user_id: int):
     """Crear categoría de abecedario para el usuario"""
-    category_id = len(store.categories) + 1
+    category_id = store.next_id("categories")
     
     category = Category(
         id=category_id,
@@ -37,30 +40,28 @@ async def create_abecedario_category(user_id: int):
         created_at=datetime.now().isoformat()
     )
     
-    store.categories[category_id] = category.model_dump()
-    store.save_data()
+    store.put("categories", category_id, category.model_dump())
     
     return category
 
-@router.get("/abecedario/samples/{user_id}", response_model=List[Sample])
-async def get_abecedario_samples(user_id: int):
-    """Obtener muestras del abecedario del usuario"""
-    try:
-        data = datos_manager.get_samples("abecedario")
-        user_samples = [
-            Sample(**sample) for sample in data.get("samples", [])
-            if sample.get("user_id") == user_id
-        ]
-        return user_samples
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error obteniendo muestras: {str(e)}"
-        )
+@router.get("/abecedario/samples/{user_id}", response_model=Union[List[Sample], SamplePage])
+async def get_abecedario_samples(user_id: int, cursor: str = None, limit: int = None, sign: str = None):
+    """Obtener muestras del abecedario del usuario (página con ``cursor`` o ``limit``, ver ``list_samples``)"""
+    return list_samples("abecedario", 2, user_id, cursor, limit, sign)
+
+@router.get("/abecedario/samples/{user_id}/export")
+async def export_abecedario_samples(user_id: int, sign: str = None):
+    """Exportar todas las muestras del abecedario del usuario como NDJSON (una por línea)"""
+    return export_samples("abecedario", 2, user_id, sign)
 
 @router.post("/abecedario/samples/{user_id}", response_model=Sample)
-async def create_abecedario_sample(user_id: int, sample: SampleCreate):
-    """Crear muestra de letra del abecedario"""
+async def create_abecedario_sample(user_id: int, request: Request, compact: bool = False):
+    """Crear muestra de letra del abecedario
+
+    Acepta JSON o msgpack; ``landmarks`` puede ser la lista de 21 puntos, 63
+    valores planos o float32 en base64. ``compact=true`` no devuelve los landmarks.
+    """
+    sample = await read_sample(request)
     if sample.category_name not in ABECEDARIO:
         raise HTTPException(
             status_code=400,
@@ -69,13 +70,22 @@ async def create_abecedario_sample(user_id: int, sample: SampleCreate):
     
     try:
         # Guardar en sistema de archivos separado
-        saved_sample = datos_manager.save_sample(
+        saved_sample = await datos_manager.save_sample_async(
             category="abecedario",
             sign=sample.category_name,
-            landmarks=sample.landmarks,
+            landmarks=sample.row,
             user_id=user_id
         )
         
+        if compact or wants_msgpack(request):
+            # Respuesta recortada: sin eco de los landmarks ni validación de Pydantic
+            return respond(request, {
+                "id": saved_sample["id"],
+                "category_name": sample.category_name,
+                "user_id": user_id,
+                "created_at": saved_sample["created_at"]
+            })
+        
         # Crear objeto Sample para respuesta
         new_sample = Sample(
             id=saved_sample["id"],
@@ -95,22 +105,20 @@ async def create_abecedario_sample(user_id: int, sample: SampleCreate):
             detail=f"Error guardando muestra: {str(e)}"
         )
 
+@router.post("/abecedario/samples/{user_id}/bulk", response_model=BulkIngestResult)
+async def create_abecedario_samples_bulk(user_id: int, request: Request, partial: bool = False):
+    """Ingesta masiva de muestras del abecedario de una sesión de captura (ver ``ingest_bulk``)"""
+    return await ingest_bulk("abecedario", ABECEDARIO, user_id, request, partial)
+
 @router.get("/abecedario/training-status/{user_id}")
 async def get_abecedario_training_status(user_id: int):
     """Obtener estado de entrenamiento del abecedario"""
     try:
-        data = datos_manager.get_samples("abecedario")
-        user_samples = [
-            sample for sample in data.get("samples", [])
-            if sample.get("user_id") == user_id
-        ]
-        
-        # Contar muestras por letra
-        letter_counts = {}
-        for letter in ABECEDARIO:
-            letter_counts[letter] = len([s for s in user_samples if s.get("category_name") == letter])
+        # Conteos del usuario por letra leídos del manifiesto de su partición
+        user_counts = datos_manager.get_user_sign_counts("abecedario", user_id)
+        letter_counts = {letter: user_counts.get(letter, 0) for letter in ABECEDARIO}
         
-        total_samples = len(user_samples)
+        total_samples = sum(user_counts.values())
         can_train = total_samples >= 10  # Mínimo 10 muestras para entrenar
         
         return {
@@ -130,7 +138,7 @@ async def get_abecedario_training_status(user_id: int):
 async def get_abecedario_stats(user_id: int):
     """Obtener estadísticas del abecedario"""
     try:
-        stats = datos_manager.get_category_stats("abecedario")
+        stats = datos_manager.get_category_stats("abecedario", user_id)
         return stats
     except Exception as e:
         raise HTTPException(
@@ -138,52 +146,41 @@ async def get_abecedario_stats(user_id: int):
             detail=f"Error obteniendo estadísticas: {str(e)}"
         )
 
-@router.post("/abecedario/train/{user_id}")
-async def train_abecedario_model(user_id: int):
-    """Entrenar modelo de ML para el abecedario"""
-    try:
-        from ml_model import models
-        
-        model = models["abecedario"]
-        result = model.train()
-        
-        return {
-            "success": result["success"],
-            "message": result["message"],
-            "accuracy": result["accuracy"],
-            "samples": result["samples"],
-            "classes": result.get("classes", []),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error entrenando modelo: {str(e)}"
-        )
+@router.post("/abecedario/train/{user_id}", status_code=202)
+async def train_abecedario_model(user_id: int, mode: str = "full", personal: bool = False):
+    """Encolar el entrenamiento del modelo del abecedario (ver ``enqueue_training``)"""
+    return enqueue_training("abecedario", user_id, mode, personal)
 
 @router.post("/abecedario/predict/{user_id}", response_model=PredictionResult)
-async def predict_letter(user_id: int, landmarks: List[Dict[str, float]]):
-    """Predecir letra basada en landmarks usando el modelo entrenado"""
+async def predict_letter(user_id: int, request: Request, top_k: int = None, compact: bool = False):
+    """Predecir letra basada en landmarks usando el modelo entrenado
+
+    El frame puede llegar en cualquier formato de ``wire_format``; con ``top_k``
+    o ``compact`` la respuesta se recorta (clases más probables, sin timestamp).
+    """
+    landmarks = await read_frame(request)
     try:
-        from ml_model import models
+        from ml_model import model_for, models
         
         # Verifica si el modelo está entrenado
         if "abecedario" not in models:
             return PredictionResult(
                 prediction="Modelo no entrenado",
                 confidence=0.0,
-                model_id=2,
+                model_id=0,
                 timestamp=datetime.now().isoformat()
             )
         
-        model = models["abecedario"]
+        model = model_for("abecedario", user_id)
         result = model.predict(landmarks)   # 👈 Usa el modelo entrenado
         
+        if top_k or compact or wants_msgpack(request):
+            return respond(request, prediction_payload(result, top_k, compact, datetime.now().isoformat()))
+        
         return PredictionResult(
             prediction=result["prediction"],
             confidence=result["confidence"],
-            model_id=2,
+            model_id=result.get("model_version", 0),
             timestamp=datetime.now().isoformat()
         )
     
@@ -191,10 +188,19 @@ async def predict_letter(user_id: int, landmarks: List[Dict[str, float]]):
         return PredictionResult(
             prediction="Error ML",
             confidence=0.0,
-            model_id=2,
+            model_id=0,
             timestamp=datetime.now().isoformat()
         )
 
+@router.websocket("/abecedario/stream/{user_id}")
+async def stream_abecedario(websocket: WebSocket, user_id: int):
+    """Reconocimiento continuo de letras: recibe frames y emite solo los cambios de etiqueta estable"""
+    await stream_predictions(websocket, "abecedario", user_id)
+
+@router.post("/abecedario/predict-batch/{user_id}", response_model=BatchPredictionResult)
+async def predict_abecedario_batch(user_id: int, request: Request, top_k: int = None, compact: bool = False):
+    """Predecir un lote de frames del abecedario con una sola pasada del modelo (ver ``predict_batch``)"""
+    return await predict_batch("abecedario", user_id, request, top_k, compact)
 
 @router.delete("/abecedario/samples/{user_id}/{letter}")
 async def delete_letter_samples(user_id: int, letter: str):
@@ -206,7 +212,7 @@ async def delete_letter_samples(user_id: int, letter: str):
         )
     
     try:
-        success = datos_manager.delete_sign_samples("abecedario", letter)
+        success = await datos_manager.delete_sign_samples_async("abecedario", letter)
         if success:
             return {
                 "message": f"Eliminadas todas las muestras de la letra '{letter}'",
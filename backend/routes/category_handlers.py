@@ -0,0 +1,187 @@
+"""
+Lógica compartida de las rutas por categoría de señas
+
+Listado paginado, exportación NDJSON, ingesta masiva, predicción por lotes y
+encolado del entrenamiento son iguales en todas las categorías; cada módulo de
+rutas declara sus endpoints y delega aquí con su clave, sus señas válidas y
+el id de su categoría.
+"""
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Union
+from datetime import datetime
+
+from models import Sample, SamplePage, PredictionResult, BatchPredictionResult
+from config import settings
+from datos_manager import datos_manager
+from training_jobs import JobConflict, training_jobs
+from wire_format import decode_bulk, encode_ndjson, prediction_payload, read_bulk, read_frames, respond, wants_msgpack
+
+# Modos de entrenamiento que se pueden pedir desde las rutas de cada categoría
+TRAINING_MODES = ["full", "incremental"]
+
+def list_samples(category: str, category_id: int, user_id: int, cursor: str = None,
+                 limit: int = None, sign: str = None) -> Union[List[Sample], SamplePage]:
+    """Muestras de una categoría del usuario
+
+    Sin ``cursor`` ni ``limit`` devuelve la lista completa, como siempre. Con
+    alguno de los dos devuelve una página (SamplePage): ``next_cursor`` pide
+    la siguiente y es None en la última.
+    """
+    paginated = cursor is not None or limit is not None
+    limit = settings.SAMPLES_PAGE_SIZE if limit is None else limit
+    if paginated and not 1 <= limit <= settings.SAMPLES_MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit debe estar entre 1 y {settings.SAMPLES_MAX_PAGE_SIZE}"
+        )
+    try:
+        if paginated:
+            page = datos_manager.list_samples(category, user_id, sign, cursor, limit)
+        else:
+            page = {"samples": [sample for _, sample in datos_manager.iter_samples(category, user_id, sign)]}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error obteniendo muestras: {str(e)}"
+        )
+    
+    samples = [Sample(**sample, category_id=category_id) for sample in page["samples"]]
+    if not paginated:
+        return samples
+    return SamplePage(samples=samples, count=len(samples), next_cursor=page["next_cursor"])
+
+def export_samples(category: str, category_id: int, user_id: int, sign: str = None) -> StreamingResponse:
+    """Todas las muestras de una categoría del usuario como NDJSON (una por línea)
+
+    Las muestras se leen y se envían por bloques, así que la memoria usada no
+    depende del tamaño del dataset.
+    """
+    def samples():
+        for _, sample in datos_manager.iter_samples(category, user_id, sign):
+            sample["category_id"] = category_id
+            yield sample
+    
+    return StreamingResponse(
+        encode_ndjson(samples(), settings.EXPORT_CHUNK_SAMPLES),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{category}-{user_id}.ndjson"'}
+    )
+
+async def ingest_bulk(category: str, signs: List[str], user_id: int, request: Request,
+                      partial: bool = False):
+    """Ingesta masiva de muestras de una sesión de captura
+
+    Acepta {"samples": [...]} (o la lista sola) en JSON o msgpack, NDJSON, o un
+    archivo subido en el campo ``file``. Cada elemento lleva ``category_name`` y
+    ``landmarks``, o ``frames`` para una ráfaga de la misma seña. El lote se
+    valida entero y se guarda con una escritura por seña; si algún elemento no
+    es válido se rechaza todo, salvo con ``partial=true``, que guarda el resto.
+    """
+    batch = decode_bulk(await read_bulk(request), signs, settings.BULK_MAX_SAMPLES)
+    if batch.rejected and not partial:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Lote con muestras no válidas; no se guardó ninguna", "rejected": batch.rejected}
+        )
+    
+    try:
+        saved = await datos_manager.save_samples_async(category, user_id, batch.signs)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error guardando muestras: {str(e)}"
+        )
+    
+    result = {
+        "saved": sum(len(metas) for metas in saved.values()),
+        "signs": {
+            sign: {"count": len(metas), "first_id": metas[0]["id"], "last_id": metas[-1]["id"]}
+            for sign, metas in saved.items()
+        },
+        "rejected": batch.rejected,
+        "timestamp": datetime.now().isoformat()
+    }
+    return respond(request, result) if wants_msgpack(request) else result
+
+async def predict_batch(category: str, user_id: int, request: Request, top_k: int = None,
+                        compact: bool = False):
+    """Predecir un lote de frames con una sola pasada del modelo
+
+    Acepta una lista de frames o los frames empaquetados en float32 (base64,
+    msgpack binario o 63·N valores planos).
+    """
+    frames = await read_frames(request)
+    try:
+        from ml_model import model_for
+        
+        model = model_for(category, user_id)
+        results = model.predict_batch(frames)
+        timestamp = datetime.now().isoformat()
+        
+        if top_k or compact or wants_msgpack(request):
+            return respond(request, {
+                "predictions": [prediction_payload(result, top_k, compact) for result in results],
+                "count": len(results),
+                "model_id": max((r.get("model_version", 0) for r in results), default=0)
+            })
+        
+        predictions = [
+            PredictionResult(
+                prediction=result["prediction"],
+                confidence=result["confidence"],
+                model_id=result.get("model_version", 0),
+                timestamp=timestamp
+            )
+            for result in results
+        ]
+        
+        return BatchPredictionResult(
+            predictions=predictions,
+            count=len(predictions),
+            model_id=max((r.get("model_version", 0) for r in results), default=0),
+            timestamp=timestamp
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en predicción: {str(e)}"
+        )
+
+def enqueue_training(category: str, user_id: int, mode: str = "full", personal: bool = False) -> Dict[str, Any]:
+    """Encolar el entrenamiento del modelo de una categoría
+
+    Responde de inmediato con el id del trabajo; el progreso se consulta en
+    /training-jobs/{job_id} o se sigue en /training-jobs/{job_id}/events.
+    ``mode=incremental`` añade árboles entrenados solo con las muestras nuevas.
+    ``personal=true`` entrena el modelo propio del usuario, solo con sus muestras;
+    sus predicciones lo usan en lugar del global.
+    """
+    if mode not in TRAINING_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modo '{mode}' no válido. Modos disponibles: {TRAINING_MODES}"
+        )
+    
+    try:
+        job = training_jobs.submit(category, user_id, mode, personal=personal)
+        
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "mode": job["mode"],
+            "category": job["category"],
+            "personal": job["personal"],
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error entrenando modelo: {str(e)}"
+        )
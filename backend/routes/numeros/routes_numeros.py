@@ -2,14 +2,17 @@
 Rutas específicas para el manejo de números
 """
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Request, WebSocket, status
+from typing import List, Dict, Any, Union
 from datetime import datetime
 
-from models import Category, Sample, SampleCreate, Model, PredictionResult
+from models import Category, Sample, SamplePage, SampleCreate, Model, PredictionResult, BatchPredictionResult, BulkIngestResult
 from config import settings
 from store import store
 from datos_manager import datos_manager
+from streaming import stream_predictions
+from routes.category_handlers import enqueue_training, export_samples, ingest_bulk, list_samples, predict_batch
+from wire_format import prediction_payload, read_frame, read_sample, respond, wants_msgpack
 
 router = APIRouter()
 
@@ -24,7 +27,7 @@ async def get_numeros():
 @router.post("/numeros/category/{user_id}", response_model=Category)
 async def create_numeros_category(user_id: int):
     """Crear categoría de números para el usuario"""
-    category_id = len(data_store["categories"]) + 1
+    category_id = store.next_id("categories")
     
     category = Category(
         id=category_id,
@@ -36,27 +39,28 @@ async def create_numeros_category(user_id: int):
         created_at=datetime.now().isoformat()
     )
     
-    store.categories[category_id] = category.dict()
-    store.save_data()
+    store.put("categories", category_id, category.dict())
     
     return category
 
-@router.get("/numeros/samples/{user_id}", response_model=List[Sample])
-async def get_numeros_samples(user_id: int):
-    """Obtener muestras de números del usuario"""
-    try:
-        data = datos_manager.get_samples("numeros")
-        user_samples = [
-            Sample(**sample) for sample in data.get("samples", [])
-            if sample.get("user_id") == user_id
-        ]
-    except Exception as e:
-        user_samples = []
-    return user_samples
+@router.get("/numeros/samples/{user_id}", response_model=Union[List[Sample], SamplePage])
+async def get_numeros_samples(user_id: int, cursor: str = None, limit: int = None, sign: str = None):
+    """Obtener muestras de números del usuario (página con ``cursor`` o ``limit``, ver ``list_samples``)"""
+    return list_samples("numeros", 3, user_id, cursor, limit, sign)
+
+@router.get("/numeros/samples/{user_id}/export")
+async def export_numeros_samples(user_id: int, sign: str = None):
+    """Exportar todas las muestras de números del usuario como NDJSON (una por línea)"""
+    return export_samples("numeros", 3, user_id, sign)
 
 @router.post("/numeros/samples/{user_id}", response_model=Sample)
-async def create_numeros_sample(user_id: int, sample: SampleCreate):
-    """Crear muestra de número"""
+async def create_numeros_sample(user_id: int, request: Request, compact: bool = False):
+    """Crear muestra de número
+
+    Acepta JSON o msgpack; ``landmarks`` puede ser la lista de 21 puntos, 63
+    valores planos o float32 en base64. ``compact=true`` no devuelve los landmarks.
+    """
+    sample = await read_sample(request)
     if sample.category_name not in NUMEROS:
         raise HTTPException(
             status_code=400,
@@ -65,13 +69,22 @@ async def create_numeros_sample(user_id: int, sample: SampleCreate):
     
     try:
         # Guardar en sistema de archivos separado
-        saved_sample = datos_manager.save_sample(
+        saved_sample = await datos_manager.save_sample_async(
             category="numeros",
             sign=sample.category_name,
-            landmarks=sample.landmarks,
+            landmarks=sample.row,
             user_id=user_id
         )
         
+        if compact or wants_msgpack(request):
+            # Respuesta recortada: sin eco de los landmarks ni validación de Pydantic
+            return respond(request, {
+                "id": saved_sample["id"],
+                "category_name": sample.category_name,
+                "user_id": user_id,
+                "created_at": saved_sample["created_at"]
+            })
+        
         # Crear objeto Sample para respuesta
         new_sample = Sample(
             id=saved_sample["id"],
@@ -91,20 +104,18 @@ async def create_numeros_sample(user_id: int, sample: SampleCreate):
             detail=f"Error guardando muestra: {str(e)}"
         )
 
+@router.post("/numeros/samples/{user_id}/bulk", response_model=BulkIngestResult)
+async def create_numeros_samples_bulk(user_id: int, request: Request, partial: bool = False):
+    """Ingesta masiva de muestras de números de una sesión de captura (ver ``ingest_bulk``)"""
+    return await ingest_bulk("numeros", NUMEROS, user_id, request, partial)
+
 @router.get("/numeros/training-status/{user_id}")
 async def get_numeros_training_status(user_id: int):
     """Obtener estado de entrenamiento de números"""
-    user_samples = [
-        sample for sample in store.samples.values()
-        if sample.get("user_id") == user_id and sample.get("category_name") in NUMEROS
-    ]
-    
-    # Contar muestras por número
-    numero_counts = {}
-    for numero in NUMEROS:
-        numero_counts[numero] = len([s for s in user_samples if s.get("category_name") == numero])
+    # Conteos por número desde el índice (usuario, seña) del store
+    numero_counts = store.user_sign_counts(user_id, NUMEROS)
     
-    total_samples = len(user_samples)
+    total_samples = sum(numero_counts.values())
     can_train = total_samples >= settings.MIN_SAMPLES_FOR_TRAINING
     
     return {
@@ -116,27 +127,35 @@ async def get_numeros_training_status(user_id: int):
     }
 
 @router.post("/numeros/predict/{user_id}", response_model=PredictionResult)
-async def predict_numero(user_id: int, landmarks: List[Dict[str, float]]):
-    """Predecir número basado en landmarks usando ML"""
+async def predict_numero(user_id: int, request: Request, top_k: int = None, compact: bool = False):
+    """Predecir número basado en landmarks usando ML
+
+    El frame puede llegar en cualquier formato de ``wire_format``; con ``top_k``
+    o ``compact`` la respuesta se recorta (clases más probables, sin timestamp).
+    """
+    landmarks = await read_frame(request)
     try:
-        from ml_model import models
+        from ml_model import model_for
         
         # Usar modelo de ML para números
-        model = models["numeros"]
+        model = model_for("numeros", user_id)
         result = model.predict(landmarks)
         
+        if top_k or compact or wants_msgpack(request):
+            return respond(request, prediction_payload(result, top_k, compact, datetime.now().isoformat()))
+        
         if "error" in result:
             return PredictionResult(
                 prediction=result["prediction"],
                 confidence=result["confidence"],
-                model_id=2,
+                model_id=result.get("model_version", 0),
                 timestamp=datetime.now().isoformat()
             )
         
         return PredictionResult(
             prediction=result["prediction"],
             confidence=result["confidence"],
-            model_id=2,
+            model_id=result.get("model_version", 0),
             timestamp=datetime.now().isoformat()
         )
             
@@ -145,40 +164,30 @@ async def predict_numero(user_id: int, landmarks: List[Dict[str, float]]):
         return PredictionResult(
             prediction="Error ML",
             confidence=0.0,
-            model_id=2,
+            model_id=0,
             timestamp=datetime.now().isoformat()
         )
 
+@router.websocket("/numeros/stream/{user_id}")
+async def stream_numeros(websocket: WebSocket, user_id: int):
+    """Reconocimiento continuo de números: recibe frames y emite solo los cambios de etiqueta estable"""
+    await stream_predictions(websocket, "numeros", user_id)
 
-@router.post("/numeros/train/{user_id}")
-async def train_numeros_model(user_id: int):
-    """Entrenar modelo de ML para números"""
-    try:
-        from ml_model import models
-        
-        model = models["numeros"]
-        result = model.train()
-        
-        return {
-            "success": result["success"],
-            "message": result["message"],
-            "accuracy": result["accuracy"],
-            "samples": result["samples"],
-            "classes": result.get("classes", []),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error entrenando modelo: {str(e)}"
-        )
+@router.post("/numeros/predict-batch/{user_id}", response_model=BatchPredictionResult)
+async def predict_numeros_batch(user_id: int, request: Request, top_k: int = None, compact: bool = False):
+    """Predecir un lote de frames de números con una sola pasada del modelo (ver ``predict_batch``)"""
+    return await predict_batch("numeros", user_id, request, top_k, compact)
+
+@router.post("/numeros/train/{user_id}", status_code=202)
+async def train_numeros_model(user_id: int, mode: str = "full", personal: bool = False):
+    """Encolar el entrenamiento del modelo de números (ver ``enqueue_training``)"""
+    return enqueue_training("numeros", user_id, mode, personal)
 
 @router.get("/numeros/stats/{user_id}")
 async def get_numeros_stats(user_id: int):
     """Obtener estadísticas de números"""
     try:
-        stats = datos_manager.get_category_stats("numeros")
+        stats = datos_manager.get_category_stats("numeros", user_id)
         return stats
     except Exception as e:
         raise HTTPException(
@@ -196,7 +205,7 @@ async def delete_numero_samples(user_id: int, numero: str):
         )
     
     try:
-        success = datos_manager.delete_sign_samples("numeros", numero)
+        success = await datos_manager.delete_sign_samples_async("numeros", numero)
         if success:
             return {
                 "message": f"Eliminadas todas las muestras del número '{numero}'",
@@ -2,15 +2,22 @@
 Rutas específicas para el manejo de operaciones matemáticas
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Union
 from datetime import datetime
+import json
+import numpy as np
 
-from models import Category, Sample, SampleCreate, PredictionResult
-from math_evaluator import MathEvaluator
+from models import Category, Sample, SamplePage, SampleCreate, PredictionResult, BatchPredictionResult, ExpressionBatch, ExpressionTokens, BulkIngestResult
+from math_evaluator import MathEvaluator, PROBLEM_DIFFICULTIES, iter_problem_blocks
+from expression_sessions import expression_sessions, EXPRESSION_CATEGORIES
 from config import settings
 from store import store
 from datos_manager import datos_manager
+from streaming import stream_predictions
+from routes.category_handlers import enqueue_training, export_samples, ingest_bulk, list_samples, predict_batch
+from wire_format import prediction_payload, read_frame, read_sample, respond, wants_msgpack
 
 router = APIRouter()
 math_evaluator = MathEvaluator()
@@ -27,7 +34,7 @@ async def get_operaciones():
 @router.post("/operaciones/category/{user_id}", response_model=Category)
 async def create_operaciones_category(user_id: int):
     """Crear categoría de operaciones para el usuario"""
-    category_id = len(store.categories) + 1   # ✅ corregido (antes usaba data_store que no existe)
+    category_id = store.next_id("categories")
     
     category = Category(
         id=category_id,
@@ -39,32 +46,29 @@ async def create_operaciones_category(user_id: int):
         created_at=datetime.now().isoformat()
     )
     
-    store.categories[category_id] = category.dict()
-    store.save_data()
+    store.put("categories", category_id, category.dict())
     
     return category
 
 
-@router.get("/operaciones/samples/{user_id}", response_model=List[Sample])
-async def get_operaciones_samples(user_id: int):
-    """Obtener muestras de operaciones del usuario"""
-    try:
-        data = datos_manager.get_samples("operaciones")
-        user_samples = [
-            Sample(**sample) for sample in data.get("samples", [])
-            if sample.get("user_id") == user_id
-        ]
-        return user_samples
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error obteniendo muestras: {str(e)}"
-        )
+@router.get("/operaciones/samples/{user_id}", response_model=Union[List[Sample], SamplePage])
+async def get_operaciones_samples(user_id: int, cursor: str = None, limit: int = None, sign: str = None):
+    """Obtener muestras de operaciones del usuario (página con ``cursor`` o ``limit``, ver ``list_samples``)"""
+    return list_samples("operaciones", 4, user_id, cursor, limit, sign)
 
+@router.get("/operaciones/samples/{user_id}/export")
+async def export_operaciones_samples(user_id: int, sign: str = None):
+    """Exportar todas las muestras de operaciones del usuario como NDJSON (una por línea)"""
+    return export_samples("operaciones", 4, user_id, sign)
 
 @router.post("/operaciones/samples/{user_id}", response_model=Sample)
-async def create_operaciones_sample(user_id: int, sample: SampleCreate):
-    """Crear muestra de operación"""
+async def create_operaciones_sample(user_id: int, request: Request, compact: bool = False):
+    """Crear muestra de operación
+
+    Acepta JSON o msgpack; ``landmarks`` puede ser la lista de 21 puntos, 63
+    valores planos o float32 en base64. ``compact=true`` no devuelve los landmarks.
+    """
+    sample = await read_sample(request)
     if sample.category_name not in OPERACIONES:
         raise HTTPException(
             status_code=400,
@@ -73,13 +77,22 @@ async def create_operaciones_sample(user_id: int, sample: SampleCreate):
     
     try:
         # Guardar en sistema de archivos separado
-        saved_sample = datos_manager.save_sample(
+        saved_sample = await datos_manager.save_sample_async(
             category="operaciones",
             sign=sample.category_name,
-            landmarks=sample.landmarks,
+            landmarks=sample.row,
             user_id=user_id
         )
         
+        if compact or wants_msgpack(request):
+            # Respuesta recortada: sin eco de los landmarks ni validación de Pydantic
+            return respond(request, {
+                "id": saved_sample["id"],
+                "category_name": sample.category_name,
+                "user_id": user_id,
+                "created_at": saved_sample["created_at"]
+            })
+        
         # Crear objeto Sample para respuesta
         new_sample = Sample(
             id=saved_sample["id"],
@@ -100,22 +113,20 @@ async def create_operaciones_sample(user_id: int, sample: SampleCreate):
         )
 
 
+@router.post("/operaciones/samples/{user_id}/bulk", response_model=BulkIngestResult)
+async def create_operaciones_samples_bulk(user_id: int, request: Request, partial: bool = False):
+    """Ingesta masiva de muestras de operaciones de una sesión de captura (ver ``ingest_bulk``)"""
+    return await ingest_bulk("operaciones", OPERACIONES, user_id, request, partial)
+
 @router.get("/operaciones/training-status/{user_id}")
 async def get_operaciones_training_status(user_id: int):
     """Obtener estado de entrenamiento de operaciones"""
     try:
-        data = datos_manager.get_samples("operaciones")
-        user_samples = [
-            sample for sample in data.get("samples", [])
-            if sample.get("user_id") == user_id
-        ]
+        # Conteos del usuario por operación leídos del manifiesto de su partición
+        user_counts = datos_manager.get_user_sign_counts("operaciones", user_id)
+        operacion_counts = {operacion: user_counts.get(operacion, 0) for operacion in OPERACIONES}
         
-        # Contar muestras por operación
-        operacion_counts = {}
-        for operacion in OPERACIONES:
-            operacion_counts[operacion] = len([s for s in user_samples if s.get("category_name") == operacion])
-        
-        total_samples = len(user_samples)
+        total_samples = sum(user_counts.values())
         can_train = total_samples >= settings.MIN_SAMPLES_FOR_TRAINING
         
         return {
@@ -136,7 +147,7 @@ async def get_operaciones_training_status(user_id: int):
 async def get_operaciones_stats(user_id: int):
     """Obtener estadísticas de operaciones"""
     try:
-        stats = datos_manager.get_category_stats("operaciones")
+        stats = datos_manager.get_category_stats("operaciones", user_id)
         return stats
     except Exception as e:
         raise HTTPException(
@@ -145,46 +156,33 @@ async def get_operaciones_stats(user_id: int):
         )
 
 
-@router.post("/operaciones/train/{user_id}")
-async def train_operaciones_model(user_id: int):
-    """Entrenar modelo de ML para operaciones"""
-    try:
-        from ml_model import models
-        
-        # Usar el modelo de operaciones
-        model = models["operaciones"]
-        result = model.train()
-        
-        return {
-            "success": result["success"],
-            "message": result["message"],
-            "accuracy": result["accuracy"],
-            "samples": result["samples"],
-            "classes": result.get("classes", []),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error entrenando modelo: {str(e)}"
-        )
-
+@router.post("/operaciones/train/{user_id}", status_code=202)
+async def train_operaciones_model(user_id: int, mode: str = "full", personal: bool = False):
+    """Encolar el entrenamiento del modelo de operaciones (ver ``enqueue_training``)"""
+    return enqueue_training("operaciones", user_id, mode, personal)
 
 @router.post("/operaciones/predict/{user_id}", response_model=PredictionResult)
-async def predict_operacion(user_id: int, landmarks: List[Dict[str, float]]):
-    """Predecir operación basada en landmarks"""
+async def predict_operacion(user_id: int, request: Request, top_k: int = None, compact: bool = False):
+    """Predecir operación basada en landmarks
+
+    El frame puede llegar en cualquier formato de ``wire_format``; con ``top_k``
+    o ``compact`` la respuesta se recorta (clases más probables, sin timestamp).
+    """
+    landmarks = await read_frame(request)
     try:
-        from ml_model import models
+        from ml_model import model_for
         
         # Usar modelo entrenado para operaciones
-        model = models["operaciones"]
+        model = model_for("operaciones", user_id)
         result = model.predict(landmarks)
         
+        if top_k or compact or wants_msgpack(request):
+            return respond(request, prediction_payload(result, top_k, compact, datetime.now().isoformat()))
+        
         return PredictionResult(
             prediction=result["prediction"],
             confidence=result["confidence"],
-            model_id=3,
+            model_id=result.get("model_version", 0),
             timestamp=datetime.now().isoformat()
         )
     except Exception as e:
@@ -193,6 +191,15 @@ async def predict_operacion(user_id: int, landmarks: List[Dict[str, float]]):
             detail=f"Error en predicción: {str(e)}"
         )
 
+@router.websocket("/operaciones/stream/{user_id}")
+async def stream_operaciones(websocket: WebSocket, user_id: int):
+    """Reconocimiento continuo de operaciones: recibe frames y emite solo los cambios de etiqueta estable"""
+    await stream_predictions(websocket, "operaciones", user_id)
+
+@router.post("/operaciones/predict-batch/{user_id}", response_model=BatchPredictionResult)
+async def predict_operaciones_batch(user_id: int, request: Request, top_k: int = None, compact: bool = False):
+    """Predecir un lote de frames de operaciones con una sola pasada del modelo (ver ``predict_batch``)"""
+    return await predict_batch("operaciones", user_id, request, top_k, compact)
 
 @router.post("/operaciones/evaluate")
 async def evaluate_expression(expression: str):
@@ -200,13 +207,137 @@ async def evaluate_expression(expression: str):
     result = math_evaluator.evaluate_expression(expression)
     return result
 
+@router.post("/operaciones/evaluate-batch")
+async def evaluate_expressions_batch(batch: ExpressionBatch):
+    """Evaluar muchas expresiones matemáticas en una sola petición"""
+    if len(batch.expressions) > settings.EVALUATE_BATCH_MAX_EXPRESSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.EVALUATE_BATCH_MAX_EXPRESSIONS} expresiones por petición"
+        )
+    
+    results = math_evaluator.evaluate_batch(batch.expressions)
+    return {
+        "results": results,
+        "count": len(results),
+        "valid_count": sum(1 for result in results if result["valid"]),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _get_expression_session(user_id: int, session_id: str):
+    session = expression_sessions.get(session_id, user_id)
+    if session is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sesión de expresión '{session_id}' no encontrada"
+        )
+    return session
+
+@router.post("/operaciones/expression-sessions/{user_id}")
+async def create_expression_session(user_id: int):
+    """Abrir una sesión que arma y evalúa una expresión token a token"""
+    return expression_sessions.create(user_id)
+
+@router.get("/operaciones/expression-sessions/{user_id}/{session_id}")
+async def get_expression_session(user_id: int, session_id: str):
+    """Estado actual de una sesión de expresión"""
+    return _get_expression_session(user_id, session_id).state()
+
+@router.post("/operaciones/expression-sessions/{user_id}/{session_id}/tokens")
+async def push_expression_tokens(user_id: int, session_id: str, body: ExpressionTokens):
+    """Añadir tokens reconocidos; devuelve el valor actual tras cada uno
+
+    Los dígitos consecutivos forman un número; "=" cierra la expresión.
+    """
+    session = _get_expression_session(user_id, session_id)
+    states = expression_sessions.push_tokens(session, body.tokens)
+    return {
+        "states": states,
+        **session.state()
+    }
+
+@router.post("/operaciones/expression-sessions/{user_id}/{session_id}/sign")
+async def push_expression_sign(user_id: int, session_id: str, landmarks: List[Dict[str, float]],
+                               category: str = None):
+    """Reconocer una seña con los modelos de números y operaciones y añadirla a la expresión"""
+    if category is not None and category not in EXPRESSION_CATEGORIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Categoría '{category}' no válida. Categorías disponibles: {list(EXPRESSION_CATEGORIES)}"
+        )
+    session = _get_expression_session(user_id, session_id)
+    try:
+        return expression_sessions.push_landmarks(session, landmarks, category, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en predicción: {str(e)}"
+        )
+
+@router.post("/operaciones/expression-sessions/{user_id}/{session_id}/reset")
+async def reset_expression_session(user_id: int, session_id: str):
+    """Descartar la expresión en curso y empezar otra en la misma sesión"""
+    session = _get_expression_session(user_id, session_id)
+    session.reset()
+    return session.state()
+
+@router.delete("/operaciones/expression-sessions/{user_id}/{session_id}")
+async def delete_expression_session(user_id: int, session_id: str):
+    """Cerrar una sesión de expresión"""
+    if not expression_sessions.delete(session_id, user_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sesión de expresión '{session_id}' no encontrada"
+        )
+    return {"message": "Sesión cerrada", "session_id": session_id}
 
 @router.get("/operaciones/problems/{difficulty}")
-async def get_math_problems(difficulty: str = "easy", count: int = 5):
-    """Generar problemas matemáticos para entrenamiento"""
-    problems = math_evaluator.generate_math_problems(difficulty, count)
+async def get_math_problems(difficulty: str = "easy", count: int = 5, seed: int = None,
+                            offset: int = 0, stream: bool = False):
+    """Generar problemas matemáticos para entrenamiento
+
+    La misma ``seed`` produce siempre la misma secuencia: ``offset`` pide la
+    página siguiente (``next_offset``). Con ``stream=true`` los problemas se
+    envían como NDJSON (un problema por línea) a medida que se generan.
+    """
+    if difficulty not in PROBLEM_DIFFICULTIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dificultad '{difficulty}' no válida. Dificultades disponibles: {list(PROBLEM_DIFFICULTIES)}"
+        )
+    limit = settings.PROBLEMS_MAX_STREAM if stream else settings.PROBLEMS_MAX_PAGE
+    if count < 0 or offset < 0 or count > limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"count debe estar entre 0 y {limit} y offset no puede ser negativo"
+        )
+    if seed is not None and seed < 0:
+        # default_rng solo acepta semillas no negativas; se valida antes de enviar cabeceras
+        raise HTTPException(
+            status_code=400,
+            detail="seed no puede ser negativa"
+        )
+    if seed is None:
+        seed = int(np.random.default_rng().integers(2 ** 31))
+    
+    if stream:
+        def lines():
+            for block in iter_problem_blocks(difficulty, count, seed, offset):
+                yield "".join(json.dumps(problem) + "\n" for problem in block)
+        
+        return StreamingResponse(
+            lines(),
+            media_type="application/x-ndjson",
+            headers={"X-Problem-Seed": str(seed)}
+        )
+    
+    problems = math_evaluator.generate_math_problems(difficulty, count, seed, offset)
     return {
         "difficulty": difficulty,
+        "seed": seed,
+        "offset": offset,
+        "next_offset": offset + len(problems),
         "count": len(problems),
         "problems": problems
     }
@@ -244,7 +375,7 @@ async def delete_operacion_samples(user_id: int, operacion: str):
         )
     
     try:
-        success = datos_manager.delete_sign_samples("operaciones", operacion)
+        success = await datos_manager.delete_sign_samples_async("operaciones", operacion)
         if success:
             print(f"✅ Eliminación exitosa para operación: {operacion}")
             return {
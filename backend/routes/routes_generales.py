@@ -3,14 +3,18 @@ Rutas generales del Sistema Inteligente de Reconocimiento de Señas
 """
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
+import asyncio
 import json
 import os
 from datetime import datetime
 
-from models import User, Category, Sample, Model, AIAgentMessage, AnalyticsData
+from models import User, Category, Sample, Model, AIAgentMessage, AnalyticsData, TuningRequest
 from config import settings
 from store import store
+from training_jobs import training_jobs, FINISHED_STATUSES, JobConflict
+from model_registry import model_key, model_registry
 
 router = APIRouter()
 
@@ -82,20 +86,167 @@ async def get_training_feedback(user_id: int, accuracy: float):
 @router.get("/analytics/{user_id}", response_model=AnalyticsData)
 async def get_analytics(user_id: int):
     """Obtener analíticas del usuario"""
-    user_categories = [c for c in store.categories.values() if c.get("user_id") == user_id]
-    user_samples = [s for s in store.samples.values() if s.get("user_id") == user_id]
-    user_models = [m for m in store.models.values() if m.get("user_id") == user_id]
-    
-    category_distribution = {}
-    for category in user_categories:
-        cat_type = category.get("type", "unknown")
-        category_distribution[cat_type] = category_distribution.get(cat_type, 0) + 1
-    
+    # Conteos mantenidos por los índices del store, sin recorrer las colecciones
     return AnalyticsData(
-        total_categories=len(user_categories),
-        total_samples=len(user_samples),
-        total_models=len(user_models),
-        category_distribution=category_distribution,
+        total_categories=store.count_user("categories", user_id),
+        total_samples=store.count_user("samples", user_id),
+        total_models=store.count_user("models", user_id),
+        category_distribution=store.user_category_types(user_id),
         accuracy_evolution=[],
         recommendations=[]
     )
+
+@router.get("/training-jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """Consultar fase, progreso y métricas finales de un trabajo de entrenamiento"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Trabajo de entrenamiento '{job_id}' no encontrado"
+        )
+    return job
+
+@router.get("/training-jobs/{job_id}/events")
+async def stream_training_job(job_id: str):
+    """Seguir un trabajo de entrenamiento con Server-Sent Events hasta que termine"""
+    if training_jobs.get(job_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Trabajo de entrenamiento '{job_id}' no encontrado"
+        )
+    
+    async def events():
+        last_version = -1
+        while True:
+            job = training_jobs.get(job_id)
+            if job is None:
+                return
+            if job["version"] != last_version:
+                last_version = job["version"]
+                yield f"event: {job['phase']}\ndata: {json.dumps(job, default=str)}\n\n"
+            if job["status"] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(0.25)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.get("/models/cache")
+async def get_model_cache():
+    """Ocupación y aciertos de la caché de modelos personales"""
+    return {
+        **model_registry.cache_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/models/{category}/versions")
+async def get_model_versions(category: str, user_id: int = None):
+    """Listar las versiones guardadas del modelo de una categoría y la activa
+
+    Con ``user_id`` se listan las del modelo personal de ese usuario.
+    """
+    from ml_model import models
+    
+    if category not in models:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Categoría '{category}' no válida"
+        )
+    
+    key = model_key(category, user_id)
+    registry = model_registry.read_registry(key)
+    active = model_registry.get(key)
+    return {
+        **registry,
+        "loaded_version": active.version if active else None
+    }
+
+@router.post("/models/{category}/rollback")
+async def rollback_model(category: str, version: int = None, user_id: int = None):
+    """Revertir el modelo de una categoría a una versión anterior (o a la indicada)
+
+    Con ``user_id`` se revierte el modelo personal de ese usuario.
+    """
+    from ml_model import models
+    
+    if category not in models:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Categoría '{category}' no válida"
+        )
+    
+    try:
+        active = model_registry.rollback(model_key(category, user_id), version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "category": category,
+        "user_id": user_id,
+        "active_version": active.version,
+        "accuracy": active.accuracy,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.post("/models/{category}/tune/{user_id}", status_code=202)
+async def tune_model(category: str, user_id: int, request: TuningRequest = None):
+    """Encolar una búsqueda de hiperparámetros del modelo de una categoría
+
+    Evalúa los candidatos con validación cruzada en paralelo dentro del
+    presupuesto de tiempo; el resultado del trabajo informa la precisión y la
+    latencia de un frame de cada candidato. Con ``apply`` se publica un modelo
+    entrenado con el candidato más rápido que alcanza ``accuracy_target``.
+    La búsqueda es siempre sobre el modelo global: ``user_id`` solo queda
+    registrado en el trabajo como quien la solicitó. Si el modelo tiene un
+    entrenamiento pendiente se responde 409.
+    """
+    from ml_model import models
+    
+    if category not in models:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Categoría '{category}' no válida"
+        )
+    
+    request = request or TuningRequest()
+    budget = request.budget_seconds
+    if budget is None:
+        budget = settings.TUNING_DEFAULT_BUDGET_SECONDS
+    if not 0 < budget <= settings.TUNING_MAX_BUDGET_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El presupuesto debe estar entre 0 y {settings.TUNING_MAX_BUDGET_SECONDS} segundos"
+        )
+    if request.accuracy_target is not None and not 0.0 <= request.accuracy_target <= 1.0:
+        raise HTTPException(
+            status_code=400,
+            detail="La precisión objetivo debe estar entre 0 y 1"
+        )
+    folds = request.folds if request.folds is not None else settings.TUNING_FOLDS
+    if folds < 2:
+        raise HTTPException(
+            status_code=400,
+            detail="Se necesitan al menos 2 folds"
+        )
+    
+    try:
+        job = training_jobs.submit(category, user_id, "tune", {
+            "budget_seconds": budget,
+            "accuracy_target": request.accuracy_target,
+            "n_folds": folds,
+            "apply": request.apply
+        })
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "mode": job["mode"],
+        "category": job["category"],
+        "timestamp": datetime.now().isoformat()
+    }
@@ -2,14 +2,16 @@
 Rutas específicas para el manejo de vocales
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from typing import List, Dict, Any
 from datetime import datetime
 
-from models import Category, Sample, SampleCreate, Model, PredictionResult
+from models import Category, Sample, SampleCreate, Model, PredictionResult, BulkIngestResult
 from config import settings
 from store import store
 from datos_manager import datos_manager
+from routes.category_handlers import ingest_bulk
+from wire_format import read_sample, respond, wants_msgpack
 
 router = APIRouter()
 
@@ -24,7 +26,7 @@ async def get_vocales():
 @router.post("/vocales/category/{user_id}", response_model=Category)
 async def create_vocales_category(user_id: int):
     """Crear categoría de vocales para el usuario"""
-    category_id = len(store.categories) + 1
+    category_id = store.next_id("categories")
     
     category = Category(
         id=category_id,
@@ -36,8 +38,7 @@ async def create_vocales_category(user_id: int):
         created_at=datetime.now().isoformat()
     )
     
-    store.categories[category_id] = category.model_dump()
-    store.save_data()
+    store.put("categories", category_id, category.model_dump())
     
     return category
 
@@ -45,14 +46,18 @@ async def create_vocales_category(user_id: int):
 async def get_vocales_samples(user_id: int):
     """Obtener muestras de vocales del usuario"""
     user_samples = [
-        Sample(**sample) for sample in store.samples.values()
-        if sample.get("user_id") == user_id and sample.get("category_name") in VOCALES
+        Sample(**sample) for sample in store.user_sign_samples(user_id, VOCALES)
     ]
     return user_samples
 
 @router.post("/vocales/samples/{user_id}", response_model=Sample)
-async def create_vocales_sample(user_id: int, sample: SampleCreate):
-    """Crear muestra de vocal"""
+async def create_vocales_sample(user_id: int, request: Request, compact: bool = False):
+    """Crear muestra de vocal
+
+    Acepta JSON o msgpack; ``landmarks`` puede ser la lista de 21 puntos, 63
+    valores planos o float32 en base64. ``compact=true`` no devuelve los landmarks.
+    """
+    sample = await read_sample(request)
     if sample.category_name not in VOCALES:
         raise HTTPException(
             status_code=400,
@@ -61,13 +66,22 @@ async def create_vocales_sample(user_id: int, sample: SampleCreate):
     
     try:
         # Guardar en sistema de archivos separado
-        saved_sample = datos_manager.save_sample(
+        saved_sample = await datos_manager.save_sample_async(
             category="vocales",
             sign=sample.category_name,
-            landmarks=sample.landmarks,
+            landmarks=sample.row,
             user_id=user_id
         )
         
+        if compact or wants_msgpack(request):
+            # Respuesta recortada: sin eco de los landmarks ni validación de Pydantic
+            return respond(request, {
+                "id": saved_sample["id"],
+                "category_name": sample.category_name,
+                "user_id": user_id,
+                "created_at": saved_sample["created_at"]
+            })
+        
         # Crear objeto Sample para respuesta
         new_sample = Sample(
             id=saved_sample["id"],
@@ -87,20 +101,18 @@ async def create_vocales_sample(user_id: int, sample: SampleCreate):
             detail=f"Error guardando muestra: {str(e)}"
         )
 
+@router.post("/vocales/samples/{user_id}/bulk", response_model=BulkIngestResult)
+async def create_vocales_samples_bulk(user_id: int, request: Request, partial: bool = False):
+    """Ingesta masiva de muestras de vocales de una sesión de captura (ver ``ingest_bulk``)"""
+    return await ingest_bulk("vocales", VOCALES, user_id, request, partial)
+
 @router.get("/vocales/training-status/{user_id}")
 async def get_vocales_training_status(user_id: int):
     """Obtener estado de entrenamiento de vocales"""
-    user_samples = [
-        sample for sample in store.samples.values()
-        if sample.get("user_id") == user_id and sample.get("category_name") in VOCALES
-    ]
-    
-    # Contar muestras por vocal
-    vocal_counts = {}
-    for vocal in VOCALES:
-        vocal_counts[vocal] = len([s for s in user_samples if s.get("category_name") == vocal])
+    # Conteos por vocal desde el índice (usuario, seña) del store
+    vocal_counts = store.user_sign_counts(user_id, VOCALES)
     
-    total_samples = len(user_samples)
+    total_samples = sum(vocal_counts.values())
     can_train = total_samples >= settings.MIN_SAMPLES_FOR_TRAINING
     
     return {
@@ -133,7 +145,7 @@ async def predict_vocal(user_id: int, landmarks: List[Dict[str, float]]):
 async def get_vocales_stats(user_id: int):
     """Obtener estadísticas de vocales"""
     try:
-        stats = datos_manager.get_category_stats("vocales")
+        stats = datos_manager.get_category_stats("vocales", user_id)
         return stats
     except Exception as e:
         raise HTTPException(
@@ -151,7 +163,7 @@ async def delete_vocal_samples(user_id: int, vocal: str):
         )
     
     try:
-        success = datos_manager.delete_sign_samples("vocales", vocal)
+        success = await datos_manager.delete_sign_samples_async("vocales", vocal)
         if success:
             return {
                 "message": f"Eliminadas todas las muestras de la vocal '{vocal}'",
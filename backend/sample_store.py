@@ -0,0 +1,278 @@
+"""
+Almacenamiento binario de muestras para el Sistema Inteligente de Reconocimiento de Señas
+Cada seña es un segmento float32 de solo anexado más un pequeño log de metadatos
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from features import FEATURES_PER_SAMPLE, LANDMARKS_PER_SAMPLE, extract_landmark_batch
+
+# Cada fila contiene 21 landmarks * 3 coordenadas (x, y, z)
+FLOATS_PER_SAMPLE = FEATURES_PER_SAMPLE
+ROW_DTYPE = np.dtype("<f4")
+ROW_BYTES = FLOATS_PER_SAMPLE * ROW_DTYPE.itemsize
+
+LANDMARKS_EXT = ".f32"
+META_EXT = ".meta.jsonl"
+FEATURES_EXT = ".feat"
+
+
+def landmarks_to_row(landmarks: List[Any]) -> np.ndarray:
+    """Convertir 21 landmarks (modelos, dicts o strings "x=.. y=.. z=..") o una fila de 63 valores a float32"""
+    if isinstance(landmarks, np.ndarray):
+        rows, rejected = extract_landmark_batch([landmarks])
+        if rejected:
+            raise ValueError("Landmarks con formato o valores no válidos")
+        return rows[0]
+    if len(landmarks) != LANDMARKS_PER_SAMPLE:
+        raise ValueError(
+            f"Se requieren {LANDMARKS_PER_SAMPLE} landmarks, se recibieron {len(landmarks)}"
+        )
+    rows, rejected = extract_landmark_batch([landmarks])
+    if rejected:
+        raise ValueError("Landmarks con formato o valores no válidos")
+    return rows[0]
+
+
+def row_to_landmarks(row: np.ndarray) -> List[Dict[str, float]]:
+    """Convertir una fila float32 a la lista de landmarks {x, y, z}"""
+    return [
+        {"x": x, "y": y, "z": z}
+        for x, y, z in np.asarray(row, dtype=np.float64).reshape(-1, 3).tolist()
+    ]
+
+
+class SampleStore:
+    """Motor de almacenamiento de solo anexado por seña
+
+    Por cada seña se guardan estos archivos dentro del directorio de la categoría:
+      - ``<seña>.f32``: filas float32 contiguas de 63 valores (mapeable en memoria)
+      - ``<seña>.meta.jsonl``: una cabecera (sign, category, created_at) seguida de
+        una línea por muestra (id, user_id, timestamp, created_at)
+      - ``<seña>.<versión>.feat``: características float32 calculadas al ingresar,
+        alineadas fila a fila con el segmento de landmarks
+    """
+
+    def paths(self, category_path: str, safe_sign: str) -> Tuple[str, str]:
+        """Rutas del segmento de landmarks y del log de metadatos"""
+        base = os.path.join(category_path, safe_sign)
+        return base + LANDMARKS_EXT, base + META_EXT
+
+    def exists(self, category_path: str, safe_sign: str) -> bool:
+        """Indica si la seña tiene segmento almacenado"""
+        return os.path.exists(self.paths(category_path, safe_sign)[0])
+
+    def signs(self, category_path: str) -> List[str]:
+        """Listar las señas (nombres seguros) almacenadas en una categoría"""
+        if not os.path.isdir(category_path):
+            return []
+        return sorted(
+            filename[:-len(LANDMARKS_EXT)]
+            for filename in os.listdir(category_path)
+            if filename.endswith(LANDMARKS_EXT)
+        )
+
+    def count(self, category_path: str, safe_sign: str) -> int:
+        """Número de muestras completas del segmento, sin leer su contenido"""
+        landmarks_path, _ = self.paths(category_path, safe_sign)
+        try:
+            return os.path.getsize(landmarks_path) // ROW_BYTES
+        except OSError:
+            return 0
+
+    def append(self, category_path: str, safe_sign: str, header: Dict[str, Any],
+               rows: np.ndarray, metas: List[Dict[str, Any]], durable: bool = False) -> List[Dict[str, Any]]:
+        """Anexar filas y metadatos; devuelve los metadatos con sus ids asignados
+
+        Con ``durable`` ambos archivos se fuerzan a disco (fsync) antes de volver.
+        """
+        rows = np.ascontiguousarray(rows, dtype=ROW_DTYPE).reshape(-1, FLOATS_PER_SAMPLE)
+        if len(rows) != len(metas):
+            raise ValueError("El número de filas y de metadatos no coincide")
+
+        landmarks_path, meta_path = self.paths(category_path, safe_sign)
+        os.makedirs(category_path, exist_ok=True)
+
+        # Descartar una fila incompleta que pudo quedar tras una escritura interrumpida
+        size = os.path.getsize(landmarks_path) if os.path.exists(landmarks_path) else 0
+        existing = size // ROW_BYTES
+        if size != existing * ROW_BYTES:
+            os.truncate(landmarks_path, existing * ROW_BYTES)
+
+        saved = []
+        for offset, meta in enumerate(metas):
+            saved.append({"id": existing + offset + 1, **meta})
+
+        new_segment = not os.path.exists(meta_path)
+        with open(landmarks_path, 'ab') as f:
+            f.write(rows.tobytes())
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        with open(meta_path, 'a', encoding='utf-8') as f:
+            if new_segment:
+                f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            f.write("".join(json.dumps(meta, ensure_ascii=False) + "\n" for meta in saved))
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+        return saved
+
+    def landmarks(self, category_path: str, safe_sign: str) -> np.ndarray:
+        """Matriz (N, 63) mapeada en memoria en modo solo lectura"""
+        n = self.count(category_path, safe_sign)
+        if n == 0:
+            return np.empty((0, FLOATS_PER_SAMPLE), dtype=ROW_DTYPE)
+        landmarks_path, _ = self.paths(category_path, safe_sign)
+        return np.memmap(landmarks_path, dtype=ROW_DTYPE, mode='r',
+                         shape=(n, FLOATS_PER_SAMPLE))
+
+    def features_path(self, category_path: str, safe_sign: str, version: str) -> str:
+        """Ruta del segmento de características de una versión"""
+        return os.path.join(category_path, f"{safe_sign}.{version}{FEATURES_EXT}")
+
+    def feature_count(self, category_path: str, safe_sign: str, version: str, width: int) -> int:
+        """Número de filas completas de características"""
+        path = self.features_path(category_path, safe_sign, version)
+        try:
+            return os.path.getsize(path) // (width * ROW_DTYPE.itemsize)
+        except OSError:
+            return 0
+
+    def write_features(self, category_path: str, safe_sign: str, version: str,
+                       start: int, features: np.ndarray):
+        """Escribir características a partir de la fila ``start`` (lo que siga se descarta)"""
+        features = np.ascontiguousarray(features, dtype=ROW_DTYPE)
+        path = self.features_path(category_path, safe_sign, version)
+        row_bytes = features.shape[1] * ROW_DTYPE.itemsize
+        with open(path, 'ab') as f:
+            # Quitar filas sobrantes o incompletas antes de anexar
+            f.truncate(start * row_bytes)
+            f.write(features.tobytes())
+
+    def prune_features(self, category_path: str, version: str) -> int:
+        """Eliminar los segmentos de características de versiones distintas de ``version``"""
+        if not os.path.isdir(category_path):
+            return 0
+        keep_suffix = f".{version}{FEATURES_EXT}"
+        removed = 0
+        for filename in os.listdir(category_path):
+            if filename.endswith(FEATURES_EXT) and not filename.endswith(keep_suffix):
+                os.remove(os.path.join(category_path, filename))
+                removed += 1
+        return removed
+
+    def features(self, category_path: str, safe_sign: str, version: str, width: int) -> np.ndarray:
+        """Matriz (N, width) de características mapeada en memoria en modo solo lectura"""
+        n = self.feature_count(category_path, safe_sign, version, width)
+        if n == 0:
+            return np.empty((0, width), dtype=ROW_DTYPE)
+        return np.memmap(self.features_path(category_path, safe_sign, version),
+                         dtype=ROW_DTYPE, mode='r', shape=(n, width))
+
+    def read_header(self, category_path: str, safe_sign: str) -> Dict[str, Any]:
+        """Leer solo la cabecera del log de metadatos"""
+        _, meta_path = self.paths(category_path, safe_sign)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.loads(f.readline() or "{}")
+        except (OSError, ValueError):
+            return {}
+
+    def read_last_meta(self, category_path: str, safe_sign: str) -> Optional[Dict[str, Any]]:
+        """Leer la última línea del log sin recorrer el archivo completo"""
+        _, meta_path = self.paths(category_path, safe_sign)
+        try:
+            with open(meta_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                block = min(end, 4096)
+                f.seek(end - block)
+                lines = f.read(block).splitlines()
+        except OSError:
+            return None
+        # Con una sola línea completa solo existe la cabecera
+        if len(lines) < 2 and block == end:
+            return None
+        try:
+            return json.loads(lines[-1].decode('utf-8'))
+        except (IndexError, ValueError):
+            return None
+
+    def iter_meta(self, category_path: str, safe_sign: str) -> Iterator[Dict[str, Any]]:
+        """Recorrer los metadatos de las muestras línea a línea, sin cargar el log completo"""
+        _, meta_path = self.paths(category_path, safe_sign)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            f.readline()  # cabecera
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read_meta(self, category_path: str, safe_sign: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Leer la cabecera y los metadatos de todas las muestras"""
+        _, meta_path = self.paths(category_path, safe_sign)
+        if not os.path.exists(meta_path):
+            return {}, []
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline() or "{}")
+            metas = [json.loads(line) for line in f if line.strip()]
+        return header, metas
+
+    def delete(self, category_path: str, safe_sign: str) -> bool:
+        """Eliminar el segmento, el log y las características de una seña"""
+        deleted = False
+        for path in self.paths(category_path, safe_sign):
+            if os.path.exists(path):
+                os.remove(path)
+                deleted = True
+        prefix = safe_sign + "."
+        for filename in os.listdir(category_path):
+            if filename.startswith(prefix) and filename.endswith(FEATURES_EXT):
+                os.remove(os.path.join(category_path, filename))
+        return deleted
+
+    def migrate_json(self, category_path: str, filename: str) -> int:
+        """Migrar un archivo JSON heredado al formato binario
+
+        El archivo original se renombra a ``.json.migrated`` para no volver a procesarlo.
+        """
+        filepath = os.path.join(category_path, filename)
+        safe_sign = filename[:-len(".json")]
+
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        samples = data.get("samples", [])
+        rows, rejected = extract_landmark_batch([sample.get("landmarks", []) for sample in samples])
+        for index in rejected:
+            print(f" Muestra {samples[index].get('id')} de {filepath} descartada: landmarks inválidos")
+
+        rejected_set = set(rejected)
+        metas = [
+            {
+                "user_id": sample.get("user_id", 1),
+                "timestamp": sample.get("timestamp"),
+                "created_at": sample.get("created_at")
+            }
+            for index, sample in enumerate(samples) if index not in rejected_set
+        ]
+
+        if len(rows):
+            header = {
+                "sign": data.get("sign", safe_sign),
+                "category": data.get("category"),
+                "created_at": data.get("created_at", datetime.now().isoformat())
+            }
+            self.append(category_path, safe_sign, header, rows, metas)
+
+        os.replace(filepath, filepath + ".migrated")
+        print(f" Migrado {filepath}: {len(rows)} muestras")
+        return len(rows)
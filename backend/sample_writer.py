@@ -0,0 +1,180 @@
+"""
+Escritura agrupada de muestras para el Sistema Inteligente de Reconocimiento de Señas
+Un único escritor por categoría consume una cola y confirma juntas las capturas que llegan a la vez
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from metrics import datos_operation_duration, sample_commit_batch_size
+
+# Marcador que detiene el hilo escritor de una categoría
+_STOP = object()
+
+
+class PendingWrite(NamedTuple):
+    """Muestras encoladas por una petición, a la espera de su commit"""
+    user_id: int
+    sign: str
+    rows: np.ndarray
+    metas: List[Dict[str, Any]]
+    future: Future
+
+
+class PendingTask(NamedTuple):
+    """Operación que se ejecuta en el hilo escritor, en orden con las escrituras"""
+    run: Callable[[], Any]
+    future: Future
+
+
+class GroupCommitWriter:
+    """Escritor único por categoría con commits agrupados
+
+    Cada categoría tiene un hilo que es el único que anexa a sus segmentos, así
+    que los ids se asignan sin carreras. El hilo toma lo que haya en la cola y
+    confirma el lote con una sola llamada a ``commit`` por (usuario, seña); cada
+    petición recibe en su ``Future`` los metadatos (con id) de sus propias muestras.
+    Si el lote anterior reunió varias escrituras (hay capturas concurrentes),
+    espera además hasta ``window_seconds`` a que lleguen otras; una captura
+    aislada se confirma sin esperar. Otras operaciones sobre los segmentos
+    (como borrar una seña) pasan por la misma cola con ``run``, así que nunca
+    se cruzan con un commit en curso.
+    """
+
+    def __init__(self, commit: Callable[[str, int, str, np.ndarray, List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 window_seconds: float = settings.SAMPLE_COMMIT_WINDOW_SECONDS,
+                 max_batch: int = settings.SAMPLE_COMMIT_MAX_BATCH):
+        self.commit = commit
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._queues: Dict[str, "queue.Queue[Any]"] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, category: str, user_id: int, sign: str, rows: np.ndarray,
+               metas: List[Dict[str, Any]]) -> Future:
+        """Encolar muestras de una seña; el Future se resuelve con sus metadatos guardados"""
+        future = self._future()
+        rows = np.asarray(rows).reshape(len(metas), -1)
+        self._queue(category).put(PendingWrite(user_id, sign, rows, metas, future))
+        return future
+
+    def run(self, category: str, task: Callable[[], Any]) -> Future:
+        """Ejecutar ``task`` en el hilo escritor de la categoría tras las escrituras ya encoladas"""
+        future = self._future()
+        self._queue(category).put(PendingTask(task, future))
+        return future
+
+    @staticmethod
+    def _future() -> Future:
+        # En curso desde que se encola: cancelar la espera no impide el commit ni lo deja sin resolver
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        return future
+
+    def _queue(self, category: str) -> "queue.Queue[Any]":
+        """Cola de la categoría; el hilo escritor se arranca en el primer uso"""
+        with self._lock:
+            pending = self._queues.get(category)
+            if pending is None:
+                pending = self._queues[category] = queue.Queue()
+                thread = threading.Thread(target=self._run, args=(category, pending),
+                                          name=f"sample-writer-{category}", daemon=True)
+                self._threads[category] = thread
+                thread.start()
+            return pending
+
+    def _run(self, category: str, pending: "queue.Queue[Any]"):
+        """Bucle del escritor: reunir un lote y confirmarlo, o ejecutar una tarea"""
+        concurrent = False
+        following = None
+        while True:
+            item = following if following is not None else pending.get()
+            following = None
+            if item is _STOP:
+                return
+            if isinstance(item, PendingTask):
+                self._run_task(item)
+                concurrent = False
+                continue
+            batch, following = self._collect(item, pending, self.window_seconds if concurrent else 0.0)
+            self._commit_batch(category, batch)
+            concurrent = len(batch) > 1
+
+    def _collect(self, first: PendingWrite, pending: "queue.Queue[Any]",
+                 window_seconds: float) -> Tuple[List[PendingWrite], Any]:
+        """Reunir las escrituras en cola y las que llegan dentro de la ventana (hasta ``max_batch`` muestras)
+
+        Una tarea o la parada cierran el lote y se devuelven para procesarlas después de él.
+        """
+        batch = [first]
+        rows = len(first.metas)
+        deadline = time.monotonic() + window_seconds
+        while rows < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP or isinstance(item, PendingTask):
+                return batch, item
+            batch.append(item)
+            rows += len(item.metas)
+        return batch, None
+
+    @staticmethod
+    def _run_task(task: PendingTask):
+        try:
+            task.future.set_result(task.run())
+        except Exception as e:
+            task.future.set_exception(e)
+
+    def _commit_batch(self, category: str, batch: List[PendingWrite]):
+        """Confirmar un lote con una escritura por (usuario, seña) y resolver cada petición
+
+        Un error falla solo las peticiones afectadas; el hilo escritor sigue vivo.
+        """
+        try:
+            groups: Dict[Tuple[int, str], List[PendingWrite]] = {}
+            for item in batch:
+                groups.setdefault((item.user_id, item.sign), []).append(item)
+
+            sample_commit_batch_size.observe(sum(len(item.metas) for item in batch), category)
+            with datos_operation_duration.time(category, "commit_batch"):
+                for (user_id, sign), items in groups.items():
+                    try:
+                        rows = np.vstack([item.rows for item in items])
+                        saved = self.commit(category, user_id, sign, rows,
+                                            [meta for item in items for meta in item.metas])
+                    except Exception as e:
+                        self._fail(items, e)
+                        continue
+                    offset = 0
+                    for item in items:
+                        item.future.set_result(saved[offset:offset + len(item.metas)])
+                        offset += len(item.metas)
+        except Exception as e:
+            self._fail(batch, e)
+
+    @staticmethod
+    def _fail(items: List[PendingWrite], error: Exception):
+        for item in items:
+            if not item.future.done():
+                item.future.set_exception(error)
+
+    def close(self, timeout: Optional[float] = None):
+        """Confirmar lo que quede en las colas y detener los hilos escritores"""
+        with self._lock:
+            queues, threads = dict(self._queues), dict(self._threads)
+            self._queues.clear()
+            self._threads.clear()
+        for pending in queues.values():
+            pending.put(_STOP)
+        for thread in threads.values():
+            thread.join(timeout)
@@ -3,23 +3,44 @@ Almacenamiento en memoria para el Sistema Inteligente de Reconocimiento de Seña
 """
 
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Set, Tuple
 import json
 import os
+import threading
+
+from config import settings
+
+# Colecciones que se persisten en la instantánea y en el journal
+COLLECTIONS = ("users", "categories", "samples", "models")
 
 class MemoryStore:
-    """Almacenamiento en memoria simple"""
+    """Almacenamiento en memoria simple
+    
+    Persistencia:
+      - ``data.json``: instantánea completa, escrita de forma atómica al compactar
+      - ``data.journal``: una línea JSON por cambio (``put``/``delete``) desde la
+        última instantánea; al arrancar se aplica sobre la instantánea
+    """
     
     def __init__(self):
         self.data_file = "data.json"
+        self.journal_file = "data.journal"
         self.users: Dict[int, Any] = {}
         self.categories: Dict[int, Any] = {}
         self.samples: Dict[int, Any] = {}
         self.models: Dict[int, Any] = {}
+        self._journal_entries = 0
+        self._lock = threading.Lock()
+        
+        # Índices secundarios, mantenidos en cada put/delete
+        self._by_user: Dict[Tuple[str, int], Set[int]] = {}          # (colección, usuario) -> ids
+        self._by_user_type: Dict[int, Dict[str, int]] = {}           # usuario -> tipo de categoría -> conteo
+        self._by_user_sign: Dict[Tuple[int, str], Set[int]] = {}     # (usuario, seña) -> ids de muestras
         self.load_data()
     
     def load_data(self):
-        """Cargar datos desde archivo JSON"""
+        """Cargar la instantánea y reproducir el journal pendiente"""
+        snapshot_loaded = False
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
@@ -28,25 +49,152 @@ class MemoryStore:
                     self.categories = {int(k): v for k, v in data.get('categories', {}).items()}
                     self.samples = {int(k): v for k, v in data.get('samples', {}).items()}
                     self.models = {int(k): v for k, v in data.get('models', {}).items()}
+                    snapshot_loaded = True
             except Exception as e:
                 print(f"Error cargando datos: {e}")
-                self._initialize_default_data()
-        else:
+        
+        self._rebuild_indexes()
+        replayed = self._replay_journal()
+        if not snapshot_loaded and not replayed:
             self._initialize_default_data()
+        elif self._journal_entries >= settings.STORE_COMPACT_EVERY:
+            self.save_data()
+    
+    def _replay_journal(self) -> int:
+        """Aplicar las entradas del journal; una última línea incompleta se descarta"""
+        if not os.path.exists(self.journal_file):
+            return 0
+        
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._apply(entry["op"], entry["collection"], int(entry["id"]), entry.get("value"))
+                except (ValueError, KeyError, TypeError):
+                    print(f"Journal truncado tras {replayed} entradas, se descarta el resto")
+                    break
+                valid_bytes += len(line)
+                replayed += 1
+        
+        # Quitar la cola rota para que las escrituras siguientes queden en líneas válidas
+        if valid_bytes != os.path.getsize(self.journal_file):
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(valid_bytes)
+        
+        self._journal_entries = replayed
+        return replayed
+    
+    def _apply(self, op: str, collection: str, item_id: int, value: Any = None):
+        """Aplicar un cambio a la colección en memoria"""
+        if collection not in COLLECTIONS:
+            raise KeyError(collection)
+        if op not in ("put", "delete"):
+            raise ValueError(f"Operación '{op}' no válida")
+        items = getattr(self, collection)
+        previous = items.pop(item_id, None)
+        if previous is not None:
+            self._unindex(collection, item_id, previous)
+        if op == "put":
+            items[item_id] = value
+            self._index(collection, item_id, value)
+    
+    def _index(self, collection: str, item_id: int, record: Dict[str, Any]):
+        """Añadir un registro a los índices secundarios"""
+        user_id = record.get("user_id")
+        if user_id is None:
+            return
+        self._by_user.setdefault((collection, user_id), set()).add(item_id)
+        if collection == "categories":
+            types = self._by_user_type.setdefault(user_id, {})
+            cat_type = record.get("type", "unknown")
+            types[cat_type] = types.get(cat_type, 0) + 1
+        elif collection == "samples":
+            self._by_user_sign.setdefault((user_id, record.get("category_name")), set()).add(item_id)
+    
+    def _unindex(self, collection: str, item_id: int, record: Dict[str, Any]):
+        """Quitar un registro de los índices secundarios"""
+        user_id = record.get("user_id")
+        if user_id is None:
+            return
+        self._by_user.get((collection, user_id), set()).discard(item_id)
+        if collection == "categories":
+            types = self._by_user_type.get(user_id, {})
+            cat_type = record.get("type", "unknown")
+            types[cat_type] = types.get(cat_type, 0) - 1
+            if types[cat_type] <= 0:
+                del types[cat_type]
+        elif collection == "samples":
+            self._by_user_sign.get((user_id, record.get("category_name")), set()).discard(item_id)
+    
+    def _rebuild_indexes(self):
+        """Reconstruir los índices a partir de las colecciones completas"""
+        self._by_user.clear()
+        self._by_user_type.clear()
+        self._by_user_sign.clear()
+        for collection in COLLECTIONS:
+            for item_id, record in getattr(self, collection).items():
+                self._index(collection, item_id, record)
+    
+    def _append_journal(self, op: str, collection: str, item_id: int, value: Any = None):
+        """Aplicar un cambio y registrarlo en el journal (coste proporcional al cambio)"""
+        entry = {"op": op, "collection": collection, "id": item_id}
+        if value is not None:
+            entry["value"] = value
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        
+        with self._lock:
+            self._apply(op, collection, item_id, value)
+            try:
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"Error escribiendo journal: {e}")
+                return
+            self._journal_entries += 1
+            compact = self._journal_entries >= settings.STORE_COMPACT_EVERY
+        
+        if compact:
+            self.save_data()
+    
+    def put(self, collection: str, item_id: int, value: Dict[str, Any]):
+        """Insertar o reemplazar un registro"""
+        self._append_journal("put", collection, item_id, value)
+    
+    def delete(self, collection: str, item_id: int):
+        """Eliminar un registro"""
+        self._append_journal("delete", collection, item_id)
+    
+    def next_id(self, collection: str) -> int:
+        """Siguiente id libre de una colección"""
+        return max(getattr(self, collection), default=0) + 1
     
     def save_data(self):
-        """Guardar datos en archivo JSON"""
-        try:
-            data = {
-                'users': self.users,
-                'categories': self.categories,
-                'samples': self.samples,
-                'models': self.models
-            }
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, default=str)
-        except Exception as e:
-            print(f"Error guardando datos: {e}")
+        """Compactar: escribir una instantánea completa y vaciar el journal"""
+        with self._lock:
+            try:
+                data = {
+                    'users': self.users,
+                    'categories': self.categories,
+                    'samples': self.samples,
+                    'models': self.models
+                }
+                tmp_file = self.data_file + ".tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, default=str)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.data_file)
+                
+                # La instantánea ya contiene el journal; reproducirlo de nuevo es idempotente
+                with open(self.journal_file, 'w', encoding='utf-8'):
+                    pass
+                self._journal_entries = 0
+            except Exception as e:
+                print(f"Error guardando datos: {e}")
     
     def _initialize_default_data(self):
         """Inicializar con datos por defecto"""
@@ -77,12 +225,37 @@ class MemoryStore:
                 "created_at": self.get_current_timestamp()
             }
         
+        self._rebuild_indexes()
         self.save_data()
     
     def get_current_timestamp(self) -> str:
         """Obtener timestamp actual"""
         return datetime.now().isoformat()
     
+    def user_records(self, collection: str, user_id: int) -> List[Dict[str, Any]]:
+        """Registros de un usuario en una colección"""
+        items = getattr(self, collection)
+        return [items[item_id] for item_id in self._by_user.get((collection, user_id), ())]
+    
+    def count_user(self, collection: str, user_id: int) -> int:
+        """Número de registros de un usuario en una colección"""
+        return len(self._by_user.get((collection, user_id), ()))
+    
+    def user_category_types(self, user_id: int) -> Dict[str, int]:
+        """Categorías de un usuario agrupadas por tipo"""
+        return dict(self._by_user_type.get(user_id, {}))
+    
+    def user_sign_counts(self, user_id: int, signs: Iterable[str]) -> Dict[str, int]:
+        """Muestras de un usuario por seña"""
+        return {sign: len(self._by_user_sign.get((user_id, sign), ())) for sign in signs}
+    
+    def user_sign_samples(self, user_id: int, signs: Iterable[str]) -> List[Dict[str, Any]]:
+        """Muestras de un usuario para las señas indicadas, en orden de id"""
+        ids = set()
+        for sign in signs:
+            ids.update(self._by_user_sign.get((user_id, sign), ()))
+        return [self.samples[item_id] for item_id in sorted(ids)]
+    
     def get_stats(self) -> Dict[str, Any]:
         """Obtener estadísticas"""
         return {
@@ -0,0 +1,204 @@
+"""
+Reconocimiento continuo por WebSocket con suavizado temporal de predicciones
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+# Marcadores internos de la cola de frames
+_RESET = object()
+_CLOSED = object()
+
+
+class InvalidMessage(NamedTuple):
+    """Mensaje del cliente que no se pudo decodificar; se responde con un error sin cerrar la sesión"""
+    error: str
+
+
+class PredictionSmoother:
+    """Suavizado exponencial de probabilidades con una etiqueta estable
+
+    Cada frame mezcla sus probabilidades con las acumuladas; la etiqueta estable
+    solo cambia cuando otra clase supera ``min_confidence`` en la media suavizada.
+    """
+
+    def __init__(self, alpha: float = settings.STREAM_SMOOTHING_ALPHA,
+                 min_confidence: float = settings.STREAM_MIN_CONFIDENCE):
+        self.alpha = alpha
+        self.min_confidence = min_confidence
+        self.classes: Optional[np.ndarray] = None
+        self.smoothed: Optional[np.ndarray] = None
+        self.stable_label: Optional[str] = None
+
+    def reset(self):
+        """Olvidar el historial (mano fuera de cámara, cambio de seña, etc.)"""
+        self.smoothed = None
+        self.stable_label = None
+
+    def update(self, classes: np.ndarray, probabilities: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Incorporar un frame; devuelve (etiqueta, confianza) solo si cambia la etiqueta estable"""
+        if self.classes is None or not np.array_equal(classes, self.classes):
+            # El modelo cambió (reentrenamiento): las columnas ya no son comparables
+            self.classes = np.asarray(classes)
+            self.reset()
+
+        if self.smoothed is None:
+            self.smoothed = np.array(probabilities, dtype=np.float64)
+        else:
+            self.smoothed *= 1.0 - self.alpha
+            self.smoothed += self.alpha * probabilities
+
+        best = int(np.argmax(self.smoothed))
+        confidence = float(self.smoothed[best])
+        label = str(self.classes[best])
+        if confidence < self.min_confidence or label == self.stable_label:
+            return None
+
+        self.stable_label = label
+        return label, confidence
+
+
+async def _receive_frames(websocket: WebSocket, queue: "asyncio.Queue[Any]"):
+    """Leer mensajes del cliente y encolarlos, descartando los frames más antiguos si hay atraso
+
+    Cada mensaje es la lista de landmarks de un frame, o un objeto
+    ``{"landmarks": [...]}`` / ``{"type": "reset"}``. Un mensaje que no es
+    JSON válido, o cuyos landmarks no son una lista, se descarta y se avisa al
+    cliente; la sesión sigue abierta.
+    """
+    try:
+        while True:
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                break
+            try:
+                message = json.loads(received.get("text") or received.get("bytes") or "")
+            except (TypeError, ValueError) as e:
+                queue.put_nowait(InvalidMessage(f"Mensaje JSON no válido: {str(e)}"))
+                continue
+            if isinstance(message, dict):
+                if message.get("type") == "reset":
+                    queue.put_nowait(_RESET)
+                    continue
+                message = message.get("landmarks") or []
+            if not isinstance(message, list):
+                queue.put_nowait(InvalidMessage("Se esperaba una lista de landmarks"))
+                continue
+            queue.put_nowait(message)
+
+            # Un frame viejo ya no sirve para reconocimiento en tiempo real
+            while queue.qsize() > settings.STREAM_MAX_PENDING_FRAMES:
+                queue.get_nowait()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        queue.put_nowait(_CLOSED)
+
+
+async def stream_predictions(websocket: WebSocket, category: str, user_id: Optional[int] = None):
+    """Atender un stream de frames de una categoría
+
+    Los frames que llegan mientras se evalúa el lote anterior se procesan juntos en
+    una sola llamada al modelo. Solo se envía un mensaje cuando cambia la etiqueta estable.
+    Con ``user_id`` se usa su modelo personal si lo tiene.
+    """
+    from ml_model import model_for
+
+    await websocket.accept()
+    model = await run_in_threadpool(model_for, category, user_id)
+
+    if not await run_in_threadpool(model.ensure_loaded):
+        await websocket.send_json({
+            "type": "error",
+            "error": "No hay modelo entrenado disponible",
+            "timestamp": datetime.now().isoformat()
+        })
+        await websocket.close()
+        return
+
+    await websocket.send_json({
+        "type": "ready",
+        "category": category,
+        "personal": model.user_id is not None,
+        "classes": [model.symbol_mapping.get(cls, cls) for cls in model.classes_],
+        "timestamp": datetime.now().isoformat()
+    })
+
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    receiver = asyncio.create_task(_receive_frames(websocket, queue))
+    smoother = PredictionSmoother()
+    frame_count = 0
+
+    try:
+        closed = False
+        while not closed:
+            items = [await queue.get()]
+            while not queue.empty():
+                items.append(queue.get_nowait())
+
+            batch: List[Any] = []
+            for item in items:
+                if item is _CLOSED:
+                    closed = True
+                    break
+                if item is _RESET:
+                    frame_count = await _send_changes(websocket, model, smoother, batch, frame_count)
+                    batch = []
+                    smoother.reset()
+                elif isinstance(item, InvalidMessage):
+                    frame_count = await _send_changes(websocket, model, smoother, batch, frame_count)
+                    batch = []
+                    await websocket.send_json({
+                        "type": "error",
+                        "error": item.error,
+                        "timestamp": datetime.now().isoformat()
+                    })
+                else:
+                    batch.append(item)
+
+            if not closed:
+                frame_count = await _send_changes(websocket, model, smoother, batch, frame_count)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+
+
+async def _send_changes(websocket: WebSocket, model, smoother: PredictionSmoother,
+                        batch: List[Any], frame_count: int) -> int:
+    """Evaluar un lote, enviar los cambios de etiqueta y devolver el nuevo conteo de frames"""
+    if not batch:
+        return frame_count
+    for message in await _score_batch(model, smoother, batch, frame_count):
+        await websocket.send_json(message)
+    return frame_count + len(batch)
+
+
+async def _score_batch(model, smoother: PredictionSmoother, batch: List[Any],
+                       first_frame: int) -> List[dict]:
+    """Evaluar un lote de frames y devolver los mensajes de cambio de etiqueta"""
+    probabilities, valid_indices, active = await run_in_threadpool(model.predict_proba_batch, batch)
+    classes = active.classes
+
+    messages = []
+    for index, row in zip(valid_indices, probabilities):
+        change = smoother.update(classes, row)
+        if change:
+            label, confidence = change
+            messages.append({
+                "type": "prediction",
+                "prediction": model.symbol_mapping.get(label, label),
+                "confidence": confidence,
+                "model_version": active.version,
+                "frame": first_frame + index,
+                "timestamp": datetime.now().isoformat()
+            })
+    return messages
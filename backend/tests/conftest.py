@@ -0,0 +1,69 @@
+"""
+Configuración de pytest: los módulos del backend se importan como en la app (desde backend/)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directorio de trabajo vacío: ``datos/`` y ``models/`` se crean dentro"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_manager(workdir):
+    """Crear e iniciar instancias de DatosManager sobre ``workdir`` y cerrar sus escritores al terminar"""
+    from datos_manager import DatosManager
+
+    managers = []
+
+    def make():
+        manager = DatosManager()
+        manager.start()
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close(5)
+
+
+@pytest.fixture
+def manager(make_manager):
+    return make_manager()
+
+
+@pytest.fixture
+def client(manager, monkeypatch):
+    """Cliente HTTP de la app (sin eventos de arranque) con las rutas usando ``manager``"""
+    import importlib
+
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    modules = ["routes.category_handlers"] + [
+        f"routes.{category}.routes_{category}" for category in ("vocales", "abecedario", "numeros", "operaciones")
+    ]
+    for name in modules:
+        monkeypatch.setattr(importlib.import_module(name), "datos_manager", manager)
+    return TestClient(app)
+
+
+@pytest.fixture
+def landmark_rows():
+    """Filas (N, 63) float32 de landmarks sintéticos"""
+    def make(n: int, seed: int = 0) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        return rng.uniform(0.1, 0.9, size=(n, 63)).astype(np.float32)
+    return make
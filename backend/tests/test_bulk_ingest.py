@@ -0,0 +1,113 @@
+"""
+Ingesta masiva: rechazos de decode_bulk, agrupación por seña y el endpoint /bulk
+"""
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from sample_store import row_to_landmarks
+from wire_format import decode_bulk
+
+SIGNS = ["A", "E", "I"]
+
+
+@pytest.fixture
+def rows(landmark_rows):
+    return landmark_rows(6)
+
+
+def test_decode_bulk_groups_by_sign_in_order(rows):
+    items = [
+        {"category_name": "A", "landmarks": rows[0].tolist(), "timestamp": "t0"},
+        {"category_name": "E", "landmarks": row_to_landmarks(rows[1])},
+        {"category_name": "A", "frames": [row_to_landmarks(rows[2]), rows[3].tolist()], "timestamp": "t2"},
+        {"category_name": "A", "frames": rows[4:6].astype("<f4").tobytes(), "timestamp": 5},
+    ]
+
+    batch = decode_bulk(items, SIGNS, 10)
+
+    assert batch.rejected == []
+    a_rows, a_timestamps = batch.signs["A"]
+    np.testing.assert_allclose(a_rows, rows[[0, 2, 3, 4, 5]], atol=1e-6)
+    assert a_timestamps == ["t0", "t2", "t2", None, None]
+    np.testing.assert_allclose(batch.signs["E"][0], rows[1:2], atol=1e-6)
+    assert batch.signs["E"][1] == [None]
+
+
+def test_decode_bulk_reports_each_rejected_item_by_position(rows):
+    items = [
+        {"category_name": "A", "landmarks": rows[0].tolist()},
+        "no es un objeto",
+        {"category_name": "Z", "landmarks": rows[1].tolist()},
+        {"landmarks": rows[1].tolist()},
+        {"category_name": "E", "landmarks": [1.0] * 62},
+        {"category_name": "E", "landmarks": [0.5] * 62 + ["x"]},
+        {"category_name": "I", "frames": []},
+        {"category_name": "I", "frames": b"\x00" * 10},
+        {"category_name": "I", "frames": [rows[2].tolist(), [{"x": 0, "y": 0, "z": 0}] * 20]},
+        {"category_name": "I", "landmarks": [{"x": "a", "y": 0, "z": 0}] * 21},
+        {"category_name": "I", "frames": np.full((1, 63), np.inf, dtype="<f4").tobytes()},
+        {"category_name": "E", "landmarks": row_to_landmarks(rows[3])},
+    ]
+
+    batch = decode_bulk(items, SIGNS, 10)
+
+    assert [entry["index"] for entry in batch.rejected] == list(range(1, 11))
+    assert all(entry["error"] for entry in batch.rejected)
+    assert "no válida" in batch.rejected[1]["error"]
+    # Un elemento con un frame inválido se rechaza entero, sin arrastrar al resto
+    assert sorted(batch.signs) == ["A", "E"]
+    np.testing.assert_allclose(batch.signs["E"][0], rows[3:4], atol=1e-6)
+
+
+def test_decode_bulk_limits_the_valid_samples(rows):
+    items = [{"category_name": "A", "frames": rows[:4].tolist()}, {"category_name": "Z", "frames": rows.tolist()}]
+    assert len(decode_bulk(items, SIGNS, 4).signs["A"][0]) == 4
+
+    with pytest.raises(HTTPException) as error:
+        decode_bulk(items + [{"category_name": "E", "landmarks": rows[5].tolist()}], SIGNS, 4)
+    assert error.value.status_code == 413
+
+
+def test_bulk_route_rejects_whole_batch_unless_partial(client, rows):
+    samples = [
+        {"category_name": "3", "landmarks": rows[0].tolist()},
+        {"category_name": "3", "landmarks": [1.0] * 10},
+        {"category_name": "7", "frames": rows[1:3].tolist()},
+    ]
+
+    response = client.post("/api/v1/numeros/samples/1/bulk", json={"samples": samples})
+    assert response.status_code == 422
+    assert response.json()["detail"]["rejected"][0]["index"] == 1
+    assert client.get("/api/v1/numeros/samples/1").json() == []
+
+    response = client.post("/api/v1/numeros/samples/1/bulk?partial=true", json={"samples": samples})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["saved"] == 3
+    assert body["signs"]["7"] == {"count": 2, "first_id": 1, "last_id": 2}
+    assert [entry["index"] for entry in body["rejected"]] == [1]
+
+
+@pytest.mark.parametrize("body", [{"samples": {}}, {"otro": []}, "texto"])
+def test_bulk_route_requires_a_list_of_samples(client, body):
+    response = client.post("/api/v1/numeros/samples/1/bulk", json=body)
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("category, valid, invalid", [
+    ("vocales", "A", "B"),
+    ("abecedario", "B", "3"),
+    ("numeros", "3", "A"),
+    ("operaciones", "+", "A"),
+])
+def test_bulk_route_uses_the_signs_of_each_category(client, rows, category, valid, invalid):
+    samples = [{"category_name": valid, "landmarks": rows[0].tolist()},
+               {"category_name": invalid, "landmarks": rows[1].tolist()}]
+
+    response = client.post(f"/api/v1/{category}/samples/1/bulk?partial=true", json=samples)
+
+    assert response.status_code == 200
+    assert list(response.json()["signs"]) == [valid]
+    assert [entry["index"] for entry in response.json()["rejected"]] == [1]
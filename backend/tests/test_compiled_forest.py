@@ -0,0 +1,69 @@
+"""
+Paridad de CompiledForest con RandomForestClassifier.predict_proba
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from compiled_forest import CompiledForest, compile_forest
+
+N_FEATURES = 63
+
+
+def _dataset(seed: int, n_samples: int = 300, n_classes: int = 5):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-1.0, 1.0, size=(n_classes, N_FEATURES))
+    y = rng.integers(0, n_classes, size=n_samples)
+    X = centers[y] + rng.normal(0.0, 0.4, size=(n_samples, N_FEATURES))
+    return X.astype(np.float32), np.array([chr(ord("A") + label) for label in y])
+
+
+def _probe(seed: int, n_rows: int):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-2.0, 2.0, size=(n_rows, N_FEATURES)).astype(np.float32)
+
+
+def _assert_parity(estimator, X):
+    compiled = CompiledForest.from_estimator(estimator)
+    np.testing.assert_allclose(compiled.predict_proba(X), estimator.predict_proba(X), rtol=0.0, atol=1e-12)
+
+
+@pytest.mark.parametrize("max_depth", [1, 3, 8, None])
+@pytest.mark.parametrize("batch_size", [1, 64, 1024])
+def test_parity_by_depth_and_batch_size(max_depth, batch_size):
+    X, y = _dataset(0)
+    estimator = RandomForestClassifier(n_estimators=20, max_depth=max_depth, random_state=0).fit(X, y)
+    _assert_parity(estimator, _probe(1, batch_size))
+    # También con filas del propio entrenamiento, que caen en hojas puras
+    _assert_parity(estimator, X[:batch_size])
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 1024])
+def test_parity_warm_started_forest(batch_size):
+    """El modo incremental añade árboles con warm_start sobre muestras nuevas"""
+    X, y = _dataset(2)
+    estimator = RandomForestClassifier(n_estimators=10, warm_start=True, random_state=0).fit(X[:150], y[:150])
+    for step in range(3):
+        estimator.n_estimators += 5
+        estimator.fit(X[150 + step * 50:200 + step * 50], y[150 + step * 50:200 + step * 50])
+    assert len(estimator.estimators_) == 25
+    _assert_parity(estimator, _probe(3, batch_size))
+
+
+@pytest.mark.parametrize("batch_size", [1, 64, 1024])
+def test_parity_single_class_forest(batch_size):
+    X, _ = _dataset(4, n_samples=50)
+    estimator = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, np.full(len(X), "A"))
+    compiled = CompiledForest.from_estimator(estimator)
+    X_probe = _probe(5, batch_size)
+    assert compiled.predict_proba(X_probe).shape == (batch_size, 1)
+    _assert_parity(estimator, X_probe)
+
+
+def test_compile_forest_passes_probe_and_rejects_multi_output():
+    X, y = _dataset(6)
+    assert compile_forest(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)) is not None
+
+    multi = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, np.stack([y, y[::-1]], axis=1))
+    assert compile_forest(multi) is None
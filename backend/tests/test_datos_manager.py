@@ -0,0 +1,176 @@
+"""
+Migraciones de DatosManager al arrancar: JSON heredado, segmentos planos y particiones por usuario
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from features import CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE, canonical_features
+from sample_store import SampleStore, row_to_landmarks
+
+
+def _legacy_metas(user_ids, prefix="2025-01-01T00:00:00"):
+    return [
+        {"user_id": user_id, "timestamp": f"{prefix}.{index:06d}", "created_at": f"{prefix}.{index:06d}"}
+        for index, user_id in enumerate(user_ids)
+    ]
+
+
+def _write_flat_segment(rows, metas, category="vocales", safe_sign="a"):
+    """Segmento del formato anterior: datos/<categoría>/<seña>.f32 sin partición por usuario"""
+    header = {"sign": safe_sign.upper(), "category": category, "created_at": "2025-01-01T00:00:00"}
+    SampleStore().append(os.path.join("datos", category), safe_sign, header, rows, metas)
+
+
+def _partition_rows(manager, user_id, category="vocales", safe_sign="a"):
+    return np.asarray(manager.store.landmarks(manager._user_path(category, user_id), safe_sign))
+
+
+def test_legacy_json_is_migrated_and_partitioned(make_manager, landmark_rows):
+    rows = landmark_rows(4)
+    os.makedirs(os.path.join("datos", "vocales"), exist_ok=True)
+    samples = [
+        {"id": index + 1, "landmarks": row_to_landmarks(row), **meta}
+        for index, (row, meta) in enumerate(zip(rows, _legacy_metas([1, 2, 1, 2])))
+    ]
+    with open(os.path.join("datos", "vocales", "a.json"), "w", encoding="utf-8") as f:
+        json.dump({"sign": "A", "category": "vocales", "samples": samples}, f)
+
+    manager = make_manager()
+
+    assert os.path.exists(os.path.join("datos", "vocales", "a.json.migrated"))
+    assert not manager.store.exists(os.path.join("datos", "vocales"), "a")
+    assert manager.users("vocales") == [1, 2]
+    assert manager.get_user_sign_counts("vocales", 1) == {"A": 2}
+    np.testing.assert_allclose(_partition_rows(manager, 2), rows[[1, 3]], atol=1e-6)
+
+
+def test_flat_segment_is_split_by_user_with_features(make_manager, landmark_rows):
+    rows = landmark_rows(5)
+    _write_flat_segment(rows, _legacy_metas([3, 1, 3, 3, 1]))
+
+    manager = make_manager()
+
+    assert manager.get_user_sign_counts("vocales", 3) == {"A": 3}
+    assert manager.get_user_sign_counts("vocales", 1) == {"A": 2}
+    np.testing.assert_array_equal(_partition_rows(manager, 3), rows[[0, 2, 3]])
+    user_path = manager._user_path("vocales", 3)
+    features = manager.store.features(user_path, "a", CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE)
+    np.testing.assert_allclose(features, canonical_features(rows[[0, 2, 3]]), atol=1e-6)
+    # La migración no se repite al arrancar de nuevo
+    assert make_manager().get_user_sign_counts("vocales", 3) == {"A": 3}
+
+
+def test_reappearing_legacy_segment_keeps_newer_partition_samples(make_manager, landmark_rows):
+    rows = landmark_rows(3)
+    legacy_metas = _legacy_metas([1, 1, 1])
+    _write_flat_segment(rows, legacy_metas)
+    manager = make_manager()
+    newer = landmark_rows(2, seed=1)
+    for row in newer:
+        manager.save_sample("vocales", "A", row, user_id=1)
+    manager.writer.close(5)
+
+    # Una copia de seguridad restaura el segmento antiguo con una muestra más
+    extra = landmark_rows(1, seed=2)
+    _write_flat_segment(np.vstack([rows, extra]), legacy_metas + _legacy_metas([1], prefix="2025-02-01T00:00:00"))
+    manager = make_manager()
+
+    np.testing.assert_array_equal(_partition_rows(manager, 1), np.vstack([rows, newer, extra]))
+    assert manager.get_user_sign_counts("vocales", 1) == {"A": 6}
+    user_path = manager._user_path("vocales", 1)
+    features = manager.store.features(user_path, "a", CANONICAL_FEATURE_VERSION, CANONICAL_FEATURES_PER_SAMPLE)
+    assert len(features) == 6
+
+
+def test_interrupted_partition_is_completed_without_duplicates(make_manager, landmark_rows):
+    rows = landmark_rows(4)
+    metas = _legacy_metas([1, 1, 1, 1])
+    # Una migración anterior alcanzó a copiar las dos primeras muestras
+    user_path = os.path.join("datos", "vocales", "1")
+    SampleStore().append(user_path, "a", {"sign": "A", "user_id": 1}, rows[:2], metas[:2])
+    _write_flat_segment(rows, metas)
+
+    manager = make_manager()
+
+    np.testing.assert_array_equal(_partition_rows(manager, 1), rows)
+    assert [sample["id"] for sample in manager.get_samples("vocales", "A", user_id=1)["samples"]] == [1, 2, 3, 4]
+
+
+def test_sign_cache_is_a_bounded_lru(manager, landmark_rows):
+    manager._sign_cache_size = 2
+    rows = landmark_rows(3)
+    for user_id, row in zip((1, 2, 3), rows):
+        manager.save_sample("vocales", "A", row, user_id=user_id)
+
+    for user_id in (1, 2, 1, 3):
+        manager.get_samples("vocales", "A", user_id=user_id)
+    cached_users = [os.path.basename(user_path) for user_path, _ in manager._sign_cache]
+    assert cached_users == ["1", "3"]
+
+    # Una escritura nueva invalida la entrada aunque siga en la caché
+    manager.save_sample("vocales", "A", rows[0], user_id=3)
+    assert manager.get_samples("vocales", "A", user_id=3)["total_samples"] == 2
+
+
+def test_legacy_feature_caches_are_retired(make_manager, landmark_rows):
+    manager = make_manager()
+    manager.save_sample("vocales", "A", landmark_rows(1)[0], user_id=1)
+    manager.writer.close(5)
+    user_path = manager._user_path("vocales", 1)
+    stale = manager.store.features_path(user_path, "a", "canon-v0")
+    with open(stale, "wb") as f:
+        f.write(b"\x00" * 16)
+    os.makedirs(os.path.join("models", "cache", "vocales"))
+    with open(os.path.join("models", "cache", "vocales", "manifest.json"), "w") as f:
+        f.write("{}")
+
+    manager = make_manager()
+
+    assert not os.path.exists(os.path.join("models", "cache"))
+    assert not os.path.exists(stale)
+    assert os.path.exists(manager.store.features_path(user_path, "a", CANONICAL_FEATURE_VERSION))
+    assert manager.get_user_sign_counts("vocales", 1) == {"A": 1}
+
+
+def test_training_view_only_reads_computed_features(make_manager, landmark_rows):
+    manager = make_manager()
+    rows = landmark_rows(3)
+    manager.save_sample("vocales", "A", rows[0], user_id=1)
+    manager.writer.close(5)
+    # Filas anexadas sin características (p. ej. por una versión anterior)
+    user_path = manager._user_path("vocales", 1)
+    header = manager.store.read_header(user_path, "a")
+    manager.store.append(user_path, "a", header, rows[1:], _legacy_metas([1, 1]))
+    features_path = manager.store.features_path(user_path, "a", CANONICAL_FEATURE_VERSION)
+    size = os.path.getsize(features_path)
+
+    [(_, _, _, features)] = list(manager.iter_feature_segments("vocales"))
+
+    assert len(features) == 1
+    assert os.path.getsize(features_path) == size
+
+    manager = make_manager()
+    [(_, _, _, features)] = list(manager.iter_feature_segments("vocales", 1))
+    np.testing.assert_allclose(features, canonical_features(rows), atol=1e-5)
+
+
+def test_unstarted_manager_is_a_read_only_view(workdir, landmark_rows):
+    from datos_manager import DatosManager
+
+    rows = landmark_rows(2)
+    _write_flat_segment(rows, _legacy_metas([1, 2]))
+    os.makedirs(os.path.join("models", "cache"))
+
+    manager = DatosManager()
+
+    # Sin start(): ni migraciones ni escritor
+    assert manager.writer is None
+    assert os.path.exists(os.path.join("models", "cache"))
+    assert manager.store.signs(os.path.join("datos", "vocales")) == ["a"]
+    assert manager.users("abecedario") == []
+    with pytest.raises(RuntimeError):
+        manager.save_sample("vocales", "A", row_to_landmarks(rows[0]), user_id=1)
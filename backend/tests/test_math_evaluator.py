@@ -0,0 +1,96 @@
+"""
+Compilador RPN y evaluación de MathEvaluator: precedencia y potencias anidadas
+"""
+
+import time
+
+import pytest
+
+from math_evaluator import (
+    MAX_INTEGER_BITS, ExpressionError, ExpressionSession, MathEvaluator, compile_expression, run_program
+)
+
+
+@pytest.fixture
+def evaluator():
+    return MathEvaluator()
+
+
+@pytest.mark.parametrize("expression, program", [
+    ("1+2*3", (1, 2, 3, '*', '+')),
+    ("(1+2)*3", (1, 2, '+', 3, '*')),
+    ("8-3-2", (8, 3, '-', 2, '-')),
+    ("2^3^2", (2, 3, 2, '^', '^')),
+    ("(2^3)^2", (2, 3, '^', 2, '^')),
+    ("-2^2", (2, 2, '^', 'neg')),
+    ("2**3", (2, 3, '^')),
+])
+def test_compile_precedence_and_associativity(expression, program):
+    assert compile_expression(expression) == program
+
+
+@pytest.mark.parametrize("expression", ["1+", "(1+2", "1+2)", "2(3)", "*2", "1 2", "a+1"])
+def test_compile_rejects_malformed(expression):
+    with pytest.raises(ExpressionError):
+        compile_expression(expression)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1+2*3", 7),
+    ("(1+2)*3", 9),
+    ("8-3-2", 3),
+    ("8/4/2", 1.0),
+    ("2^3^2", 512),
+    ("(2^3)^2", 64),
+    ("-2^2", -4),
+    ("(-2)^2", 4),
+    ("2*3^2", 18),
+    ("2^-1", 0.5),
+    ("((2^2)^2)^2", 256),
+    ("9^999", 9 ** 999),
+])
+def test_evaluate_precedence_and_nested_powers(evaluator, expression, expected):
+    result = evaluator.evaluate_expression(expression)
+    assert result["valid"] is True
+    assert result["result"] == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "(9^999)^999",
+    "((9^999)^999)^3",
+    "(((9^999)^999)^999)^999",
+    "9^999*9^999*9^999*9^999",
+    "2^1001",
+])
+def test_evaluate_rejects_oversized_powers_quickly(evaluator, expression):
+    start = time.perf_counter()
+    result = evaluator.evaluate_expression(expression)
+    assert time.perf_counter() - start < 0.5
+    assert result["valid"] is False
+    assert result["result"] is None
+
+
+def test_results_within_budget_serialize():
+    result = run_program(compile_expression("7^999*7^999*7^999"))
+    assert result.bit_length() <= MAX_INTEGER_BITS
+    assert str(result)
+
+
+def test_division_by_zero(evaluator):
+    assert evaluator.evaluate_expression("1/0")["error"] == "División por cero"
+
+
+def test_session_rejects_oversized_power():
+    session = ExpressionSession()
+    for token in "(9^999)^999":
+        session.push(token)
+    state = session.push("=")
+    assert state["accepted"] is False
+    assert state["value"] is None
+    assert "bits" in state["error"]
+
+
+def test_problem_generation_rejects_negative_seed(evaluator):
+    with pytest.raises(ValueError, match="negativ"):
+        evaluator.generate_math_problems("easy", 5, seed=-1)
+    assert len(evaluator.generate_math_problems("easy", 5, seed=0, offset=1020)) == 5
@@ -0,0 +1,121 @@
+"""
+ModelRegistry: publicación de versiones, reversión, migración del modelo heredado y caché personal
+"""
+
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from config import settings
+from model_registry import ModelRegistry, model_key
+
+
+def _estimator(classes, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((12 * len(classes), 4))
+    y = np.repeat(classes, 12)
+    return RandomForestClassifier(n_estimators=3, max_depth=3, random_state=seed).fit(X, y)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(base_dir=str(tmp_path / "models"), cache_size=2)
+
+
+def test_publish_creates_consecutive_active_versions(registry):
+    first = registry.publish("vocales", _estimator(["A", "E"]), {"accuracy": 0.5})
+    second = registry.publish("vocales", _estimator(["A", "E", "I"]), {"accuracy": 0.9})
+
+    assert (first["version"], second["version"]) == (1, 2)
+    on_disk = registry.read_registry("vocales")
+    assert on_disk["active"] == 2
+    assert [v["version"] for v in on_disk["versions"]] == [1, 2]
+    assert os.path.exists(os.path.join(registry.base_dir, "vocales", "v2.pkl"))
+
+    active = registry.get("vocales")
+    assert active.version == 2
+    assert list(active.classes) == ["A", "E", "I"]
+    assert active.accuracy == 0.9
+
+
+def test_rollback_activates_previous_version_and_persists(registry):
+    registry.publish("vocales", _estimator(["A", "E"]), {"accuracy": 0.5})
+    registry.publish("vocales", _estimator(["A", "E", "I"]), {"accuracy": 0.9})
+
+    restored = registry.rollback("vocales")
+
+    assert restored.version == 1
+    assert list(restored.classes) == ["A", "E"]
+    assert registry.get("vocales").version == 1
+    # Un proceso nuevo ve la versión revertida
+    fresh = ModelRegistry(base_dir=registry.base_dir)
+    assert fresh.get("vocales").version == 1
+
+    assert registry.rollback("vocales", 2).version == 2
+
+
+def test_rollback_without_previous_version_fails(registry):
+    with pytest.raises(ValueError):
+        registry.rollback("vocales")
+    registry.publish("vocales", _estimator(["A", "E"]), {})
+    with pytest.raises(ValueError):
+        registry.rollback("vocales")
+    with pytest.raises(ValueError):
+        registry.activate("vocales", 7)
+
+
+def test_publish_prunes_old_versions(registry, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_REGISTRY_KEEP_VERSIONS", 2)
+    for seed in range(4):
+        registry.publish("vocales", _estimator(["A", "E"], seed), {})
+
+    versions = [v["version"] for v in registry.read_registry("vocales")["versions"]]
+    assert versions == [3, 4]
+    assert sorted(os.listdir(os.path.join(registry.base_dir, "vocales"))) == ["registry.json", "v3.pkl", "v4.pkl"]
+
+
+def test_legacy_model_is_migrated_as_version_one(registry):
+    os.makedirs(registry.base_dir)
+    joblib.dump(_estimator(["A", "E"]), os.path.join(registry.base_dir, "vocales_model.pkl"))
+
+    loaded = registry.get("vocales")
+
+    assert loaded.version == 1
+    assert not os.path.exists(os.path.join(registry.base_dir, "vocales_model.pkl"))
+    with open(os.path.join(registry.base_dir, "vocales", "registry.json"), encoding="utf-8") as f:
+        assert json.load(f)["versions"][0]["source"] == "legacy"
+
+
+def test_user_models_are_bounded_by_the_cache(registry):
+    for user_id in (1, 2, 3):
+        registry.publish(model_key("vocales", user_id), _estimator(["A", "E"], user_id), {})
+
+    stats = registry.cache_stats()
+    assert stats["entries"] == 2
+    assert stats["capacity"] == 2
+    # El usuario desalojado se vuelve a cargar desde disco
+    assert registry.get(model_key("vocales", 1)).version == 1
+    assert registry.get(model_key("vocales", 9)) is None
+
+
+def test_missing_global_model_is_remembered_until_published(registry, monkeypatch):
+    reads = []
+    read_registry = registry.read_registry
+    monkeypatch.setattr(registry, "read_registry", lambda category: reads.append(category) or read_registry(category))
+
+    assert registry.get("vocales") is None
+    assert registry.get("vocales") is None
+    assert reads == ["vocales"]
+
+    # Otro proceso publica: load_active (reload) lo recoge; publish en este proceso también
+    ModelRegistry(base_dir=registry.base_dir).publish("vocales", _estimator(["A", "E"]), {})
+    assert registry.get("vocales") is None
+    assert registry.load_active("vocales").version == 1
+    assert registry.get("vocales").version == 1
+
+    registry.publish("numeros", _estimator(["1", "2"]), {})
+    assert registry.get("numeros").version == 1
@@ -0,0 +1,55 @@
+"""
+Listado de muestras: forma compatible (lista) por defecto y páginas con cursor "usuario:seña:id"
+"""
+
+import pytest
+
+from datos_manager import DatosManager
+
+
+@pytest.fixture
+def saved(manager, landmark_rows):
+    """Muestras de dos usuarios en dos señas de números"""
+    rows = landmark_rows(5)
+    for user_id, sign, row in [(1, "3", rows[0]), (1, "3", rows[1]), (1, "7", rows[2]), (2, "3", rows[3]), (1, "3", rows[4])]:
+        manager.save_sample("numeros", sign, row, user_id=user_id)
+    return rows
+
+
+def test_list_without_paging_params_keeps_array_shape(client, saved):
+    response = client.get("/api/v1/numeros/samples/1")
+    assert response.status_code == 200
+    body = response.json()
+    assert isinstance(body, list)
+    assert [(sample["category_name"], sample["id"]) for sample in body] == [("3", 1), ("3", 2), ("3", 3), ("7", 1)]
+    assert all(sample["user_id"] == 1 for sample in body)
+
+
+def test_cursor_pages_cover_every_sample_once(client, saved):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get("/api/v1/numeros/samples/1", params=params).json()
+        assert page["count"] == len(page["samples"]) <= 2
+        seen.extend((sample["category_name"], sample["id"]) for sample in page["samples"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [("3", 1), ("3", 2), ("3", 3), ("7", 1)]
+
+
+def test_cursor_round_trip(manager, saved):
+    cursors = [cursor for cursor, _ in manager.iter_samples("numeros")]
+    assert cursors[0] == "1:3:1"
+    for cursor in cursors:
+        user_id, safe_sign, sample_id = DatosManager.parse_cursor(cursor)
+        assert f"{user_id}:{safe_sign}:{sample_id}" == cursor
+        # Retomar desde un cursor devuelve exactamente lo que sigue
+        following = [c for c, _ in manager.iter_samples("numeros", cursor=cursor)]
+        assert following == cursors[cursors.index(cursor) + 1:]
+
+
+@pytest.mark.parametrize("params", [{"cursor": "no-es-un-cursor"}, {"limit": 0}, {"limit": 100000}])
+def test_invalid_paging_params_are_rejected(client, saved, params):
+    assert client.get("/api/v1/numeros/samples/1", params=params).status_code == 400
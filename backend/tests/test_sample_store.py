@@ -0,0 +1,111 @@
+"""
+SampleStore: anexado con ids, conteo sin leer el contenido y recuperación de escrituras interrumpidas
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from sample_store import ROW_BYTES, SampleStore, landmarks_to_row, row_to_landmarks
+
+HEADER = {"sign": "A", "category": "vocales", "created_at": "2025-01-01T00:00:00"}
+
+
+@pytest.fixture
+def store():
+    return SampleStore()
+
+
+@pytest.fixture
+def sign_dir(tmp_path):
+    return str(tmp_path / "vocales")
+
+
+def _metas(n, start=0):
+    return [{"user_id": 1, "timestamp": f"t{start + i}", "created_at": f"c{start + i}"} for i in range(n)]
+
+
+def test_append_assigns_consecutive_ids_and_counts(store, sign_dir, landmark_rows):
+    rows = landmark_rows(5)
+    first = store.append(sign_dir, "a", HEADER, rows[:3], _metas(3))
+    second = store.append(sign_dir, "a", HEADER, rows[3:], _metas(2, 3), durable=True)
+
+    assert [meta["id"] for meta in first + second] == [1, 2, 3, 4, 5]
+    assert store.count(sign_dir, "a") == 5
+    np.testing.assert_array_equal(store.landmarks(sign_dir, "a"), rows)
+    header, metas = store.read_meta(sign_dir, "a")
+    assert header == HEADER
+    assert [meta["timestamp"] for meta in metas] == [f"t{i}" for i in range(5)]
+    assert store.read_last_meta(sign_dir, "a")["id"] == 5
+    assert store.signs(sign_dir) == ["a"]
+
+
+def test_append_rejects_mismatched_rows_and_metas(store, sign_dir, landmark_rows):
+    with pytest.raises(ValueError):
+        store.append(sign_dir, "a", HEADER, landmark_rows(2), _metas(3))
+    assert store.count(sign_dir, "a") == 0
+
+
+def test_count_ignores_a_torn_row_and_append_truncates_it(store, sign_dir, landmark_rows):
+    rows = landmark_rows(3)
+    store.append(sign_dir, "a", HEADER, rows[:2], _metas(2))
+    landmarks_path, _ = store.paths(sign_dir, "a")
+    # Escritura interrumpida: media fila al final del segmento
+    with open(landmarks_path, "ab") as f:
+        f.write(b"\x01" * (ROW_BYTES // 2))
+
+    assert store.count(sign_dir, "a") == 2
+    saved = store.append(sign_dir, "a", HEADER, rows[2:], _metas(1, 2))
+
+    assert saved[0]["id"] == 3
+    assert os.path.getsize(landmarks_path) == 3 * ROW_BYTES
+    np.testing.assert_array_equal(store.landmarks(sign_dir, "a"), rows)
+
+
+def test_write_features_truncates_a_torn_tail(store, sign_dir, landmark_rows):
+    store.append(sign_dir, "a", HEADER, landmark_rows(3), _metas(3))
+    features = np.arange(12, dtype=np.float32).reshape(3, 4)
+    store.write_features(sign_dir, "a", "v", 0, features[:2])
+    with open(store.features_path(sign_dir, "a", "v"), "ab") as f:
+        f.write(b"\x00" * 3)
+
+    assert store.feature_count(sign_dir, "a", "v", 4) == 2
+    store.write_features(sign_dir, "a", "v", 2, features[2:])
+    np.testing.assert_array_equal(store.features(sign_dir, "a", "v", 4), features)
+
+
+def test_delete_removes_segment_log_and_features(store, sign_dir, landmark_rows):
+    store.append(sign_dir, "a", HEADER, landmark_rows(1), _metas(1))
+    store.append(sign_dir, "ab", HEADER, landmark_rows(1), _metas(1))
+    store.write_features(sign_dir, "a", "v", 0, np.zeros((1, 4), dtype=np.float32))
+
+    assert store.delete(sign_dir, "a") is True
+    assert store.signs(sign_dir) == ["ab"]
+    assert sorted(os.listdir(sign_dir)) == ["ab.f32", "ab.meta.jsonl"]
+    assert store.delete(sign_dir, "a") is False
+
+
+def test_migrate_json_drops_invalid_samples(store, sign_dir, landmark_rows):
+    rows = landmark_rows(2)
+    os.makedirs(sign_dir)
+    samples = [
+        {"id": 1, "landmarks": row_to_landmarks(rows[0]), "user_id": 4, "timestamp": "t0", "created_at": "c0"},
+        {"id": 2, "landmarks": [{"x": 0, "y": 0, "z": 0}] * 3, "user_id": 4},
+        {"id": 3, "landmarks": row_to_landmarks(rows[1]), "user_id": 5, "timestamp": "t1", "created_at": "c1"},
+    ]
+    with open(os.path.join(sign_dir, "a.json"), "w", encoding="utf-8") as f:
+        json.dump({"sign": "A", "category": "vocales", "samples": samples}, f)
+
+    assert store.migrate_json(sign_dir, "a.json") == 2
+    assert os.path.exists(os.path.join(sign_dir, "a.json.migrated"))
+    np.testing.assert_allclose(store.landmarks(sign_dir, "a"), rows, atol=1e-6)
+    assert [meta["user_id"] for meta in store.read_meta(sign_dir, "a")[1]] == [4, 5]
+
+
+def test_landmarks_to_row_round_trip(landmark_rows):
+    row = landmark_rows(1)[0]
+    np.testing.assert_allclose(landmarks_to_row(row_to_landmarks(row)), row, atol=1e-6)
+    with pytest.raises(ValueError):
+        landmarks_to_row(row_to_landmarks(row)[:20])
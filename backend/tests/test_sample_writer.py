@@ -0,0 +1,119 @@
+"""
+GroupCommitWriter: agrupación, errores que no detienen el hilo y tareas en orden
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+import sample_writer
+from sample_writer import GroupCommitWriter
+
+TIMEOUT = 5
+
+
+def _meta(n: int = 1):
+    return [{"user_id": 1} for _ in range(n)]
+
+
+class Recorder:
+    """Commit falso que numera las filas por (usuario, seña) y registra cada llamada"""
+
+    def __init__(self):
+        self.calls = []
+        self.ids = {}
+        self.fail_signs = set()
+
+    def __call__(self, category, user_id, sign, rows, metas):
+        if sign in self.fail_signs:
+            raise OSError(f"fallo escribiendo {sign}")
+        self.calls.append((category, user_id, sign, len(rows)))
+        start = self.ids.get((user_id, sign), 0)
+        self.ids[(user_id, sign)] = start + len(rows)
+        return [{**meta, "id": start + index + 1} for index, meta in enumerate(metas)]
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def writer(recorder):
+    writer = GroupCommitWriter(recorder, window_seconds=0.0, max_batch=512)
+    yield writer
+    writer.close(TIMEOUT)
+
+
+def test_submit_resolves_with_ids_in_order(writer):
+    first = writer.submit("vocales", 1, "A", np.zeros((2, 63)), _meta(2))
+    second = writer.submit("vocales", 1, "A", np.zeros(63), _meta())
+    assert [m["id"] for m in first.result(TIMEOUT)] == [1, 2]
+    assert [m["id"] for m in second.result(TIMEOUT)] == [3]
+
+
+def test_failed_commit_fails_only_its_group(writer, recorder):
+    recorder.fail_signs.add("E")
+    bad = writer.submit("vocales", 1, "E", np.zeros(63), _meta())
+    good = writer.submit("vocales", 1, "A", np.zeros(63), _meta())
+    with pytest.raises(OSError):
+        bad.result(TIMEOUT)
+    assert good.result(TIMEOUT)[0]["id"] == 1
+
+
+def test_batch_errors_outside_commit_keep_thread_alive(writer, monkeypatch):
+    calls = {"n": 0}
+
+    def broken_observe(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("métrica rota")
+
+    monkeypatch.setattr(sample_writer.sample_commit_batch_size, "observe", broken_observe)
+    failed = writer.submit("vocales", 1, "A", np.zeros(63), _meta())
+    with pytest.raises(RuntimeError):
+        failed.result(TIMEOUT)
+    # El hilo escritor sigue atendiendo la categoría
+    assert writer.submit("vocales", 1, "A", np.zeros(63), _meta()).result(TIMEOUT)[0]["id"] == 1
+
+
+def test_mismatched_rows_fail_the_group_without_hanging(writer):
+    gate = threading.Event()
+    writer.run("vocales", gate.wait)
+    # Encoladas tras la tarea bloqueante: llegan al mismo lote
+    valid = writer.submit("vocales", 1, "A", np.zeros((2, 63)), _meta(2))
+    mismatched = writer.submit("vocales", 1, "A", np.zeros((1, 10)), _meta())
+    gate.set()
+    assert isinstance(mismatched.exception(TIMEOUT), ValueError)
+    assert isinstance(valid.exception(TIMEOUT), ValueError)
+    assert writer.submit("vocales", 1, "A", np.zeros(63), _meta()).result(TIMEOUT)[0]["id"] == 1
+
+
+def test_tasks_run_in_queue_order(writer, recorder):
+    gate = threading.Event()
+    order = []
+    blocker = writer.run("vocales", gate.wait)
+    write = writer.submit("vocales", 1, "A", np.zeros(63), _meta())
+    task = writer.run("vocales", lambda: order.append(len(recorder.calls)) or "hecho")
+    gate.set()
+    assert blocker.result(TIMEOUT) is True
+    write.result(TIMEOUT)
+    assert task.result(TIMEOUT) == "hecho"
+    # La tarea vio el commit que se encoló antes que ella
+    assert order == [1]
+
+
+def test_task_errors_are_reported(writer):
+    def boom():
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        writer.run("vocales", boom).result(TIMEOUT)
+    assert writer.run("vocales", lambda: 42).result(TIMEOUT) == 42
+
+
+def test_cancelled_wait_does_not_kill_writer(writer):
+    future = writer.submit("vocales", 1, "A", np.zeros(63), _meta())
+    assert future.cancel() is False
+    assert future.result(TIMEOUT)[0]["id"] == 1
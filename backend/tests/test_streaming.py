@@ -0,0 +1,80 @@
+"""
+Recepción de frames por WebSocket: mensajes inválidos y suavizado de predicciones
+"""
+
+import asyncio
+
+import numpy as np
+
+from features import extract_landmark_batch
+from streaming import _CLOSED, _RESET, InvalidMessage, PredictionSmoother, _receive_frames
+
+
+class ScriptedWebSocket:
+    """WebSocket falso que entrega una lista fija de mensajes ASGI"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    async def receive(self):
+        if not self.messages:
+            return {"type": "websocket.disconnect", "code": 1000}
+        return self.messages.pop(0)
+
+
+def _drain(messages):
+    queue = asyncio.Queue()
+    asyncio.run(_receive_frames(ScriptedWebSocket(messages), queue))
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_malformed_json_is_reported_and_the_session_continues():
+    frame = [0.5] * 63
+    items = _drain([
+        {"type": "websocket.receive", "text": "[0.5"},
+        {"type": "websocket.receive", "text": '{"landmarks": ' + str(frame) + "}"},
+        {"type": "websocket.receive", "bytes": b"\xff\xfe"},
+        {"type": "websocket.receive", "text": '{"type": "reset"}'},
+        {"type": "websocket.receive", "bytes": str(frame).encode()},
+    ])
+    assert isinstance(items[0], InvalidMessage)
+    assert items[1] == frame
+    assert isinstance(items[2], InvalidMessage)
+    assert items[3] is _RESET
+    assert items[4] == frame
+    assert items[5] is _CLOSED
+
+
+def test_messages_that_are_not_a_list_of_landmarks_are_reported():
+    frame = [0.5] * 63
+    items = _drain([
+        {"type": "websocket.receive", "text": "5"},
+        {"type": "websocket.receive", "text": "true"},
+        {"type": "websocket.receive", "text": "3.2"},
+        {"type": "websocket.receive", "text": '{"landmarks": 5}'},
+        {"type": "websocket.receive", "text": '{"landmarks": "abc"}'},
+        {"type": "websocket.receive", "text": str(frame)},
+    ])
+    assert all(isinstance(item, InvalidMessage) for item in items[:5])
+    assert items[5] == frame
+    assert items[6] is _CLOSED
+
+
+def test_extract_landmark_batch_rejects_scalars_instead_of_raising():
+    frame = [{"x": 0.5, "y": 0.5, "z": 0.0}] * 21
+    X, rejected = extract_landmark_batch([5, True, 3.2, frame, "a" * 21])
+    assert rejected == [0, 1, 2, 4]
+    assert X.shape == (1, 63)
+
+
+def test_smoother_changes_label_only_above_confidence():
+    smoother = PredictionSmoother(alpha=0.5, min_confidence=0.6)
+    classes = np.array(["A", "B"])
+    assert smoother.update(classes, np.array([0.9, 0.1])) == ("A", 0.9)
+    assert smoother.update(classes, np.array([0.9, 0.1])) is None
+    assert smoother.update(classes, np.array([0.0, 1.0])) is None
+    label, _ = smoother.update(classes, np.array([0.0, 1.0]))
+    assert label == "B"
@@ -0,0 +1,71 @@
+"""
+Cola de trabajos de entrenamiento: deduplicación por modelo y tipo de trabajo
+"""
+
+from concurrent.futures import Future
+
+import pytest
+
+from training_jobs import JobConflict, TrainingJobManager
+
+
+class PendingExecutor:
+    """Pool falso: los trabajos quedan pendientes hasta que el test los resuelve"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    manager = TrainingJobManager(max_workers=1)
+    executor = PendingExecutor()
+    monkeypatch.setattr(manager, "_ensure_pool", lambda: setattr(manager, "_executor", executor))
+    manager.executor = executor
+    return manager
+
+
+def test_pending_training_is_reused_for_the_same_model(jobs):
+    first = jobs.submit("numeros", 1, "full")
+    again = jobs.submit("numeros", 2, "incremental")
+    personal = jobs.submit("numeros", 1, "full", personal=True)
+
+    assert again["job_id"] == first["job_id"]
+    assert personal["job_id"] != first["job_id"]
+    assert len(jobs.executor.futures) == 2
+
+
+def test_tuning_conflicts_with_a_pending_training(jobs):
+    training = jobs.submit("numeros", 1, "full")
+
+    with pytest.raises(JobConflict) as error:
+        jobs.submit("numeros", 1, "tune", {})
+    assert error.value.job["job_id"] == training["job_id"]
+
+    tuning = jobs.submit("abecedario", 1, "tune", {})
+    assert jobs.submit("abecedario", 3, "tune", {})["job_id"] == tuning["job_id"]
+    with pytest.raises(JobConflict):
+        jobs.submit("abecedario", 1, "full")
+
+
+def test_finished_job_no_longer_blocks_the_model(jobs):
+    training = jobs.submit("numeros", 1, "full")
+    jobs._finalize(training["job_id"], "failed", result=None, error="x")
+
+    tuning = jobs.submit("numeros", 1, "tune", {})
+    assert tuning["mode"] == "tune"
+
+
+def test_tune_route_answers_409_during_training(client, jobs, monkeypatch):
+    import routes.routes_generales as routes_generales
+
+    monkeypatch.setattr(routes_generales, "training_jobs", jobs)
+    jobs.submit("numeros", 1, "full")
+
+    response = client.post("/api/v1/models/numeros/tune/1", json={})
+    assert response.status_code == 409
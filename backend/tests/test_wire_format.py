@@ -0,0 +1,57 @@
+"""
+Decodificación de frames en los formatos compactos y sus rechazos
+"""
+
+import base64
+
+import numpy as np
+import pytest
+
+from sample_store import row_to_landmarks
+from wire_format import _decode_frame_or_empty, decode_frame
+
+
+@pytest.fixture
+def row(landmark_rows):
+    return landmark_rows(1)[0]
+
+
+def test_decode_frame_accepts_every_encoding(row):
+    packed = row.astype("<f4").tobytes()
+    for value in (row_to_landmarks(row), row.tolist(), packed, base64.b64encode(packed).decode()):
+        np.testing.assert_allclose(decode_frame(value), row, atol=1e-6)
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    [],
+    [1.0] * 62,
+    [1, {}] + [0.0] * 61,
+    [1.0] * 62 + ["x"],
+    [1.0] * 62 + [None],
+    [1.0] * 62 + [[1.0]],
+    [1.0] * 62 + [float("nan")],
+    [{"x": "a", "y": 0, "z": 0}] * 21,
+    [{"x": 0, "y": 0, "z": 0}] * 20,
+    "no es base64!",
+    base64.b64encode(b"\x00" * 10).decode(),
+    b"\x00" * 253,
+    np.full(63, np.inf, dtype="<f4").tobytes(),
+])
+def test_decode_frame_rejects_malformed_values_with_value_error(value):
+    with pytest.raises(ValueError):
+        decode_frame(value)
+
+
+def test_batch_frames_isolate_a_malformed_frame(row):
+    frames = [row.tolist(), [1, {}] + [0.0] * 61, row_to_landmarks(row)]
+    decoded = [_decode_frame_or_empty(frame) for frame in frames]
+    np.testing.assert_allclose(decoded[0], row, atol=1e-6)
+    assert decoded[1] == []
+    assert decoded[2] == frames[2]
+
+
+@pytest.mark.parametrize("landmarks", [[1, {}] + [0.0] * 61, [0.5] * 62 + ["x"]])
+def test_sample_route_answers_422_for_non_numeric_flat_values(client, landmarks):
+    response = client.post("/api/v1/numeros/samples/1", json={"category_name": "3", "landmarks": landmarks})
+    assert response.status_code == 422
@@ -0,0 +1,228 @@
+"""
+Trabajos de entrenamiento en segundo plano para el Sistema Inteligente de Reconocimiento de Señas
+El ajuste de los modelos corre en un pool de procesos para no bloquear el event loop
+"""
+
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import settings
+from metrics import ml_operation_duration
+
+# Estados terminales de un trabajo
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class JobConflict(Exception):
+    """El modelo ya tiene un trabajo pendiente de otro tipo (entrenamiento o búsqueda)"""
+
+    def __init__(self, job: Dict[str, Any]):
+        super().__init__(f"El modelo ya tiene un trabajo '{job['mode']}' pendiente ({job['job_id']})")
+        self.job = job
+
+
+def _job_kind(mode: str) -> str:
+    """Tipo de trabajo: la búsqueda de hiperparámetros no sustituye a un entrenamiento ni al revés"""
+    return "tune" if mode == "tune" else "train"
+
+
+def _run_training(job_id: str, category: str, mode: str, progress_queue,
+                  user_id: Optional[int] = None) -> Dict[str, Any]:
+    """Entrenar un modelo (personal si se indica ``user_id``) dentro del proceso trabajador y reportar cada fase"""
+    from ml_model import SignRecognitionModel
+
+    def report(phase: str, fraction: float):
+        progress_queue.put((job_id, phase, fraction))
+
+    model = SignRecognitionModel(category, user_id)
+    return model.train(progress=report, mode=mode)
+
+
+def _run_tuning(job_id: str, category: str, options: Dict[str, Any], progress_queue) -> Dict[str, Any]:
+    """Buscar hiperparámetros dentro del proceso trabajador y reportar cada fase"""
+    from ml_model import SignRecognitionModel
+
+    def report(phase: str, fraction: float):
+        progress_queue.put((job_id, phase, fraction))
+
+    model = SignRecognitionModel(category)
+    return model.tune(progress=report, **options)
+
+
+def _warm_up():
+    """Importar las dependencias de entrenamiento en el proceso trabajador"""
+    import ml_model  # noqa: F401
+
+
+class TrainingJobManager:
+    """Cola de trabajos de entrenamiento con seguimiento de fase y progreso"""
+
+    def __init__(self, max_workers: int = settings.TRAINING_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._progress_queue = None
+        self._listener: Optional[threading.Thread] = None
+
+    def _ensure_pool(self):
+        """Crear el pool y la cola de progreso en el primer uso"""
+        if self._executor is not None:
+            return
+        # "spawn" evita heredar los hilos del servidor en los procesos hijos
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._progress_queue = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        self._listener = threading.Thread(target=self._listen_progress, daemon=True)
+        self._listener.start()
+
+    def start(self):
+        """Arrancar el pool y sus procesos por adelantado, fuera del camino de las peticiones"""
+        with self._lock:
+            self._ensure_pool()
+            for _ in range(self.max_workers):
+                self._executor.submit(_warm_up)
+
+    def _listen_progress(self):
+        """Aplicar los mensajes de progreso que envían los procesos trabajadores"""
+        while True:
+            try:
+                message = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            job_id, phase, fraction = message
+            self._update(job_id, status="running", phase=phase, progress=fraction)
+
+    def _update(self, job_id: str, **fields):
+        """Actualizar un trabajo y su versión (usada por el stream de eventos)"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return
+            job.update(fields)
+            job["version"] += 1
+            job["updated_at"] = datetime.now().isoformat()
+
+    def submit(self, category: str, user_id: int, mode: str = "full",
+               options: Optional[Dict[str, Any]] = None, personal: bool = False) -> Dict[str, Any]:
+        """Encolar el entrenamiento de una categoría y devolver el trabajo
+
+        Si el mismo modelo ya tiene un trabajo pendiente del mismo tipo se
+        devuelve ese mismo; si es de otro tipo (un entrenamiento frente a una
+        búsqueda) se lanza ``JobConflict``. ``mode="tune"`` encola una búsqueda de hiperparámetros con ``options``
+        (argumentos de ``SignRecognitionModel.tune``). Con ``personal`` se
+        entrena el modelo propio del usuario en lugar del global.
+        """
+        with self._lock:
+            for job in self.jobs.values():
+                same_model = (job["category"] == category and job["personal"] == personal
+                              and (not personal or job["user_id"] == user_id))
+                if same_model and job["status"] not in FINISHED_STATUSES:
+                    if _job_kind(job["mode"]) != _job_kind(mode):
+                        raise JobConflict(dict(job))
+                    return dict(job)
+
+            self._ensure_pool()
+            now = datetime.now().isoformat()
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "category": category,
+                "user_id": user_id,
+                "mode": mode,
+                "options": options,
+                "personal": personal,
+                "status": "queued",
+                "phase": "queued",
+                "progress": 0.0,
+                "result": None,
+                "error": None,
+                "version": 0,
+                "created_at": now,
+                "updated_at": now
+            }
+            self.jobs[job_id] = job
+            self._prune()
+
+            if mode == "tune":
+                future = self._executor.submit(_run_tuning, job_id, category, options or {}, self._progress_queue)
+            else:
+                future = self._executor.submit(_run_training, job_id, category, mode, self._progress_queue,
+                                               user_id if personal else None)
+            model_user = user_id if personal else None
+            future.add_done_callback(lambda f: self._finish(job_id, category, f, model_user))
+            return dict(job)
+
+    def _finish(self, job_id: str, category: str, future: Future, user_id: Optional[int] = None):
+        """Registrar el resultado y publicar el nuevo modelo (global o personal) en este proceso"""
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f" Error en trabajo de entrenamiento {job_id}: {e}")
+            self._finalize(job_id, "failed", result=None, error=str(e))
+            return
+
+        # Las duraciones medidas en el proceso trabajador se publican en las métricas de este proceso
+        for operation, seconds in (result.get("timings") or {}).items():
+            ml_operation_duration.observe(seconds, category, operation)
+
+        if result.get("success"):
+            try:
+                from ml_model import SignRecognitionModel, models
+                model = models[category] if user_id is None else SignRecognitionModel(category, user_id)
+                model.reload()
+            except Exception as e:
+                self._finalize(job_id, "failed", result=result, error=f"Error cargando modelo: {e}")
+                return
+            self._finalize(job_id, "completed", result=result, error=None)
+        else:
+            self._finalize(job_id, "failed", result=result, error=result.get("message"))
+
+    def _finalize(self, job_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]):
+        """Marcar un trabajo como terminado"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job.update(status=status, phase=status, progress=1.0, result=result, error=error)
+            job["version"] += 1
+            job["updated_at"] = datetime.now().isoformat()
+
+    def _prune(self):
+        """Conservar solo los trabajos terminados más recientes (se llama con el lock tomado)"""
+        finished = [job for job in self.jobs.values() if job["status"] in FINISHED_STATUSES]
+        excess = len(finished) - settings.TRAINING_JOBS_HISTORY
+        if excess > 0:
+            finished.sort(key=lambda job: job["updated_at"])
+            for job in finished[:excess]:
+                del self.jobs[job["job_id"]]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Copia del estado actual de un trabajo"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def shutdown(self):
+        """Detener el pool de procesos y el hilo de progreso"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            self._progress_queue.put(None)
+            self._manager.shutdown()
+        except (EOFError, OSError):
+            pass
+        self._executor = None
+
+
+# Instancia global
+training_jobs = TrainingJobManager()
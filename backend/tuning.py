@@ -0,0 +1,214 @@
+"""
+Búsqueda de hiperparámetros de los bosques del Sistema Inteligente de Reconocimiento de Señas
+
+Validación cruzada en paralelo sobre un pool de procesos con un presupuesto de
+tiempo. Las matrices de cada fold se calculan una sola vez y se comparten con
+los procesos como archivos ``.npy`` mapeados en memoria; cada candidato
+informa su precisión y la latencia medida de inferencia de un solo frame.
+"""
+
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+
+from compiled_forest import compile_forest
+from config import settings
+
+# Espacio de búsqueda por defecto
+PARAM_GRID: Dict[str, List[Any]] = {
+    "n_estimators": [10, 25, 50, 100],
+    "max_depth": [5, 10, 20, None],
+    "min_samples_leaf": [1, 2],
+    "max_features": ["sqrt", 0.5]
+}
+
+# Profundidad con la que se estima el coste de los árboles sin límite
+UNBOUNDED_DEPTH_COST = 32
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Combinaciones del espacio de búsqueda, de la más barata a la más cara
+
+    Con un presupuesto corto se evalúan primero los modelos rápidos, que son
+    los candidatos a ganar cuando basta con alcanzar una precisión objetivo.
+    """
+    names = sorted(grid)
+    candidates = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    def cost(params):
+        depth = params.get("max_depth") or UNBOUNDED_DEPTH_COST
+        return params.get("n_estimators", 100) * depth
+
+    return sorted(candidates, key=cost)
+
+
+def prepare_folds(X: np.ndarray, y: np.ndarray, n_folds: int, workdir: str) -> int:
+    """Escribir las matrices de entrenamiento y prueba de cada fold; devuelve el número de folds"""
+    _, counts = np.unique(y, return_counts=True)
+    n_folds = min(n_folds, int(counts.min()))
+    if n_folds < 2:
+        raise ValueError("Se necesitan al menos 2 muestras por seña para la validación cruzada")
+
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for fold, (train_index, test_index) in enumerate(splitter.split(X, y)):
+        np.save(os.path.join(workdir, f"fold{fold}-X_train.npy"), X[train_index])
+        np.save(os.path.join(workdir, f"fold{fold}-y_train.npy"), y[train_index])
+        np.save(os.path.join(workdir, f"fold{fold}-X_test.npy"), X[test_index])
+        np.save(os.path.join(workdir, f"fold{fold}-y_test.npy"), y[test_index])
+    return n_folds
+
+
+def _load_fold(workdir: str, fold: int, part: str):
+    return (
+        np.load(os.path.join(workdir, f"fold{fold}-X_{part}.npy"), mmap_mode='r'),
+        np.load(os.path.join(workdir, f"fold{fold}-y_{part}.npy"))
+    )
+
+
+def measure_latency(estimator: RandomForestClassifier, frames: np.ndarray) -> Dict[str, Any]:
+    """Latencia de predecir un frame a la vez por el mismo camino que usa el servidor"""
+    compiled = compile_forest(estimator)
+    predict = compiled.predict_proba if compiled is not None else estimator.predict_proba
+    timings = []
+    for row in frames:
+        row = row.reshape(1, -1)
+        start = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - start)
+    ms = np.asarray(timings) * 1000.0
+    return {
+        "latency_p50_ms": float(np.percentile(ms, 50)),
+        "latency_p95_ms": float(np.percentile(ms, 95)),
+        "compiled": compiled is not None,
+        "nodes": int(sum(tree.tree_.node_count for tree in estimator.estimators_))
+    }
+
+
+def evaluate_candidate(workdir: str, n_folds: int, params: Dict[str, Any],
+                       deadline: float, latency_frames: int) -> Dict[str, Any]:
+    """Validar un candidato en todos los folds (corre en un proceso del pool)
+
+    Se abandona entre folds si se agotó el presupuesto; la latencia se mide con
+    el modelo del primer fold sobre sus muestras de prueba.
+    """
+    scores = []
+    latency = None
+    fit_seconds = 0.0
+    for fold in range(n_folds):
+        if time.time() > deadline:
+            return {"params": params, "status": "timeout", "folds_completed": fold}
+        X_train, y_train = _load_fold(workdir, fold, "train")
+        X_test, y_test = _load_fold(workdir, fold, "test")
+
+        model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds += time.perf_counter() - start
+        scores.append(float(accuracy_score(y_test, model.predict(X_test))))
+
+        if latency is None:
+            frames = np.asarray(X_test[:latency_frames], dtype=np.float32)
+            latency = measure_latency(model, frames)
+
+    return {
+        "params": params,
+        "status": "completed",
+        "folds_completed": n_folds,
+        "accuracy": float(np.mean(scores)),
+        "accuracy_std": float(np.std(scores)),
+        "fit_seconds": fit_seconds / n_folds,
+        **latency
+    }
+
+
+def select_best(candidates: List[Dict[str, Any]], accuracy_target: Optional[float]) -> Optional[Dict[str, Any]]:
+    """El candidato más rápido que alcanza el objetivo o, si ninguno lo alcanza, el más preciso"""
+    completed = [c for c in candidates if c["status"] == "completed"]
+    if not completed:
+        return None
+    if accuracy_target is not None:
+        meeting = [c for c in completed if c["accuracy"] >= accuracy_target]
+        if meeting:
+            return min(meeting, key=lambda c: (c["latency_p50_ms"], -c["accuracy"]))
+    return max(completed, key=lambda c: (c["accuracy"], -c["latency_p50_ms"]))
+
+
+def search(X: np.ndarray, y: np.ndarray, budget_seconds: float,
+           accuracy_target: Optional[float] = None, n_folds: int = settings.TUNING_FOLDS,
+           grid: Optional[Dict[str, List[Any]]] = None,
+           progress: Optional[Callable[[str, float], None]] = None) -> Dict[str, Any]:
+    """Validación cruzada de todo el espacio de búsqueda dentro de ``budget_seconds``
+
+    Los candidatos que no terminan antes del límite se informan con estado
+    "timeout" o "skipped".
+    """
+    report = progress or (lambda phase, fraction: None)
+    started = time.time()
+    deadline = started + budget_seconds
+    candidates = expand_grid(grid or PARAM_GRID)
+
+    workdir = tempfile.mkdtemp(prefix="tuning-")
+    executor = None
+    results = []
+    try:
+        report("preparing_folds", 0.05)
+        n_folds = prepare_folds(X, y, n_folds, workdir)
+
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=settings.TUNING_MAX_WORKERS, mp_context=context)
+        pending = {
+            executor.submit(evaluate_candidate, workdir, n_folds, params, deadline,
+                            settings.TUNING_LATENCY_FRAMES): params
+            for params in candidates
+        }
+
+        report("searching", 0.1)
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                params = pending.pop(future)
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"params": params, "status": "failed", "error": str(e)})
+            report("searching", 0.1 + 0.8 * len(results) / len(candidates))
+
+        # Los que siguen en curso abandonan en su siguiente fold al ver el límite
+        for future, params in pending.items():
+            future.cancel()
+            results.append({"params": params, "status": "skipped", "folds_completed": 0})
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    best = select_best(results, accuracy_target)
+    completed = sorted(
+        (c for c in results if c["status"] == "completed"),
+        key=lambda c: (-c["accuracy"], c["latency_p50_ms"])
+    )
+    return {
+        "best": best,
+        "target_met": bool(best and accuracy_target is not None and best["accuracy"] >= accuracy_target),
+        "accuracy_target": accuracy_target,
+        "folds": n_folds,
+        "samples": len(X),
+        "evaluated": len(completed),
+        "total_candidates": len(candidates),
+        "elapsed_seconds": time.time() - started,
+        "budget_seconds": budget_seconds,
+        "candidates": completed + [c for c in results if c["status"] != "completed"]
+    }
@@ -0,0 +1,373 @@
+"""
+Formato compacto de landmarks para las rutas de muestras y predicción
+
+Además de la lista de 21 objetos {x, y, z}, cada frame se puede enviar como
+63 valores planos (x0, y0, z0, x1, ...) o como 252 bytes float32 little-endian
+(en base64 dentro de JSON, o binarios en un cuerpo msgpack). Las respuestas
+pueden recortarse: solo las clases más probables y sin devolver los landmarks.
+Las ingestas masivas admiten además NDJSON y archivos subidos por formulario.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+from features import FEATURES_PER_SAMPLE, LANDMARKS_PER_SAMPLE, extract_landmark_batch
+from sample_store import row_to_landmarks
+
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional: sin ella solo se admite JSON
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: json de la biblioteca estándar
+    orjson = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+WIRE_DTYPE = np.dtype("<f4")
+FRAME_BYTES = FEATURES_PER_SAMPLE * WIRE_DTYPE.itemsize
+
+
+class DecodedSample(NamedTuple):
+    """Cuerpo de una petición de muestra ya decodificado"""
+    category_name: str
+    timestamp: Optional[str]
+    row: np.ndarray
+    landmarks: List[Dict[str, float]]
+
+
+class BulkSamples(NamedTuple):
+    """Lote de muestras validado y agrupado por seña"""
+    signs: Dict[str, Tuple[np.ndarray, List[Optional[str]]]]  # seña -> (filas (N, 63), timestamps)
+    rejected: List[Dict[str, Any]]
+
+
+def _media_type(content_type: str) -> str:
+    return content_type.split(";")[0].strip().lower()
+
+
+def _is_msgpack(content_type: str) -> bool:
+    return _media_type(content_type) in MSGPACK_MEDIA_TYPES
+
+
+def wants_msgpack(request: Request) -> bool:
+    """El cliente pide la respuesta en msgpack (y el servidor lo tiene instalado)"""
+    accept = request.headers.get("accept", "").lower()
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def _loads(body: Union[bytes, str]) -> Any:
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+async def read_body(request: Request) -> Any:
+    """Decodificar el cuerpo como msgpack o JSON según su Content-Type"""
+    return _decode_body(await request.body(), request.headers.get("content-type", ""))
+
+
+def _decode_body(body: bytes, content_type: str) -> Any:
+    if _is_msgpack(content_type):
+        if msgpack is None:
+            raise HTTPException(
+                status_code=415,
+                detail="El servidor no tiene msgpack instalado; envía el cuerpo en JSON"
+            )
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Cuerpo msgpack no válido: {str(e)}")
+    try:
+        return _loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Cuerpo JSON no válido: {str(e)}")
+
+
+def respond(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """Serializar la respuesta en msgpack si el cliente lo acepta, si no en JSON"""
+    if wants_msgpack(request):
+        return Response(msgpack.packb(payload, use_bin_type=True),
+                        status_code=status_code, media_type=MSGPACK_MEDIA_TYPES[0])
+    if orjson is not None:
+        return Response(orjson.dumps(payload), status_code=status_code, media_type="application/json")
+    return JSONResponse(payload, status_code=status_code)
+
+
+def _unpack_bytes(data: Union[bytes, bytearray, str]) -> np.ndarray:
+    """Frames float32 empaquetados (binarios o en base64) a una matriz (N, 63)"""
+    if isinstance(data, str):
+        try:
+            data = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Landmarks en base64 no válidos")
+    if not data or len(data) % FRAME_BYTES:
+        raise ValueError(f"Se esperaban múltiplos de {FRAME_BYTES} bytes float32, se recibieron {len(data)}")
+    return np.frombuffer(data, dtype=WIRE_DTYPE).reshape(-1, FEATURES_PER_SAMPLE)
+
+
+def _is_flat(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and isinstance(value[0], (int, float))
+
+
+def _flat_rows(value: List[Any]) -> np.ndarray:
+    """Valores planos a una matriz (N, 63); cualquier elemento no numérico es un ValueError"""
+    try:
+        return np.asarray(value, dtype=np.float32).reshape(-1, FEATURES_PER_SAMPLE)
+    except (ValueError, TypeError):
+        raise ValueError("Los valores planos deben ser todos numéricos")
+
+
+def decode_frame(value: Any) -> np.ndarray:
+    """Un frame en cualquier formato admitido a una fila float32 de 63 valores"""
+    if isinstance(value, (bytes, bytearray, str)):
+        rows = _unpack_bytes(value)
+    elif _is_flat(value):
+        if len(value) != FEATURES_PER_SAMPLE:
+            raise ValueError(f"Se requieren {FEATURES_PER_SAMPLE} valores, se recibieron {len(value)}")
+        rows = _flat_rows(value)
+    elif isinstance(value, list) and len(value) == LANDMARKS_PER_SAMPLE:
+        rows, rejected = extract_landmark_batch([value])
+        if rejected:
+            raise ValueError("Landmarks con formato o valores no válidos")
+    else:
+        raise ValueError(f"Se requieren {LANDMARKS_PER_SAMPLE} landmarks o {FEATURES_PER_SAMPLE} valores")
+    if len(rows) != 1 or not np.isfinite(rows).all():
+        raise ValueError("Se esperaba un solo frame con valores finitos")
+    return rows[0]
+
+
+def _decode_frame_or_empty(value: Any) -> Any:
+    """Frames de un lote: los inválidos quedan vacíos para que el modelo los marque como rechazados"""
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return value
+    try:
+        return decode_frame(value)
+    except ValueError:
+        return []
+
+
+def _packed_frames(value: Any) -> Optional[np.ndarray]:
+    """Frames empaquetados (bytes, base64 o 63·N valores planos) a una matriz (N, 63); None si es una lista de frames"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return _unpack_bytes(value)
+    if _is_flat(value):
+        if len(value) % FEATURES_PER_SAMPLE:
+            raise ValueError(f"El número de valores debe ser múltiplo de {FEATURES_PER_SAMPLE}")
+        return _flat_rows(value)
+    return None
+
+
+async def read_sample(request: Request) -> DecodedSample:
+    """Leer el cuerpo de una muestra: {category_name, landmarks, timestamp?}"""
+    body = await read_body(request)
+    if not isinstance(body, dict) or not isinstance(body.get("category_name"), str):
+        raise HTTPException(status_code=422, detail="Se requieren 'category_name' y 'landmarks'")
+    landmarks = body.get("landmarks")
+    try:
+        row = decode_frame(landmarks)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # La lista original se devuelve tal cual; los formatos compactos se expanden
+    echo = landmarks if isinstance(landmarks, list) and not _is_flat(landmarks) else row_to_landmarks(row)
+    timestamp = body.get("timestamp")
+    return DecodedSample(body["category_name"], timestamp if isinstance(timestamp, str) else None, row, echo)
+
+
+async def read_frame(request: Request) -> np.ndarray:
+    """Leer el cuerpo de una predicción: el frame solo o {"landmarks": frame}"""
+    body = await read_body(request)
+    if isinstance(body, dict):
+        body = body.get("landmarks")
+    try:
+        return decode_frame(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def read_frames(request: Request) -> Union[np.ndarray, List[Any]]:
+    """Leer el cuerpo de un lote: lista de frames, frames empaquetados o {"frames": ...}
+
+    Los frames empaquetados (bytes, base64 o 63·N valores planos) llegan como
+    una sola matriz; en una lista, cada frame puede usar cualquier formato.
+    """
+    body = await read_body(request)
+    if isinstance(body, dict):
+        body = body.get("frames")
+    try:
+        packed = _packed_frames(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if packed is not None:
+        return packed
+    if not isinstance(body, list):
+        raise HTTPException(status_code=422, detail="Se esperaba una lista de frames")
+    return [_decode_frame_or_empty(frame) for frame in body]
+
+
+def _parse_document(content: bytes, content_type: str, filename: str = "") -> Any:
+    """Decodificar un cuerpo o archivo de ingesta: NDJSON, msgpack o JSON"""
+    filename = filename.lower()
+    if _media_type(content_type) in NDJSON_MEDIA_TYPES or filename.endswith((".ndjson", ".jsonl")):
+        try:
+            return [_loads(line) for line in content.splitlines() if line.strip()]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"NDJSON no válido: {str(e)}")
+    if filename.endswith((".msgpack", ".mpk")):
+        content_type = MSGPACK_MEDIA_TYPES[0]
+    return _decode_body(content, content_type)
+
+
+async def read_bulk(request: Request) -> List[Any]:
+    """Leer los elementos de una ingesta masiva
+
+    El cuerpo puede ser JSON o msgpack ({"samples": [...]} o la lista sola),
+    NDJSON con un elemento por línea, o un formulario multipart con el archivo
+    de la sesión en el campo ``file`` (su tipo se deduce del Content-Type o la extensión).
+    """
+    content_type = request.headers.get("content-type", "")
+    if _media_type(content_type) == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="Se requiere el archivo de muestras en el campo 'file'")
+        document = _parse_document(await upload.read(), upload.content_type or "", upload.filename or "")
+    else:
+        document = _parse_document(await request.body(), content_type)
+    if isinstance(document, dict):
+        document = document.get("samples")
+    if not isinstance(document, list):
+        raise HTTPException(status_code=422, detail="Se esperaba una lista de muestras en 'samples'")
+    return document
+
+
+def _bulk_rows(item: Any, valid_signs: set) -> Union[np.ndarray, List[Any]]:
+    """Frames de un elemento de la ingesta: matriz (N, 63) o lista de frames a extraer"""
+    if not isinstance(item, dict) or not isinstance(item.get("category_name"), str):
+        raise ValueError("Se requieren 'category_name' y 'landmarks' o 'frames'")
+    if item["category_name"] not in valid_signs:
+        raise ValueError(f"Seña '{item['category_name']}' no válida")
+    if "frames" in item:
+        # Ráfaga de una misma seña, en cualquier formato de lote
+        frames = item["frames"]
+        rows = _packed_frames(frames)
+        if rows is None:
+            if not isinstance(frames, list) or not frames:
+                raise ValueError("Se esperaba una lista de frames")
+            rows = [frame if isinstance(frame, list) and frame and isinstance(frame[0], dict)
+                    else decode_frame(frame) for frame in frames]
+    else:
+        landmarks = item.get("landmarks")
+        rows = [landmarks] if isinstance(landmarks, list) and landmarks and isinstance(landmarks[0], dict) \
+            else decode_frame(landmarks).reshape(1, FEATURES_PER_SAMPLE)
+    if isinstance(rows, np.ndarray) and not np.isfinite(rows).all():
+        raise ValueError("Frames con valores no finitos")
+    return rows
+
+
+def decode_bulk(items: List[Any], valid_signs: Iterable[str], max_samples: int) -> BulkSamples:
+    """Validar un lote de muestras de una vez y agruparlas por seña
+
+    Cada elemento es {category_name, landmarks, timestamp?} o, para una ráfaga,
+    {category_name, frames, timestamp?}. Las listas de puntos de todo el lote se
+    convierten con una sola extracción; un elemento con algún frame inválido se
+    rechaza entero y se informa con su posición. El orden se conserva por seña.
+    """
+    valid_signs = set(valid_signs)
+    decoded: List[Any] = [None] * len(items)
+    errors: Dict[int, str] = {}
+    listed, owners = [], []
+    for index, item in enumerate(items):
+        try:
+            rows = _bulk_rows(item, valid_signs)
+        except (ValueError, TypeError) as e:
+            errors[index] = str(e)
+            continue
+        if isinstance(rows, np.ndarray):
+            decoded[index] = rows
+        else:
+            decoded[index] = []
+            for frame in rows:
+                listed.append(frame)
+                owners.append(index)
+
+    if listed:
+        X, bad = extract_landmark_batch(listed)
+        bad = set(bad)
+        kept = (owner for position, owner in enumerate(owners) if position not in bad)
+        for owner, row in zip(kept, X):
+            if isinstance(decoded[owner], list):
+                decoded[owner].append(row)
+        for position in bad:
+            errors.setdefault(owners[position], "Landmarks con formato o valores no válidos")
+        for index, parts in enumerate(decoded):
+            if isinstance(parts, list):
+                decoded[index] = np.vstack(parts) if parts else None
+
+    total = sum(len(rows) for index, rows in enumerate(decoded) if rows is not None and index not in errors)
+    if total > max_samples:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote tiene {total} muestras; el máximo por petición es {max_samples}"
+        )
+
+    groups: Dict[str, Tuple[List[np.ndarray], List[Optional[str]]]] = {}
+    for index, (item, rows) in enumerate(zip(items, decoded)):
+        if rows is None or index in errors:
+            continue
+        parts, timestamps = groups.setdefault(item["category_name"], ([], []))
+        parts.append(rows)
+        timestamp = item.get("timestamp")
+        timestamps.extend([timestamp if isinstance(timestamp, str) else None] * len(rows))
+    signs = {sign: (np.vstack(parts), timestamps) for sign, (parts, timestamps) in groups.items()}
+    rejected = [{"index": index, "error": error} for index, error in sorted(errors.items())]
+    return BulkSamples(signs, rejected)
+
+
+def top_classes(probabilities: Dict[str, float], k: int) -> List[Dict[str, Any]]:
+    """Las ``k`` clases más probables, de mayor a menor"""
+    best = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [{"label": label, "confidence": confidence} for label, confidence in best]
+
+
+def prediction_payload(result: Dict[str, Any], top_k: Optional[int] = None,
+                       compact: bool = False, timestamp: Optional[str] = None) -> Dict[str, Any]:
+    """Resultado de predicción recortado: sin timestamp en modo compacto y con ``top`` si se pide"""
+    payload = {
+        "prediction": result["prediction"],
+        "confidence": result["confidence"],
+        "model_id": result.get("model_version", 0)
+    }
+    if not compact and timestamp is not None:
+        payload["timestamp"] = timestamp
+    if top_k:
+        payload["top"] = top_classes(result.get("probabilities", {}), top_k)
+    if result.get("personal"):
+        payload["personal"] = True
+    if "error" in result:
+        payload["error"] = result["error"]
+    return payload
+
+
+def _dumps(item: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(item)
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_ndjson(items: Iterable[Any], chunk_size: int) -> Iterator[bytes]:
+    """Serializar como NDJSON en bloques de ``chunk_size`` líneas, sin acumular el resto"""
+    lines = []
+    for item in items:
+        lines.append(_dumps(item))
+        if len(lines) == chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
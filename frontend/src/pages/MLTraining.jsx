@@ -9,6 +9,10 @@ import {
 } from "react-icons/fa";
 import HeroNavbar from "../components/HeroNavbar"; // 👈 Importa el navbar
 
+// Consulta del trabajo de entrenamiento en segundo plano
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 const MLTraining = () => {
   const [isTraining, setIsTraining] = useState(false);
   const [trainingResult, setTrainingResult] = useState(null);
@@ -61,8 +65,35 @@ const MLTraining = () => {
       );
 
       if (response.ok) {
-        const result = await response.json();
-        setTrainingResult(result);
+        // El backend encola el entrenamiento; consultar el trabajo hasta que termine
+        const { job_id } = await response.json();
+        const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+        let job = null;
+        while (Date.now() < deadline) {
+          await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+          const jobResponse = await fetch(
+            `http://localhost:8000/api/v1/training-jobs/${job_id}`
+          );
+          if (!jobResponse.ok) {
+            // Trabajo desconocido (p. ej. el backend se reinició) o error del servidor: dejar de consultar
+            job = {
+              status: "failed",
+              error: jobResponse.status === 404
+                ? "El trabajo de entrenamiento ya no existe en el servidor"
+                : `Error consultando el entrenamiento (HTTP ${jobResponse.status})`,
+            };
+            break;
+          }
+          job = await jobResponse.json();
+          if (job.status === "completed" || job.status === "failed") break;
+        }
+        if (!job || (job.status !== "completed" && job.status !== "failed")) {
+          job = { status: "failed", error: "El entrenamiento no terminó a tiempo" };
+        }
+
+        setTrainingResult(
+          job.result || { success: false, message: job.error, accuracy: 0 }
+        );
       } else {
         setTrainingResult({
           success: false,